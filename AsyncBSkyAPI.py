@@ -0,0 +1,315 @@
+import asyncio
+import os
+import time
+
+import httpx
+import pandas as pd
+from dotenv import load_dotenv
+
+from BSkyAPI import (AUTH_BASE_URL, AUTHOR_FEED_URL, DEFAULT_MAX_POSTS, DEFAULT_TOKEN_LIFETIME_SECONDS,
+                     MAX_PAGE_SIZE, RESOLVE_HANDLE_URL, SEARCH_POSTS_URL, TOKEN_REFRESH_MARGIN_SECONDS,
+                     BlueskyAPI, _jwt_expiry)
+from rate_limiter import RateLimiter
+from response_cache import ResponseCache
+
+
+class AsyncBlueskyAPI:
+    """
+    Asynchronous Bluesky client with the same surface as BlueskyAPI, for fetching many handles or
+    keywords concurrently from one event loop.
+
+    All requests share one httpx.AsyncClient (and its connection pool) and one cached access token.
+    """
+
+    def __init__(self, identifier=None, password=None, client=None, max_connections=10, rate_limiter=None,
+                 response_cache=None):
+        """
+        Sets up the API client with one connection-pooled asynchronous HTTP client.
+
+        Parameters:
+        identifier (str): Handle/DID of the client user. Defaults to IDENTIFIER from the .env file.
+        password (str): App password from Bluesky. Defaults to PASSWORD from the .env file.
+        client (httpx.AsyncClient): Client to use instead of creating one (e.g. for testing).
+        max_connections (int): Maximum number of connections open at the same time.
+        rate_limiter (RateLimiter): Limiter pacing every request. Pass the same one to clients sharing a quota.
+        response_cache (ResponseCache): Cache of searches, feeds and handle lookups. Defaults to an in-memory cache.
+        """
+        load_dotenv()
+        self.identifier = identifier if identifier is not None else os.getenv("IDENTIFIER")
+        self.password = password if password is not None else os.getenv("PASSWORD")
+
+        if client is None:
+            client = httpx.AsyncClient(limits=httpx.Limits(max_connections=max_connections,
+                                                           max_keepalive_connections=max_connections))
+        self.client = client
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter()
+        self.response_cache = response_cache if response_cache is not None else ResponseCache()
+
+        # Cached authentication tokens
+        self._access_jwt = None
+        self._refresh_jwt = None
+        self._access_expires_at = 0.0
+        self._auth_lock = None  # Created on first use, inside the running event loop
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def _request(self, method, url, **kwargs):
+        """
+        Function sends a request through the rate limiter, retrying rate-limited and failed requests.
+
+        Parameters:
+        method (str): "get" or "post".
+        url (str): The URL to request.
+        **kwargs: Arguments for the client's request method (params, headers, json...).
+
+        Returns:
+        httpx.Response: The last response received.
+
+        Raises:
+        httpx.TransportError: If the request still fails after the last retry.
+        """
+        attempt = 0
+        while True:
+            await self.rate_limiter.wait_async()
+            try:
+                response = await getattr(self.client, method)(url, **kwargs)
+            except httpx.TransportError as e:
+                if not self.rate_limiter.should_retry(attempt):
+                    raise
+                delay = self.rate_limiter.retry_delay(attempt)
+                print(f"Request failed ({e}). Retrying in {delay:.1f}s.")
+            else:
+                self.rate_limiter.update_from_headers(response.headers)
+                if not self.rate_limiter.should_retry(attempt, response.status_code):
+                    return response
+                delay = self.rate_limiter.retry_delay(attempt, response.status_code, response.headers)
+                print(f"Request returned {response.status_code}. Retrying in {delay:.1f}s.")
+
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def _store_tokens(self, data):
+        self._access_jwt = data["accessJwt"]
+        self._refresh_jwt = data.get("refreshJwt", self._refresh_jwt)
+        expiry = _jwt_expiry(self._access_jwt)
+        self._access_expires_at = expiry if expiry is not None else time.time() + DEFAULT_TOKEN_LIFETIME_SECONDS
+
+    async def _get_access_token(self, force_refresh=False):
+        """
+        Function returns a valid access token, logging in only when no usable token is cached.
+
+        Concurrent requests wait for a single login or refresh instead of each starting their own.
+
+        Parameters:
+        force_refresh (bool): Renew the token even if it looks valid (e.g. after a 401 response).
+
+        Returns:
+        str: The access token, or None if authentication failed.
+        """
+        if self._auth_lock is None:
+            self._auth_lock = asyncio.Lock()
+
+        async with self._auth_lock:
+            if not force_refresh and self._access_jwt and \
+                    time.time() < self._access_expires_at - TOKEN_REFRESH_MARGIN_SECONDS:
+                return self._access_jwt
+
+            if self._refresh_jwt:
+                try:
+                    response = await self._request("post", f"{AUTH_BASE_URL}/com.atproto.server.refreshSession",
+                                                   headers={"authorization": f"Bearer {self._refresh_jwt}"})
+                    if response.status_code == 200:
+                        self._store_tokens(response.json())
+                        return self._access_jwt
+                    print(f"Token refresh failed ({response.status_code}). Logging in again.")
+                except httpx.HTTPError as e:
+                    print(f"Token refresh failed: {e}. Logging in again.")
+                self._refresh_jwt = None
+
+            payload = {
+                "identifier": self.identifier,  # Handle/PID of client user
+                "password": self.password  # App Password from Bluesky
+            }
+
+            try:
+                response = await self._request("post", f"{AUTH_BASE_URL}/com.atproto.server.createSession",
+                                               json=payload)
+            except httpx.HTTPError as e:
+                print(f"Authentication failed: {e}")
+                return None
+
+            if response.status_code != 200:
+                print("Authentication failed:", response.status_code)
+                print(response.text)
+                return None
+
+            self._store_tokens(response.json())
+            return self._access_jwt
+
+    @staticmethod
+    async def _collect_pages(fetch_page, max_posts, page_size):
+        """
+        Function follows the cursor of a paginated endpoint until the post budget is spent.
+
+        Parameters:
+        fetch_page (callable): Coroutine function fetch_page(cursor, limit) -> (list of post dicts,
+            next cursor or None).
+        max_posts (int): Maximum number of posts to fetch in total, or None to follow the cursor to the end.
+        page_size (int): Posts per request, between 1 and 100.
+
+        Returns:
+        pandas.DataFrame: All fetched posts. Empty if none were fetched.
+        """
+        page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+        remaining = int(max_posts) if max_posts is not None else float("inf")
+        collected = []
+        cursor = None
+
+        while remaining > 0:
+            posts, cursor = await fetch_page(cursor, int(min(page_size, remaining)))
+            posts = posts[:remaining] if max_posts is not None else posts
+            remaining -= len(posts)
+            collected.extend(posts)
+            if not cursor or not posts:
+                break
+
+        return pd.DataFrame(collected)
+
+    async def get_posts_from_search(self, search_term, sort_setting, language, max_posts=DEFAULT_MAX_POSTS,
+                                    page_size=MAX_PAGE_SIZE):
+        """
+        Function fetches posts from the Bluesky Endpoint based on a search term.
+
+        Parameters:
+        search_term (str): Search term to look for in posts.
+        sort_setting (str): Options: "top" or "latest". Default is "latest".
+        language (str): Uses IETF language subtags. Default is "en" (English).
+        max_posts (int): Maximum number of posts to fetch (following the cursor across pages).
+        page_size (int): Posts per request, between 1 and 100.
+
+        Returns:
+        pandas.DataFrame: The posts (display_name, created_at, text, uri). Empty on error.
+        """
+        language, search_term, sort_setting = BlueskyAPI.validate_search_parameters(
+            language, search_term, sort_setting
+        )
+
+        async def fetch_page(cursor, limit):
+            params = {"q": search_term, "sort": sort_setting, "language": language, "limit": str(limit)}
+            if cursor:
+                params["cursor"] = cursor
+
+            async def fetch():
+                try:
+                    response = await self._request("get", SEARCH_POSTS_URL, params=params)
+                    response.raise_for_status()  # Raise an exception for HTTP errors
+                except httpx.HTTPError as e:
+                    print(f"Error making request: {e}")
+                    return None
+
+                post_data = response.json()
+                return [BlueskyAPI._parse_search_posts(post_data), post_data.get("cursor")]
+
+            page = await self.response_cache.get_or_fetch_async("searchPosts", params, fetch)
+            return page if page is not None else ([], None)
+
+        return await self._collect_pages(fetch_page, max_posts, page_size)
+
+    async def get_posts_from_handle(self, actor, max_posts=DEFAULT_MAX_POSTS, page_size=MAX_PAGE_SIZE, since=None):
+        """
+        Function fetches posts from the Bluesky Endpoint based on a user handle.
+
+        Parameters:
+        actor (str): Handle of the user whose feed you want to fetch.
+        max_posts (int): Maximum number of posts to fetch (following the cursor across pages), or None for
+            no limit (with since, every post newer than the watermark is fetched).
+        page_size (int): Posts per request, between 1 and 100.
+        since (str): Only fetch posts placed in the feed after this timestamp (their feed_time, see
+            BlueskyAPI._posts_since).
+
+        Returns:
+        pandas.DataFrame: The posts (created_at, text, uri). Empty on error.
+        """
+        async def fetch_page(cursor, limit):
+            params = {"actor": actor, "limit": str(limit)}
+            if cursor:
+                params["cursor"] = cursor
+
+            async def fetch():
+                token = await self._get_access_token()
+                if token is None:
+                    return None  # No posts when authentication fails
+
+                try:
+                    response = await self._request("get", AUTHOR_FEED_URL, params=params,
+                                                   headers={"authorization": f"Bearer {token}"})
+
+                    # An expired or revoked token is renewed once
+                    if response.status_code == 401:
+                        token = await self._get_access_token(force_refresh=True)
+                        if token is None:
+                            return None
+                        response = await self._request("get", AUTHOR_FEED_URL, params=params,
+                                                       headers={"authorization": f"Bearer {token}"})
+                except httpx.HTTPError as e:
+                    print(f"Error making request: {e}")
+                    return None
+
+                if response.status_code != 200:
+                    print(f"Error: {response.status_code}")
+                    print(response.text)
+                    return None
+
+                post_data = response.json()
+                return [BlueskyAPI._parse_feed_posts(post_data), post_data.get("cursor")]
+
+            page = await self.response_cache.get_or_fetch_async("getAuthorFeed", params, fetch)
+            return BlueskyAPI._posts_since(*page, since) if page is not None else ([], None)
+
+        return await self._collect_pages(fetch_page, max_posts, page_size)
+
+    async def handle_validation(self, actor):
+        """
+        Function checks if the handle exists in the Bluesky API.
+
+        Parameters:
+        actor (str): Handle of the user whose feed you want to fetch.
+
+        Returns:
+        bool: True if the handle resolves.
+        """
+        return await self.resolve_handle(actor) is not None
+
+    async def resolve_handle(self, actor):
+        """
+        Function resolves a handle to the DID identifying the account.
+
+        Parameters:
+        actor (str): Handle of the user.
+
+        Returns:
+        str: The DID, or None if the handle does not exist or could not be resolved.
+        """
+        params = {"handle": actor.strip()}
+
+        async def fetch():
+            try:
+                response = await self._request("get", RESOLVE_HANDLE_URL, params=params)
+            except httpx.HTTPError as e:
+                print(f"Error making request: {e}")
+                return None
+
+            if response.status_code == 200:
+                return response.json().get("did")
+            elif response.status_code == 400:
+                return False  # The handle does not resolve
+            return None  # Other failures are not remembered
+
+        return await self.response_cache.get_or_fetch_async("resolveHandle", params, fetch) or None
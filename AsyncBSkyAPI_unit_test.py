@@ -0,0 +1,121 @@
+import asyncio
+import json
+import unittest
+
+import httpx
+import pandas as pd
+
+from AsyncBSkyAPI import AsyncBlueskyAPI
+from controller import Controller
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def make_api(handler):
+    """Build an AsyncBlueskyAPI whose requests are answered by handler instead of the network."""
+    return AsyncBlueskyAPI(identifier="user", password="pass",
+                           client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+
+class TestAsyncBlueskyAPI(unittest.TestCase):
+    def test_get_posts_from_search_follows_cursor(self):
+        """Search pages are fetched by following the cursor."""
+        def handler(request):
+            if "cursor" not in request.url.params:
+                return httpx.Response(200, json={"cursor": "page2", "posts": [
+                    {"author": {"displayName": "User1"}, "record": {"createdAt": "2025-05-08T00:00:00Z", "text": "Hello"}}
+                ]})
+            return httpx.Response(200, json={"posts": [
+                {"author": {"displayName": "User2"}, "record": {"createdAt": "2025-05-08T01:00:00Z", "text": "World"}}
+            ]})
+
+        async def scenario():
+            async with make_api(handler) as api:
+                return await api.get_posts_from_search("test", "latest", "en", max_posts=10)
+
+        result_df = run(scenario())
+        self.assertEqual(result_df.columns.tolist(), ['display_name', 'author', 'author_did', 'created_at', 'text', 'uri'])
+        self.assertEqual(result_df['text'].tolist(), ["Hello", "World"])
+
+    def test_concurrent_handle_requests_log_in_once(self):
+        """Concurrent feed requests share one login."""
+        logins = []
+
+        def handler(request):
+            if request.url.path.endswith("createSession"):
+                logins.append(json.loads(request.content))
+                return httpx.Response(200, json={"accessJwt": "access-token", "refreshJwt": "refresh-token"})
+            self.assertEqual(request.headers["authorization"], "Bearer access-token")
+            return httpx.Response(200, json={"feed": [
+                {"post": {"record": {"createdAt": "2025-05-08T00:00:00Z", "text": request.url.params["actor"]}}}
+            ]})
+
+        async def scenario():
+            async with make_api(handler) as api:
+                return await asyncio.gather(*(api.get_posts_from_handle(actor) for actor in ["a", "b", "c"]))
+
+        results = run(scenario())
+        self.assertEqual([df['text'].tolist() for df in results], [["a"], ["b"], ["c"]])
+        self.assertEqual(len(logins), 1)
+
+    def test_handle_validation(self):
+        """Handles that do not resolve are rejected."""
+        def handler(request):
+            if request.url.params["handle"] == "known.bsky.social":
+                return httpx.Response(200, json={"did": "did:plc:known"})
+            return httpx.Response(400, json={"error": "InvalidRequest", "message": "Unable to resolve handle"})
+
+        async def scenario():
+            async with make_api(handler) as api:
+                return await api.handle_validation("known.bsky.social"), await api.handle_validation("unknown")
+
+        self.assertEqual(run(scenario()), (True, False))
+
+
+class FakeAsyncClient:
+    """Records how many fetches are in flight at the same time."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    async def handle_validation(self, actor):
+        return actor != "missing"
+
+    async def get_posts_from_search(self, search_term, sort_setting, language, max_posts=100):
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return pd.DataFrame({"text": [search_term]})
+
+    async def get_posts_from_handle(self, actor, max_posts=100):
+        return await self.get_posts_from_search(actor, "latest", "en", max_posts)
+
+
+class FakeSentimentAnalyser:
+    def run_model(self, model_path, texts, post_ids=None, post_metadata=None):
+        return [f"Text: '{text}'" for text in texts], {"Positive": len(texts), "Neutral": 0, "Negative": 0,
+                                                        "Total": len(texts)}
+
+
+class TestControllerFanOut(unittest.TestCase):
+    def test_requests_fan_out_under_concurrency_limit(self):
+        """Requests are fetched concurrently, never more than max_concurrency at once, and keep their order."""
+        client = FakeAsyncClient()
+        controller = Controller(None, FakeSentimentAnalyser(), "model.json", async_api_client=client)
+
+        analysis_requests = [("Keyword", f"topic{i}", "Top") for i in range(10)] + [("Profile", "missing", "Top")]
+        results = controller.process_analysis_requests(analysis_requests, max_concurrency=3)
+
+        self.assertEqual(len(results), 11)
+        self.assertEqual(results[4][0], "Text: 'topic4'")
+        self.assertIn("Total posts analysed: 1", results[4][1])
+        self.assertIn("invalid", results[10][0])
+        self.assertEqual(client.peak_in_flight, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,13 +1,224 @@
 import requests
 import csv
-from datetime import datetime
+import base64
+import json
+import threading
+import time
+from datetime import datetime, timezone
 from dotenv import load_dotenv
 import os
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from rate_limiter import RateLimiter
+from response_cache import ResponseCache
+
+AUTH_BASE_URL = "https://bsky.social/xrpc"
+SEARCH_POSTS_URL = "https://api.bsky.app/xrpc/app.bsky.feed.searchPosts"
+AUTHOR_FEED_URL = "https://api.bsky.social/xrpc/app.bsky.feed.getAuthorFeed"
+RESOLVE_HANDLE_URL = "https://public.api.bsky.app/xrpc/com.atproto.identity.resolveHandle"
+TOKEN_REFRESH_MARGIN_SECONDS = 60  # Access tokens are refreshed this long before they expire
+DEFAULT_TOKEN_LIFETIME_SECONDS = 15 * 60  # Assumed lifetime when a token's expiry cannot be read
+MAX_PAGE_SIZE = 100  # The most posts the Bluesky endpoints return per request
+DEFAULT_MAX_POSTS = 100  # Default post budget of a single analysis
+
+
+def _jwt_expiry(token):
+    """
+    Function reads the expiry time from a JWT without verifying it.
+
+    Parameters:
+    token (str): The JWT.
+
+    Returns:
+    float: The expiry as a Unix timestamp, or None if it cannot be read.
+    """
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)  # Restore the base64 padding stripped by JWTs
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except (IndexError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _parse_created_at(value):
+    """
+    Function parses a post's createdAt timestamp.
+
+    Parameters:
+    value (str): ISO 8601 timestamp (e.g. "2025-05-08T00:00:00.000Z").
+
+    Returns:
+    datetime: The timezone-aware timestamp (UTC when no offset is given), or None if it cannot be parsed.
+    """
+    try:
+        timestamp = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return timestamp if timestamp.tzinfo is not None else timestamp.replace(tzinfo=timezone.utc)
+
+
+def _feed_time(post):
+    """
+    Function returns the time that places a post in an author feed.
+
+    Parameters:
+    post (dict): A parsed feed post (see BlueskyAPI._parse_feed_posts).
+
+    Returns:
+    str: The time of the repost for reposts, which the feed orders by when they were reposted, and the
+        post's createdAt otherwise.
+    """
+    return post.get("feed_time") or post["created_at"]
+
+
+def _is_newer(created_at, since):
+    """
+    Function checks whether a post was created after a watermark timestamp.
+
+    Parameters:
+    created_at (str): The post's createdAt.
+    since (str): The watermark's createdAt.
+
+    Returns:
+    bool: True if created_at is later than since.
+    """
+    created, watermark = _parse_created_at(created_at), _parse_created_at(since)
+    if created is None or watermark is None:
+        return str(created_at) > str(since)
+    return created > watermark
 
 
 class BlueskyAPI:
-    def get_posts_from_search(self, search_term, sort_setting, language):
+    def __init__(self, identifier=None, password=None, session=None, pool_size=10, rate_limiter=None,
+                 response_cache=None):
+        """
+        Sets up the API client with one persistent, connection-pooled HTTP session.
+
+        Parameters:
+        identifier (str): Handle/DID of the client user. Defaults to IDENTIFIER from the .env file.
+        password (str): App password from Bluesky. Defaults to PASSWORD from the .env file.
+        session (requests.Session): Session to use instead of creating one (e.g. for testing).
+        pool_size (int): Number of connections kept open per host.
+        rate_limiter (RateLimiter): Limiter pacing every request. Pass the same one to clients sharing a quota.
+        response_cache (ResponseCache): Cache of searches, feeds and handle lookups. Defaults to an in-memory cache.
+        """
+        # Load authentication variables from .env file (once, not on every request)
+        load_dotenv()
+        self.identifier = identifier if identifier is not None else os.getenv("IDENTIFIER")
+        self.password = password if password is not None else os.getenv("PASSWORD")
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        self.session = session
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter()
+        self.response_cache = response_cache if response_cache is not None else ResponseCache()
+
+        # Cached authentication tokens
+        self._access_jwt = None
+        self._refresh_jwt = None
+        self._access_expires_at = 0.0
+        self._auth_lock = threading.Lock()
+
+    def _request(self, method, url, **kwargs):
+        """
+        Function sends a request through the rate limiter, retrying rate-limited and failed requests.
+
+        Requests answered with 429 or 5xx, or that fail to connect, are retried with jittered exponential
+        backoff (honouring the server's Retry-After/ratelimit-reset headers) until the retries run out.
+
+        Parameters:
+        method (str): "get" or "post".
+        url (str): The URL to request.
+        **kwargs: Arguments for the session's request method (params, headers, json...).
+
+        Returns:
+        requests.Response: The last response received.
+
+        Raises:
+        requests.exceptions.RequestException: If the request still fails after the last retry.
+        """
+        attempt = 0
+        while True:
+            self.rate_limiter.wait()
+            try:
+                response = getattr(self.session, method)(url, **kwargs)
+            except requests.exceptions.RequestException as e:
+                if not self.rate_limiter.should_retry(attempt):
+                    raise
+                delay = self.rate_limiter.retry_delay(attempt)
+                print(f"Request failed ({e}). Retrying in {delay:.1f}s.")
+            else:
+                self.rate_limiter.update_from_headers(response.headers)
+                if not self.rate_limiter.should_retry(attempt, response.status_code):
+                    return response
+                delay = self.rate_limiter.retry_delay(attempt, response.status_code, response.headers)
+                print(f"Request returned {response.status_code}. Retrying in {delay:.1f}s.")
+
+            time.sleep(delay)
+            attempt += 1
+
+    def _store_tokens(self, data):
+        self._access_jwt = data["accessJwt"]
+        self._refresh_jwt = data.get("refreshJwt", self._refresh_jwt)
+        expiry = _jwt_expiry(self._access_jwt)
+        self._access_expires_at = expiry if expiry is not None else time.time() + DEFAULT_TOKEN_LIFETIME_SECONDS
+
+    def _get_access_token(self, force_refresh=False):
+        """
+        Function returns a valid access token, logging in only when no usable token is cached.
+
+        The cached token is reused until shortly before it expires; it is then renewed with the
+        refresh token, and only if that fails is a new session created with the credentials.
+
+        Parameters:
+        force_refresh (bool): Renew the token even if it looks valid (e.g. after a 401 response).
+
+        Returns:
+        str: The access token, or None if authentication failed.
+        """
+        with self._auth_lock:
+            if not force_refresh and self._access_jwt and \
+                    time.time() < self._access_expires_at - TOKEN_REFRESH_MARGIN_SECONDS:
+                return self._access_jwt
+
+            if self._refresh_jwt:
+                try:
+                    response = self._request("post", f"{AUTH_BASE_URL}/com.atproto.server.refreshSession",
+                                             headers={"authorization": f"Bearer {self._refresh_jwt}"})
+                    if response.status_code == 200:
+                        self._store_tokens(response.json())
+                        return self._access_jwt
+                    print(f"Token refresh failed ({response.status_code}). Logging in again.")
+                except requests.exceptions.RequestException as e:
+                    print(f"Token refresh failed: {e}. Logging in again.")
+                self._refresh_jwt = None
+
+            payload = {
+                "identifier": self.identifier,  # Handle/PID of client user
+                "password": self.password  # App Password from Bluesky
+            }
+
+            # Make the POST request to the authentication endpoint
+            try:
+                response = self._request("post", f"{AUTH_BASE_URL}/com.atproto.server.createSession",
+                                         json=payload)
+            except requests.exceptions.RequestException as e:
+                print(f"Authentication failed: {e}")
+                return None
+
+            if response.status_code != 200:
+                print("Authentication failed:", response.status_code)
+                print(response.text)
+                return None
+
+            self._store_tokens(response.json())
+            return self._access_jwt
+
+    def get_posts_from_search(self, search_term, sort_setting, language, max_posts=DEFAULT_MAX_POSTS):
         """
         Function fetches posts from the Bluesky Endpoint based on a search term.
 
@@ -15,31 +226,75 @@ class BlueskyAPI:
         search_term (str): Search term to look for in posts.
         sort_setting (str): Options: "top" or "latest". Default is "latest".
         language (str): Uses IETF language subtags. Default is "en" (English).
+        max_posts (int): Maximum number of posts to fetch (following the cursor across pages).
 
         Returns:
-        None.
+        pandas.DataFrame: The posts (display_name, created_at, text, uri). Empty on error.
+        """
+        pages = list(self.iter_posts_from_search(search_term, sort_setting, language, max_posts=max_posts))
+        return pd.concat(pages, ignore_index=True) if pages else pd.DataFrame()
+
+    def iter_posts_from_search(self, search_term, sort_setting, language, max_posts=DEFAULT_MAX_POSTS,
+                               page_size=MAX_PAGE_SIZE):
+        """
+        Function yields pages of posts matching a search term, following the cursor.
+
+        The next page is requested in the background while the caller processes the current one.
+
+        Parameters:
+        search_term (str): Search term to look for in posts.
+        sort_setting (str): Options: "top" or "latest". Default is "latest".
+        language (str): Uses IETF language subtags. Default is "en" (English).
+        max_posts (int): Maximum number of posts to fetch in total.
+        page_size (int): Posts per request, between 1 and 100.
+
+        Returns:
+        generator: One pandas.DataFrame (display_name, created_at, text, uri) per page.
         """
         language, search_term, sort_setting = self.validate_search_parameters(
             language, search_term, sort_setting
         )
 
-        bluesky_post_search_url = "https://api.bsky.app/xrpc/app.bsky.feed.searchPosts"
-        params = {
-            "q": search_term,
-            "sort": sort_setting,
-            "language": language,
-            "limit": "100"  # The Number of posts to return, between 1 and 100. Default value is 25.
-        }
-
-        # Make the GET request to the Bluesky API
-        try:
-            response = requests.get(bluesky_post_search_url, params=params)
-            response.raise_for_status()  # Raise an exception for HTTP errors
-        except requests.exceptions.RequestException as e:
-            print(f"Error making request: {e}")
-            return pd.DataFrame()  # Return an empty dataframe on error
-
-        post_data = response.json()
+        bluesky_post_search_url = SEARCH_POSTS_URL
+
+        def fetch_page(cursor, limit):
+            params = {
+                "q": search_term,
+                "sort": sort_setting,
+                "language": language,
+                "limit": str(limit)  # The Number of posts to return, between 1 and 100. Default value is 25.
+            }
+            if cursor:
+                params["cursor"] = cursor
+
+            def fetch():
+                # Make the GET request to the Bluesky API
+                try:
+                    response = self._request("get", bluesky_post_search_url, params=params)
+                    response.raise_for_status()  # Raise an exception for HTTP errors
+                except requests.exceptions.RequestException as e:
+                    print(f"Error making request: {e}")
+                    return None
+
+                post_data = response.json()
+                return [self._parse_search_posts(post_data), post_data.get("cursor")]
+
+            page = self.response_cache.get_or_fetch("searchPosts", params, fetch)
+            return page if page is not None else ([], None)
+
+        return self._paginate(fetch_page, max_posts, page_size)
+
+    @staticmethod
+    def _parse_search_posts(post_data):
+        """
+        Function extracts the post fields used for analysis from a searchPosts response.
+
+        Parameters:
+        post_data (dict): The decoded JSON response.
+
+        Returns:
+        list: One dictionary (display_name, author, author_did, created_at, text, uri) per valid post.
+        """
         filtered_posts = []
 
         if "posts" in post_data and isinstance(post_data["posts"], list):
@@ -62,15 +317,52 @@ class BlueskyAPI:
                 if created_at_val is not None and text_val is not None:
                     filtered_posts.append({
                         "display_name": display_name,
+                        "author": author_info.get("handle"),
+                        "author_did": author_info.get("did"),
                         "created_at": created_at_val,
-                        "text": text_val
+                        "text": text_val,
+                        "uri": post_item.get("uri")
                     })
         else:
             print("Warning: 'posts' key not found in API response or is not a list.")
 
-        return pd.DataFrame(filtered_posts)
+        return filtered_posts
 
-    def validate_search_parameters(self, language, search_term, sort_setting):
+    @staticmethod
+    def _paginate(fetch_page, max_posts, page_size):
+        """
+        Function yields pages from a cursor-paginated endpoint, prefetching the next page.
+
+        Parameters:
+        fetch_page (callable): fetch_page(cursor, limit) -> (list of post dicts, next cursor or None).
+        max_posts (int): Maximum number of posts to yield in total, or None to follow the cursor to the end.
+        page_size (int): Posts per request, between 1 and 100.
+
+        Returns:
+        generator: One pandas.DataFrame per non-empty page.
+        """
+        page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+        remaining = int(max_posts) if max_posts is not None else float("inf")
+        if remaining <= 0:
+            return
+
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="bsky-page") as executor:
+            next_page = executor.submit(fetch_page, None, int(min(page_size, remaining)))
+            while next_page is not None:
+                posts, cursor = next_page.result()
+                posts = posts[:remaining] if max_posts is not None else posts
+                remaining -= len(posts)
+
+                # Requesting the following page before handing this one to the caller
+                next_page = None
+                if cursor and posts and remaining > 0:
+                    next_page = executor.submit(fetch_page, cursor, int(min(page_size, remaining)))
+
+                if posts:
+                    yield pd.DataFrame(posts)
+
+    @staticmethod
+    def validate_search_parameters(language, search_term, sort_setting):
         """
         Function validates the input parameters for the search function.
 
@@ -108,64 +400,136 @@ class BlueskyAPI:
         return language, search_term, sort_setting
 
 
-    def get_posts_from_handle(self, actor):
+    def get_posts_from_handle(self, actor, max_posts=DEFAULT_MAX_POSTS, since=None):
         """
         Function fetches posts from the Bluesky Endpoint based on a user handle.
 
         Parameters:
         actor (str): Handle of the user whose feed you want to fetch.
+        max_posts (int): Maximum number of posts to fetch (following the cursor across pages).
+        since (str): Only fetch posts placed in the feed after this timestamp (e.g. the previous run's newest
+            feed_time).
 
         Returns:
-        None.
+        pandas.DataFrame: The posts (created_at, text, uri). Empty on error.
         """
-        # Load authentication variables from .env file
-        load_dotenv()
-        identifier = os.getenv("IDENTIFIER")
-        password = os.getenv("PASSWORD")
-
-        at_proto_auth_url = "https://bsky.social/xrpc/com.atproto.server.createSession"
-
-        payload = {
-            "identifier": identifier,  # Handle/PID of client user
-            "password": password  # App Password from Bluesky
-        }
-
-        # Make the POST request to the authentication endpoint
-        try:
-            response = requests.post(at_proto_auth_url, json=payload)
-        except requests.exceptions.RequestException as e:
-            print("Authentication failed:", response.status_code)
-            print(response.text)
-        else:
-            data = response.json()
-            token = data["accessJwt"]
-
-        # Make the GET request to the Bluesky API
-        bluesky_url = "https://api.bsky.social/xrpc/app.bsky.feed.getAuthorFeed"
-        params = {
-            "actor": actor,
-            "limit": "100"  # The Number of posts to return, between 1 and 100. Default value is 25.
-        }
-        response = requests.get(bluesky_url, params=params, headers={"authorization": f"Bearer {token}"})
-
-        # Check if the request was successful
-        if response.status_code == 200:
-            post_data = response.json()
-
-            # Filter the posts to only include the createdAt and text fields
-            filtered_posts = []
-            for item in post_data["feed"]:
-                if "post" in item and "record" in item["post"]:
-                    filtered_posts.append({
-                        "created_at": item["post"]["record"]["createdAt"],
-                        "text": item["post"]["record"]["text"]
-                    })
+        pages = list(self.iter_posts_from_handle(actor, max_posts=max_posts, since=since))
+        return pd.concat(pages, ignore_index=True) if pages else pd.DataFrame()
 
-            return pd.DataFrame(filtered_posts)
+    def iter_posts_from_handle(self, actor, max_posts=DEFAULT_MAX_POSTS, page_size=MAX_PAGE_SIZE, since=None):
+        """
+        Function yields pages of posts from a user's feed, following the cursor.
 
-        else:
-            print(f"Error: {response.status_code}")
-            print(response.text)
+        The next page is requested in the background while the caller processes the current one.
+
+        Parameters:
+        actor (str): Handle of the user whose feed you want to fetch.
+        max_posts (int): Maximum number of posts to fetch in total, or None for no limit (with since, every
+            post newer than the watermark is fetched).
+        page_size (int): Posts per request, between 1 and 100.
+        since (str): Only fetch posts placed in the feed after this timestamp (their feed_time). Paging stops at
+            the first page reaching back to it, so a repeat analysis only downloads the new posts.
+
+        Returns:
+        generator: One pandas.DataFrame (author, author_did, created_at, feed_time, text, uri) per page.
+        """
+        bluesky_url = AUTHOR_FEED_URL
+
+        def fetch_page(cursor, limit):
+            params = {
+                "actor": actor,
+                "limit": str(limit)  # The Number of posts to return, between 1 and 100. Default value is 25.
+            }
+            if cursor:
+                params["cursor"] = cursor
+
+            def fetch():
+                # Cached token (logging in or refreshing only when needed)
+                token = self._get_access_token()
+                if token is None:
+                    return None  # No posts when authentication fails
+
+                # Make the GET request to the Bluesky API
+                try:
+                    response = self._request("get", bluesky_url, params=params,
+                                             headers={"authorization": f"Bearer {token}"})
+
+                    # An expired or revoked token is renewed once
+                    if response.status_code == 401:
+                        token = self._get_access_token(force_refresh=True)
+                        if token is None:
+                            return None
+                        response = self._request("get", bluesky_url, params=params,
+                                                 headers={"authorization": f"Bearer {token}"})
+                except requests.exceptions.RequestException as e:
+                    print(f"Error making request: {e}")
+                    return None
+
+                # Check if the request was successful
+                if response.status_code != 200:
+                    print(f"Error: {response.status_code}")
+                    print(response.text)
+                    return None
+
+                post_data = response.json()
+                return [self._parse_feed_posts(post_data), post_data.get("cursor")]
+
+            page = self.response_cache.get_or_fetch("getAuthorFeed", params, fetch)
+            return self._posts_since(*page, since) if page is not None else ([], None)
+
+        return self._paginate(fetch_page, max_posts, page_size)
+
+    @staticmethod
+    def _posts_since(posts, cursor, since):
+        """
+        Function keeps the posts of a feed page placed in the feed after a watermark.
+
+        The feed is newest first by feed time, so once a page's last post is not newer than the watermark,
+        the following pages hold nothing new and the cursor is dropped. Reposts are compared by the time
+        of the repost: an old post reposted since the watermark is new to the feed.
+
+        Parameters:
+        posts (list): The page's posts, newest first.
+        cursor (str): The cursor of the next page.
+        since (str): The watermark (the newest feed_time seen so far), or None to keep everything.
+
+        Returns:
+        tuple: (the newer posts, the cursor or None).
+        """
+        if since is None:
+            return posts, cursor
+        newer_posts = [post for post in posts if _is_newer(_feed_time(post), since)]
+        if posts and not _is_newer(_feed_time(posts[-1]), since):
+            cursor = None
+        return newer_posts, cursor
+
+    @staticmethod
+    def _parse_feed_posts(post_data):
+        """
+        Function extracts the post fields used for analysis from a getAuthorFeed response.
+
+        Parameters:
+        post_data (dict): The decoded JSON response.
+
+        Returns:
+        list: One dictionary (author, author_did, created_at, feed_time, text, uri) per post. feed_time is
+            when a repost was reposted, and the post's createdAt otherwise.
+        """
+        # Filter the posts to only include the createdAt and text fields
+        filtered_posts = []
+        for item in post_data["feed"]:
+            if "post" in item and "record" in item["post"]:
+                author_info = item["post"].get("author") or {}
+                created_at = item["post"]["record"]["createdAt"]
+                filtered_posts.append({
+                    "author": author_info.get("handle"),
+                    "author_did": author_info.get("did"),
+                    "created_at": created_at,
+                    "feed_time": (item.get("reason") or {}).get("indexedAt") or created_at,
+                    "text": item["post"]["record"]["text"],
+                    "uri": item["post"].get("uri")
+                })
+        return filtered_posts
 
     def handle_validation(self, actor):
         """
@@ -175,18 +539,38 @@ class BlueskyAPI:
         actor (str): Handle of the user whose feed you want to fetch.
 
         Returns:
-        actor (str): Validated handle of the user.
+        bool: True if the handle resolves.
         """
-        actor = actor.strip()
-        handle_lookup_url = "https://public.api.bsky.app/xrpc/com.atproto.identity.resolveHandle?handle=" + actor
+        return self.resolve_handle(actor) is not None
 
-        # Check identity endpoint to ensure that the handle exists
-        response = requests.get(handle_lookup_url)
+    def resolve_handle(self, actor):
+        """
+        Function resolves a handle to the DID identifying the account.
 
-        if response.status_code == 200:
-            return True
-        else:
-            return False
+        Parameters:
+        actor (str): Handle of the user.
+
+        Returns:
+        str: The DID, or None if the handle does not exist or could not be resolved.
+        """
+        actor = actor.strip()
+        handle_lookup_url = RESOLVE_HANDLE_URL + "?handle=" + actor
+
+        def fetch():
+            # Check identity endpoint to ensure that the handle exists
+            try:
+                response = self._request("get", handle_lookup_url)
+            except requests.exceptions.RequestException as e:
+                print(f"Error making request: {e}")
+                return None
+
+            if response.status_code == 200:
+                return response.json().get("did")
+            elif response.status_code == 400:
+                return False  # The handle does not resolve
+            return None  # Other failures are not remembered
+
+        return self.response_cache.get_or_fetch("resolveHandle", {"handle": actor}, fetch) or None
 
 # Examples
 """
@@ -4,10 +4,18 @@ import json
 from datetime import datetime
 import os
 import pandas as pd
+import base64
+import time
 from BSkyAPI import BlueskyAPI
 
+
+def make_jwt(expiry):
+    """Build an (unsigned) JWT whose payload expires at the given Unix time."""
+    payload = base64.urlsafe_b64encode(json.dumps({"exp": expiry}).encode()).decode().rstrip("=")
+    return f"header.{payload}.signature"
+
 class TestBlueskyAPI(unittest.TestCase):
-    @patch("requests.get")
+    @patch("requests.Session.get")
     def test_get_posts_from_search(self, mock_get):
         """Test the 'get_posts_from_search' method."""
         # Setup mock response
@@ -33,13 +41,20 @@ class TestBlueskyAPI(unittest.TestCase):
         
         # Validate the result
         self.assertEqual(result_df.shape[0], 2)
-        self.assertEqual(result_df.columns.tolist(), ['display_name', 'created_at', 'text'])
+        self.assertEqual(result_df.columns.tolist(), ['display_name', 'author', 'author_did', 'created_at', 'text', 'uri'])
         self.assertEqual(result_df.iloc[0]['display_name'], 'User1')
         self.assertEqual(result_df.iloc[1]['text'], 'Test Post')
 
-    @patch("requests.get")
-    def test_get_posts_from_handle(self, mock_get):
+    @patch("requests.Session.post")
+    @patch("requests.Session.get")
+    def test_get_posts_from_handle(self, mock_get, mock_post):
         """Test the 'get_posts_from_handle' method."""
+        # Setup mock response for authentication
+        mock_auth_response = Mock()
+        mock_auth_response.status_code = 200
+        mock_auth_response.json.return_value = {"accessJwt": "access-token", "refreshJwt": "refresh-token"}
+        mock_post.return_value = mock_auth_response
+
         # Setup mock response for get_posts_from_handle
         mock_response = Mock()
         mock_response.status_code = 200
@@ -63,10 +78,10 @@ class TestBlueskyAPI(unittest.TestCase):
 
         # Validate the result
         self.assertEqual(result_df.shape[0], 1)
-        self.assertEqual(result_df.columns.tolist(), ['created_at', 'text'])
+        self.assertEqual(result_df.columns.tolist(), ['author', 'author_did', 'created_at', 'feed_time', 'text', 'uri'])
         self.assertEqual(result_df.iloc[0]['text'], 'Post by User1')
 
-    @patch("requests.get")
+    @patch("requests.Session.get")
     def test_handle_validation_existing_handle(self, mock_get):
         """Test handle validation for an existing handle."""
         # Mock a successful response for handle validation
@@ -79,7 +94,7 @@ class TestBlueskyAPI(unittest.TestCase):
         result = api.handle_validation("user_handle")
         self.assertTrue(result)
 
-    @patch("requests.get")
+    @patch("requests.Session.get")
     def test_handle_validation_non_existing_handle(self, mock_get):
         """Test handle validation for a non-existing handle."""
         # Mock a 404 error response for handle validation (handle not found)
@@ -92,5 +107,110 @@ class TestBlueskyAPI(unittest.TestCase):
         result = api.handle_validation("invalid_handle")
         self.assertFalse(result)
 
+    @patch("requests.Session.post")
+    @patch("requests.Session.get")
+    def test_access_token_cached_between_calls(self, mock_get, mock_post):
+        """Test that repeated profile fetches log in once and reuse the access token."""
+        mock_auth_response = Mock()
+        mock_auth_response.status_code = 200
+        mock_auth_response.json.return_value = {"accessJwt": make_jwt(time.time() + 3600), "refreshJwt": "refresh"}
+        mock_post.return_value = mock_auth_response
+
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {"feed": []}
+        mock_get.return_value = mock_response
+
+        api = BlueskyAPI(identifier="user.bsky.social", password="app-password")
+        api.get_posts_from_handle("user_handle")
+        api.get_posts_from_handle("user_handle")
+
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(mock_post.call_args.kwargs["json"],
+                         {"identifier": "user.bsky.social", "password": "app-password"})
+
+    @patch("requests.Session.post")
+    def test_expiring_token_refreshed(self, mock_post):
+        """Test that a token close to expiry is renewed with the refresh token, not a new login."""
+        login_response = Mock()
+        login_response.status_code = 200
+        login_response.json.return_value = {"accessJwt": make_jwt(time.time() + 30), "refreshJwt": "refresh"}
+        refresh_response = Mock()
+        refresh_response.status_code = 200
+        refresh_response.json.return_value = {"accessJwt": make_jwt(time.time() + 3600), "refreshJwt": "refresh-2"}
+        mock_post.side_effect = [login_response, refresh_response]
+
+        api = BlueskyAPI(identifier="user.bsky.social", password="app-password")
+        api._get_access_token()
+        token = api._get_access_token()
+
+        self.assertEqual(token, refresh_response.json.return_value["accessJwt"])
+        self.assertTrue(mock_post.call_args.args[0].endswith("com.atproto.server.refreshSession"))
+        self.assertEqual(mock_post.call_args.kwargs["headers"], {"authorization": "Bearer refresh"})
+
+    @patch("requests.Session.post")
+    def test_failed_login_returns_empty_dataframe(self, mock_post):
+        """Test that a failed login gives an empty result instead of an error."""
+        mock_response = Mock()
+        mock_response.status_code = 401
+        mock_response.text = "AuthenticationRequired"
+        mock_post.return_value = mock_response
+
+        api = BlueskyAPI(identifier="user.bsky.social", password="wrong")
+        self.assertTrue(api.get_posts_from_handle("user_handle").empty)
+
+
+def search_page(texts, cursor=None):
+    """Build a mocked searchPosts response holding the given post texts."""
+    response = Mock()
+    response.status_code = 200
+    response.json.return_value = {
+        "posts": [
+            {"author": {"displayName": "User"}, "record": {"createdAt": "2025-05-08T00:00:00Z", "text": text}}
+            for text in texts
+        ],
+        **({"cursor": cursor} if cursor else {})
+    }
+    return response
+
+
+class TestPagination(unittest.TestCase):
+    @patch("requests.Session.get")
+    def test_search_follows_cursor(self, mock_get):
+        """Pages are fetched by following the cursor until the API stops returning one."""
+        mock_get.side_effect = [search_page(["a", "b"], cursor="page2"), search_page(["c"])]
+
+        api = BlueskyAPI()
+        pages = list(api.iter_posts_from_search("test", "latest", "en", max_posts=10, page_size=2))
+
+        self.assertEqual([page['text'].tolist() for page in pages], [["a", "b"], ["c"]])
+        self.assertNotIn("cursor", mock_get.call_args_list[0].kwargs["params"])
+        self.assertEqual(mock_get.call_args_list[1].kwargs["params"]["cursor"], "page2")
+
+    @patch("requests.Session.get")
+    def test_search_stops_at_max_posts(self, mock_get):
+        """No page is requested beyond the post budget, and the last request only asks for what is left."""
+        mock_get.side_effect = [search_page(["a", "b"], cursor="page2"), search_page(["c"], cursor="page3")]
+
+        api = BlueskyAPI()
+        result_df = api.get_posts_from_search("test", "latest", "en", max_posts=3)
 
+        self.assertEqual(result_df['text'].tolist(), ["a", "b", "c"])
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(mock_get.call_args_list[1].kwargs["params"]["limit"], "1")
+
+    @patch("requests.Session.get")
+    def test_next_page_prefetched(self, mock_get):
+        """The next page is requested before the caller has finished with the current one."""
+        mock_get.side_effect = [search_page(["a"], cursor="page2"), search_page(["b"])]
+
+        api = BlueskyAPI()
+        pages = api.iter_posts_from_search("test", "latest", "en", max_posts=10, page_size=1)
+        next(pages)
+        deadline = time.time() + 5
+        while mock_get.call_count < 2 and time.time() < deadline:
+            time.sleep(0.01)
 
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(next(pages)['text'].tolist(), ["b"])
+        pages.close()
@@ -41,10 +41,33 @@ class GUI:
                 info="Select whether to search for top posts or latest posts."
             )
 
+            self.max_posts_var = gr.Slider(
+                minimum=25,
+                maximum=1000,
+                step=25,
+                value=controller_instance.max_posts,
+                label="Maximum posts:",
+                info="Posts are fetched in pages of up to 100 and analysed as they arrive."
+            )
+
             self.submit_button = gr.Button("Submit", variant="primary")
             self.output_textbox = gr.Textbox(label="Result:", interactive=False, lines=10, show_copy_button=True)
             self.output_stats_textbox = gr.Textbox(label="Stats:", interactive=False, lines=3, show_copy_button=True)
 
+            self.trend_resolution_var = gr.Radio(
+                ["minute", "hour", "day"],
+                label="Trend resolution:",
+                value="hour",  # Default Value
+                info="Width of the time windows the posts are counted in."
+            )
+            self.trend_plot = gr.LinePlot(
+                x="window_start",
+                y="count",
+                color="sentiment",
+                label="Sentiment over time:",
+                color_map={"Positive": "green", "Neutral": "gray", "Negative": "red"}
+            )
+
             self.choice_var.change(
                 fn=self.update_input_text_label_and_placeholder,
                 inputs=self.choice_var,
@@ -53,8 +76,15 @@ class GUI:
 
             self.submit_button.click(
                 fn=self.predict_sentiment_wrapper,
-                inputs=[self.choice_var, self.text_input_var, self.search_type_var],
-                outputs=[self.output_textbox, self.output_stats_textbox]
+                inputs=[self.choice_var, self.text_input_var, self.search_type_var, self.max_posts_var,
+                        self.trend_resolution_var],
+                outputs=[self.output_textbox, self.output_stats_textbox, self.trend_plot]
+            )
+
+            self.trend_resolution_var.change(
+                fn=self.controller.sentiment_trend,
+                inputs=[self.choice_var, self.text_input_var, self.trend_resolution_var],
+                outputs=self.trend_plot
             )
 
     def update_input_text_label_and_placeholder(self, current_choice):
@@ -75,11 +105,13 @@ class GUI:
                 gr.update(visible=True)
             )
 
-    def predict_sentiment_wrapper(self, selected_choice: str, user_input_text: str, search_type: str) -> tuple[str, str]:
+    def predict_sentiment_wrapper(self, selected_choice: str, user_input_text: str, search_type: str,
+                                  max_posts: int = None, trend_resolution: str = "hour"):
         main_result, stats_result = self.controller.process_analysis_request(
-            selected_choice, user_input_text, search_type
+            selected_choice, user_input_text, search_type, max_posts
         )
-        return main_result, stats_result
+        trend = self.controller.sentiment_trend(selected_choice, user_input_text, trend_resolution)
+        return main_result, stats_result, trend
 
     def launch(self):
         self.interface.launch()
\ No newline at end of file
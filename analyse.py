@@ -1,70 +1,216 @@
 from bin import naive_bayes
 from bin import sentiment_analyser
+from bin.model_cache import ModelCache
+from bin.prediction_cache import PredictionCache, post_key
+from bin.training_jobs import TrainingJobManager
 import os
-import pandas as pd
-from tqdm import tqdm
 import time
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+
+# Prediction labels: 0 (Negative), 1 (Neutral), 2 (Positive)
+SENTIMENT_NAMES = {0: "Negative", 1: "Neutral", 2: "Positive"}
 
 
 class SentimentAnalyser:
-    def __init__(self, MODEL_FILEPATH=None):
+    def __init__(self, MODEL_FILEPATH=None, model_cache=None, training_jobs=None, training_wait_seconds=0.0,
+                 prediction_cache=None, results_store=None):
         self.MODEL_FILEPATH = MODEL_FILEPATH
+        # Loaded models stay resident between requests and are only reloaded when the file changes
+        self.model_cache = model_cache if model_cache is not None else ModelCache()
+        # First-time training runs in the background, once, however many requests trigger it
+        self.training_jobs = training_jobs if training_jobs is not None else TrainingJobManager()
+        # How long a request waits for a running training job before answering "warming up"
+        self.training_wait_seconds = training_wait_seconds
+        # Posts seen in earlier requests (overlapping searches, profiles) are not classified again
+        self.prediction_cache = prediction_cache if prediction_cache is not None else PredictionCache()
+        # Newly scored posts are also written here (a ResultsStore), for reporting without re-scoring
+        self.results_store = results_store
 
-    def run_model(self, MODEL_FILEPATH, texts: list):
+    def warm_up(self, MODEL_FILEPATH):
+        """
+        Load the model into the cache, or start training it in the background if it does not exist yet.
 
-        # Try to Load Pre-trained Model
-        print(f"Attempting to load model from {MODEL_FILEPATH}...")
-        loaded_model = naive_bayes.NaiveBayes.load(MODEL_FILEPATH)
-        vocab = None
+        Parameters:
+        MODEL_FILEPATH (str): The path of the model file.
 
-        if loaded_model:
-            # Model loaded successfully
-            print("Model loaded successfully from file.")
-            # Retrieve the vocabulary stored within the loaded model
-            vocab = loaded_model.vocabulary
-            print(f"Using vocabulary with {len(vocab)} words from the loaded model.")
-            current_model = loaded_model
-        else:
-            # Model Not Found - Train New Model
-            print(f"Model file not found at {MODEL_FILEPATH}. Training a new model...")
+        Returns:
+        TrainingJob: The background training job, or None if the model was loaded.
+        """
+        if self.model_cache.get(MODEL_FILEPATH):
+            return None
 
-            # Training Data
-            try:
-                df = pd.read_csv('training_processed.csv')
-                sentiment_col_idx = df.columns.get_loc('sentiment')
-            except FileNotFoundError:
-                print(f"Error: 'training_processed.csv' not found at {MODEL_FILEPATH}. Cannot train a new model...")
-                return "Error: Training data not found. Cannot proceed."
-            except KeyError:
-                print("Error: 'sentiment' column not found in DataFrame.")
-                return "Error: 'sentiment' column not found in DataFrame. Cannot proceed"
-
-            train_texts = df['text']
-            y_train = df['sentiment'].copy()
-
-            for idx, sentiment_val in enumerate(tqdm(y_train, desc="Updating sentiment column...")):
-                if isinstance(sentiment_val, str):
-                    sentiment_lower = sentiment_val.lower()
-
-                    if sentiment_lower == "positive":
-                        df.iat[idx, sentiment_col_idx] = 2
-                    elif sentiment_lower == "neutral":
-                        df.iat[idx, sentiment_col_idx] = 1
-                    elif sentiment_lower == "negative":
-                        df.iat[idx, sentiment_col_idx] = 0
-
-            # Updating y_train after modification to data
-            y_train = df['sentiment'].astype(int)
-
-            # Create a new Naive Bayes instance
-            nb_instance = naive_bayes.NaiveBayes()
-
-            current_model, vocab = sentiment_analyser.train(nb_instance, train_texts, y_train)
-
-            # Save the Newly Trained Model
-            print(f"Saving the newly trained model to {MODEL_FILEPATH}...")
-            current_model.save(MODEL_FILEPATH)
-            print("Model saved.")
+        # A job that finished between the lookup above and now has already saved the model
+        previous_job = self.training_jobs.get(MODEL_FILEPATH)
+        if previous_job is not None and previous_job.done() and not previous_job.failed() \
+                and self.model_cache.get(MODEL_FILEPATH):
+            return None
+
+        print(f"Model file not found at {MODEL_FILEPATH}. Training a new model in the background...")
+        return self.training_jobs.submit(MODEL_FILEPATH, lambda report: self._train_new_model(MODEL_FILEPATH, report))
+
+    def _train_new_model(self, MODEL_FILEPATH, report_progress):
+        """
+        Train a new model on the training data and save it (runs in the background training worker).
+
+        Parameters:
+        MODEL_FILEPATH (str): The path to save the model to.
+        report_progress (callable): Called as report_progress(stage, fraction done).
+
+        Returns:
+        NaiveBayes: The trained model.
+        """
+        # Training Data (streamed in chunks, or read back from the tokenized corpus cache)
+        report_progress("Loading training data and fitting model", 0.1)
+        try:
+            current_model, vocab = sentiment_analyser.train_from_csv(naive_bayes.NaiveBayes(), 'training_processed.csv')
+        except FileNotFoundError:
+            raise RuntimeError("Training data not found. Cannot proceed.")
+        except ValueError as e:
+            raise RuntimeError(f"Training data is invalid ({e}). Cannot proceed.")
+
+        # Save the Newly Trained Model (written atomically, so no request ever reads a partial file)
+        report_progress("Saving model", 0.9)
+        print(f"Saving the newly trained model to {MODEL_FILEPATH}...")
+        if not current_model.save(MODEL_FILEPATH):
+            raise RuntimeError(f"Could not save the trained model to {MODEL_FILEPATH}.")
+        self.model_cache.put(MODEL_FILEPATH, current_model)
+        print("Model saved.")
+
+        return current_model
+
+    def _predict_with_cache(self, model_version, current_model, texts, vocab, post_ids=None, post_metadata=None):
+        """
+        Predict the sentiment of every text, classifying only the posts missing from the prediction cache.
+
+        Parameters:
+        model_version (str): The content hash of the model's file, versioning the cached predictions.
+        current_model (NaiveBayes): The model (the one model_version was read with, see ModelCache.get_versioned).
+        texts (list): The post texts.
+        vocab (Vocabulary): The model's vocabulary.
+        post_ids (list): The posts' URIs, in the same order as texts. Texts are identified by their hash when None.
+        post_metadata (list): A dict per post with its author and created_at, recorded in the results store.
+
+        Returns:
+        list: One prediction per text.
+        """
+        model_version = model_version or f"model-{id(current_model)}"
+        if post_ids is None:
+            post_ids = [None] * len(texts)
+        keys = [post_key(text, uri) for text, uri in zip(texts, post_ids)]
+
+        predictions = self.prediction_cache.get_many(model_version, keys)
+        missing = [position for position in range(len(texts)) if position not in predictions]
+        if missing:
+            # Cache misses are scored together, in one batch
+            missing_texts = [texts[i] for i in missing]
+            if self.results_store is not None:
+                new_predictions, class_order, probabilities = sentiment_analyser.predict_proba(
+                    current_model, missing_texts, vocab)
+                scores = [{SENTIMENT_NAMES.get(label, "Negative"): float(row[column])
+                           for column, label in enumerate(class_order)} for row in probabilities]
+                metadata = [dict((post_metadata[i] if post_metadata is not None else None) or {}, uri=post_ids[i])
+                            for i in missing]
+                self.results_store.add_many(model_version, [keys[i] for i in missing], missing_texts,
+                                            [SENTIMENT_NAMES.get(label, "Negative") for label in new_predictions],
+                                            scores, metadata)
+            else:
+                new_predictions = sentiment_analyser.predict(current_model, missing_texts, vocab)
+            self.prediction_cache.put_many(model_version, [keys[i] for i in missing], new_predictions)
+            predictions.update(zip(missing, new_predictions))
+
+        print(f"Prediction cache: {len(texts) - len(missing)} hits, {len(missing)} misses.")
+        return [predictions[position] for position in range(len(texts))]
+
+    def _get_model(self, MODEL_FILEPATH):
+        """
+        Get the resident model, starting its training in the background if the file does not exist yet.
+
+        Parameters:
+        MODEL_FILEPATH (str): The path of the model file.
+
+        Returns:
+        tuple: (model, model version, None), or (None, None, message) while the model is warming up or when
+            training failed. The version is the one of that very model, even if the file was swapped since.
+        """
+        # Try to get the Pre-trained Model (resident in the cache after the first request)
+        current_model, model_version = self.model_cache.get_versioned(MODEL_FILEPATH)
+
+        if not current_model:
+            # Model Not Found - Train New Model in the background (shared by concurrent requests)
+            job = self.warm_up(MODEL_FILEPATH)
+            if job is not None:
+                try:
+                    trained_model = job.future.result(timeout=self.training_wait_seconds)
+                except FuturesTimeoutError:
+                    return None, None, (f"The sentiment model is warming up: {job.status()}. "
+                                        "Please try again shortly.")
+                except Exception as e:
+                    print(f"Error: Training a new model failed: {e}")
+                    return None, None, f"Error: {e}"
+                # The trained model is resident with its version, unless the file was replaced meanwhile
+                current_model, model_version = self.model_cache.get_versioned(MODEL_FILEPATH)
+                if current_model is None:
+                    current_model = trained_model
+            else:
+                current_model, model_version = self.model_cache.get_versioned(MODEL_FILEPATH)
+
+        return current_model, model_version, None
+
+    def classify(self, MODEL_FILEPATH, texts: list, post_ids: list = None, post_metadata: list = None):
+        """
+        Label the sentiment of every text, without the per-post output of run_model.
+
+        Parameters:
+        MODEL_FILEPATH (str): The path of the model file.
+        texts (list): The post texts.
+        post_ids (list): The posts' URIs, in the same order as texts (for the prediction cache).
+        post_metadata (list): A dict per post with its author and created_at (for the results store).
+
+        Returns:
+        list: "Positive", "Neutral" or "Negative" for each text.
+
+        Raises:
+        RuntimeError: If the model is warming up or unavailable.
+        """
+        current_model, model_version, message = self._get_model(MODEL_FILEPATH)
+        if current_model is None or not current_model.vocabulary:
+            raise RuntimeError(message or "Model or vocabulary is not available.")
+
+        predictions = self._predict_with_cache(model_version, current_model, texts, current_model.vocabulary,
+                                               post_ids, post_metadata)
+        return [SENTIMENT_NAMES.get(prediction, "Negative") for prediction in predictions]
+
+    def run_model(self, MODEL_FILEPATH, texts: list, post_ids: list = None, post_metadata: list = None,
+                  return_sentiments: bool = False):
+        """
+        Classify the texts and format the per-post output and sentiment counts.
+
+        Parameters:
+        MODEL_FILEPATH (str): The path of the model file.
+        texts (list): The post texts.
+        post_ids (list): The posts' URIs, in the same order as texts (for the prediction cache).
+        post_metadata (list): A dict per post with its author and created_at (for the results store).
+        return_sentiments (bool): Also return each post's label, so callers need not classify the posts again.
+
+        Returns:
+        tuple: (list of formatted results, sentiment counts), or (message, None) when the model is not ready.
+        With return_sentiments, a third item holds "Positive", "Neutral" or "Negative" per text (None with a message).
+        """
+        results, sentiment_counts, sentiments = self._run_model(MODEL_FILEPATH, texts, post_ids, post_metadata)
+        if return_sentiments:
+            return results, sentiment_counts, sentiments
+        return results, sentiment_counts
+
+    def _run_model(self, MODEL_FILEPATH, texts, post_ids, post_metadata):
+
+        current_model, model_version, message = self._get_model(MODEL_FILEPATH)
+        if message is not None:
+            return message, None, None
+
+        # Retrieve the vocabulary stored within the model
+        vocab = current_model.vocabulary if current_model else None
+        if vocab:
+            print(f"Using vocabulary with {len(vocab)} words from the loaded model.")
 
         # Testing Phase
         # Checking if we have a model and vocabulary before proceeding
@@ -72,9 +218,10 @@ class SentimentAnalyser:
             raise RuntimeError("Model or vocabulary is not available. Cannot proceed with testing.")
 
         print("\n--- Testing ---")
-        predictions = sentiment_analyser.predict(current_model, texts, vocab)
+        predictions = self._predict_with_cache(model_version, current_model, texts, vocab, post_ids, post_metadata)
 
         sentiment_counts = {"Positive": 0, "Neutral": 0, "Negative": 0, "Total": 0}
+        sentiments = [SENTIMENT_NAMES.get(prediction, "Negative") for prediction in predictions]
 
         print("\n--- Predictions ---")
         results = []
@@ -113,9 +260,9 @@ class SentimentAnalyser:
             results.append(f"Text: '{display_text}'\nSentiment:{sentiment}\n\n-------------------------------------------------------------\n")
 
         if not results:
-            return "No predictions were made.", {"Positive": 0, "Neutral": 0, "Negative": 0, "Total": 0}
+            return "No predictions were made.", {"Positive": 0, "Neutral": 0, "Negative": 0, "Total": 0}, []
 
-        return results, sentiment_counts
+        return results, sentiment_counts, sentiments
 
 
 if __name__ == '__main__':
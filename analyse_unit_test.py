@@ -0,0 +1,253 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import Mock, patch
+
+import numpy as np
+
+from analyse import SentimentAnalyser
+from bin import sentiment_analyser
+from bin.model_cache import ModelCache
+from bin.naive_bayes import NaiveBayes
+from bin.prediction_cache import PredictionCache
+from bin.training_jobs import TrainingJobManager
+
+VOCAB = ["awful", "great", "hate", "love", "okay"]
+X_TRAIN = [[0, 1, 0, 1, 0], [0, 0, 0, 1, 0], [1, 0, 1, 0, 0], [0, 0, 1, 0, 0], [0, 0, 0, 0, 1]]
+Y_TRAIN = np.array([2, 2, 0, 0, 1])
+
+
+def trained_model():
+    model = NaiveBayes()
+    model.fit(X_TRAIN, Y_TRAIN, VOCAB)
+    return model
+
+
+class TestModelCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.model_path = os.path.join(self.directory.name, "model.json")
+        trained_model().save(self.model_path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_model_loaded_once(self):
+        """Test that repeated lookups reuse the resident model."""
+        loader = Mock(side_effect=NaiveBayes.load)
+        cache = ModelCache(loader=loader)
+
+        first = cache.get(self.model_path)
+        second = cache.get(self.model_path)
+
+        self.assertIs(first, second)
+        self.assertEqual(loader.call_count, 1)
+        self.assertIsNotNone(cache.version(self.model_path))
+
+    def test_touched_but_unchanged_file_not_reloaded(self):
+        """Test that an mtime change alone does not reload when the content hash is unchanged."""
+        loader = Mock(side_effect=NaiveBayes.load)
+        cache = ModelCache(loader=loader)
+        first = cache.get(self.model_path)
+
+        stat = os.stat(self.model_path)
+        os.utime(self.model_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+        self.assertIs(cache.get(self.model_path), first)
+        self.assertEqual(loader.call_count, 1)
+
+    def test_changed_file_hot_reloaded(self):
+        """Test that a new model file replaces the resident model."""
+        cache = ModelCache()
+        first = cache.get(self.model_path)
+        first_version = cache.version(self.model_path)
+
+        retrained = NaiveBayes(smoothing=2)
+        retrained.fit(X_TRAIN, Y_TRAIN, VOCAB)
+        retrained.save(self.model_path)
+        stat = os.stat(self.model_path)
+        os.utime(self.model_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+        second = cache.get(self.model_path)
+        self.assertIsNot(second, first)
+        self.assertEqual(second.smoothing, 2)
+        self.assertNotEqual(cache.version(self.model_path), first_version)
+
+    def test_missing_file(self):
+        """Test that a missing model file gives None."""
+        self.assertIsNone(ModelCache().get(os.path.join(self.directory.name, "missing.json")))
+
+    def test_run_model_uses_resident_model(self):
+        """Test that SentimentAnalyser does not reload the model for every request."""
+        loader = Mock(side_effect=NaiveBayes.load)
+        analyser = SentimentAnalyser(model_cache=ModelCache(loader=loader))
+
+        _, first_counts = analyser.run_model(self.model_path, ["love it", "hate it"])
+        _, second_counts = analyser.run_model(self.model_path, ["great", "awful"])
+
+        self.assertEqual(loader.call_count, 1)
+        self.assertEqual(first_counts["Total"], 2)
+        self.assertEqual(second_counts, {"Positive": 1, "Neutral": 0, "Negative": 1, "Total": 2})
+
+    def test_predictions_keyed_on_version_of_model_used(self):
+        """Test that a hot reload during a request does not file its predictions under the new version."""
+        analyser = SentimentAnalyser()
+        first_version = ModelCache().get_versioned(self.model_path)[1]
+        get_versioned = analyser.model_cache.get_versioned
+
+        def get_then_reload(filepath):
+            pair = get_versioned(filepath)
+            # Another request picks up a retrained model before this one has predicted
+            retrained = NaiveBayes(smoothing=2)
+            retrained.fit(X_TRAIN, Y_TRAIN, VOCAB)
+            retrained.save(filepath)
+            stat = os.stat(filepath)
+            os.utime(filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+            analyser.model_cache.get(filepath)
+            return pair
+
+        analyser.model_cache.get_versioned = get_then_reload
+        analyser.run_model(self.model_path, ["love it"], ["at://a"])
+
+        self.assertNotEqual(analyser.model_cache.version(self.model_path), first_version)
+        self.assertEqual(len(analyser.prediction_cache.get_many(first_version, ["at://a"])), 1)
+        self.assertEqual(analyser.prediction_cache.get_many(analyser.model_cache.version(self.model_path),
+                                                            ["at://a"]), {})
+
+
+class TestPredictionCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.model_path = os.path.join(self.directory.name, "model.json")
+        trained_model().save(self.model_path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_only_unseen_posts_are_classified(self):
+        """Test that posts seen before (by URI or by text) are not scored again."""
+        analyser = SentimentAnalyser()
+        with patch("analyse.sentiment_analyser.predict", side_effect=sentiment_analyser.predict) as predict:
+            first, first_counts = analyser.run_model(self.model_path, ["love it", "hate it"], ["at://a", "at://b"])
+            second, second_counts = analyser.run_model(self.model_path, ["love it", "hate it", "okay"],
+                                                       ["at://a", None, None])
+
+        self.assertEqual(first, second[:2])
+        self.assertEqual(second_counts["Total"], 3)
+        self.assertEqual([call.args[1] for call in predict.call_args_list],
+                         [["love it", "hate it"], ["hate it", "okay"]])
+        self.assertEqual(analyser.prediction_cache.stats()["hits"], 1)
+
+    def test_new_model_version_not_served_old_predictions(self):
+        """Test that replacing the model file invalidates the cached predictions."""
+        analyser = SentimentAnalyser()
+        analyser.run_model(self.model_path, ["love it"], ["at://a"])
+
+        retrained = NaiveBayes(smoothing=2)
+        retrained.fit(X_TRAIN, Y_TRAIN, VOCAB)
+        retrained.save(self.model_path)
+        stat = os.stat(self.model_path)
+        os.utime(self.model_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+        analyser.run_model(self.model_path, ["love it"], ["at://a"])
+        self.assertEqual(analyser.prediction_cache.stats()["misses"], 2)
+
+    def test_run_model_returns_sentiments(self):
+        analyser = SentimentAnalyser()
+        _, counts, sentiments = analyser.run_model(self.model_path, ["love it", "hate it"], return_sentiments=True)
+        self.assertEqual(sentiments, ["Positive", "Negative"])
+        self.assertEqual(counts["Total"], 2)
+
+    def test_classify_labels_posts(self):
+        analyser = SentimentAnalyser()
+        self.assertEqual(analyser.classify(self.model_path, ["love it", "hate it"]), ["Positive", "Negative"])
+
+        release = threading.Event()
+        warming_up = SentimentAnalyser()
+        warming_up._train_new_model = lambda model_path, report: release.wait(5)
+        with self.assertRaises(RuntimeError):
+            warming_up.classify(os.path.join(self.directory.name, "missing.json"), ["love it"])
+        release.set()
+
+    def test_cache_is_bounded(self):
+        cache = PredictionCache(max_entries=2)
+        cache.put_many("v1", ["a", "b", "c"], [0, 1, 2])
+        self.assertEqual(cache.get_many("v1", ["a", "b", "c"]), {1: 1, 2: 2})
+
+
+class TestBackgroundTraining(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.model_path = os.path.join(self.directory.name, "model.json")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_concurrent_submits_share_one_job(self):
+        """Test that a key with a running job is not trained a second time."""
+        manager = TrainingJobManager()
+        release = threading.Event()
+        calls = []
+
+        def train(report):
+            calls.append(1)
+            report("Working", 0.5)
+            release.wait(5)
+            return "model"
+
+        first = manager.submit("model.json", train)
+        second = manager.submit("model.json", train)
+        release.set()
+
+        self.assertIs(first, second)
+        self.assertEqual(first.future.result(timeout=5), "model")
+        self.assertEqual(len(calls), 1)
+        manager.shutdown()
+
+    def test_failed_job_reported_and_retried(self):
+        """Test that a failed job surfaces its error and a later submit starts a new job."""
+        manager = TrainingJobManager()
+
+        def fail(report):
+            raise RuntimeError("no data")
+
+        job = manager.submit("model.json", fail)
+        with self.assertRaises(RuntimeError):
+            job.future.result(timeout=5)
+        self.assertIn("no data", job.status())
+
+        retry = manager.submit("model.json", lambda report: "model")
+        self.assertIsNot(retry, job)
+        self.assertEqual(retry.future.result(timeout=5), "model")
+        manager.shutdown()
+
+    def test_first_request_gets_warming_up_response(self):
+        """Test that a missing model is trained in the background while requests get a warming up message."""
+        release = threading.Event()
+        analyser = SentimentAnalyser()
+
+        def train_new_model(model_path, report):
+            release.wait(5)
+            model = trained_model()
+            model.save(model_path)
+            analyser.model_cache.put(model_path, model)
+            return model
+
+        analyser._train_new_model = train_new_model
+
+        message, counts = analyser.run_model(self.model_path, ["love it"])
+        self.assertIn("warming up", message)
+        self.assertIsNone(counts)
+        self.assertIs(analyser.warm_up(self.model_path), analyser.training_jobs.get(self.model_path))
+
+        release.set()
+        analyser.training_jobs.get(self.model_path).future.result(timeout=5)
+
+        _, counts = analyser.run_model(self.model_path, ["love it"])
+        self.assertEqual(counts["Total"], 1)
+        self.assertEqual(os.listdir(self.directory.name), ["model.json"])  # No temporary files left behind
+
+
+if __name__ == "__main__":
+    unittest.main()
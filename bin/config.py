@@ -6,4 +6,38 @@
 
 
 # Smoothing factor for the laplace smoothing in the Naive Bayes algorithm
-smoothingFactor = 1
\ No newline at end of file
+smoothingFactor = 1
+
+# Naive Bayes event model used by newly trained models: "bernoulli", "multinomial" or "complement".
+# All three share the same counts; saved models keep the variant they were trained with
+naiveBayesVariant = "bernoulli"
+
+# Number of CSV rows read (and tokenized) at a time when loading training data
+trainingChunkSize = 10000
+
+# Directory for the tokenized training corpus cache (None disables the cache)
+corpusCacheDirectory = "corpus_cache"
+
+# Number of worker processes used by sentiment_analyser.train (1 trains in the current process)
+trainingProcesses = 1
+
+# Number of hash buckets for feature hashing (e.g. 2 ** 18). With None, the model keeps an explicit
+# vocabulary, whose size grows with every new term seen in training
+hashingFeatures = None
+
+# Word n-grams used as features, as (smallest n, largest n). (1, 2) adds pairs of consecutive words,
+# such as "not good", to the single words; at most 3 words per n-gram
+ngramRange = (1, 1)
+# With n-grams, training counts them in a table of at most this many terms (12 bytes each), pruning the
+# least frequent when it fills. This also caps the vocabulary, and with it the model's size
+ngramMaxTerms = 500000
+# N-grams of two or more words seen in fewer training posts than this are dropped
+ngramMinCount = 2
+
+# Feature selection after counting the training corpus (see bin/feature_selection.py). The defaults keep
+# every term; e.g. minDocumentFrequency = 2 drops the terms seen in a single training post
+minDocumentFrequency = 1  # Fewest training documents a term must appear in
+maxDocumentFrequency = 1.0  # Largest share of the training documents a term may appear in
+maxFeatures = None  # Keep only this many most frequent terms (None for no cap)
+selectedFeatures = None  # Keep only this many terms with the best featureScore (None to keep all)
+featureScore = "chi2"  # "chi2" or "mutual_info"
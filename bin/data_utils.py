@@ -1,33 +1,37 @@
-import nltk
-from nltk.corpus import stopwords
+from array import array
+from collections import defaultdict
+from itertools import accumulate, chain, count, islice
+
+import numpy as np
 from tqdm import tqdm
 
-# Download stopwords if not already downloaded
-nltk.download('stopwords', quiet=True)
-stop_words = set(stopwords.words('english'))
+from bin.sparse_vectors import SparseVectors
+from bin.tokenizer import ENGLISH_STOP_WORDS, tokenize, tokenize_batch
+from bin.vocabulary import Vocabulary
+
+stop_words = ENGLISH_STOP_WORDS
 
 
-def build_vocab(texts):
+def build_vocab(texts, tokenized=None, ngram_range=(1, 1)):
     """
     Function to build a vocabulary from a list of texts.
 
     Parameters:
     texts (list): List of text data to build vocabulary from.
+    tokenized (list): The texts already passed through tokenize_batch, to avoid tokenizing them again.
+    ngram_range (tuple): Smallest and largest number of consecutive words per term (see tokenizer.ngram_terms).
 
     Returns:
-    list: Sorted list of unique words (vocabulary) from the input texts.
+    Vocabulary: Sorted unique words (vocabulary) from the input texts, indexed for O(1) lookups.
     """
-    vocab = set()
+    if tokenized is None:
+        tokenized = tokenize_batch(tqdm(texts, desc="Tokenizing texts..."), ngram_range=ngram_range)
 
-    for text in tqdm(texts, desc="Building vocabulary..."):
-        text = str(text)
-        words = text.lower().split()  # Splitting the text into words and converting to lowercase for consistency
-
-        # Filtering out stop words
-        filtered_words = [word for word in words if word not in stop_words]
-        vocab.update(filtered_words)
+    vocab = set()
+    for terms in tokenized:  # Stop words were filtered out by tokenize_batch
+        vocab.update(terms)
 
-    return sorted(list(vocab))  # Sorting for consistency 
+    return Vocabulary(sorted(vocab), ngram_range)  # Sorting for consistency
 
 
 def text_to_binary_vectors(texts, vocab):
@@ -36,18 +40,114 @@ def text_to_binary_vectors(texts, vocab):
 
     Parameters:
     texts (list): List of text data to be vectorized.
-    vocab (list): List of words forming the vocabulary.
+    vocab (Vocabulary or list): The words forming the vocabulary.
 
     Returns:
     list: List of binary vectors corresponding to each text in the input texts.
     """
+    if not isinstance(vocab, Vocabulary):
+        vocab = Vocabulary(vocab)
+
     vectors = []
 
     for text in tqdm(texts, desc="Vectorizing texts..."):
-        text = str(text)
-        words = set(text.lower().split())  # Each unique word in the text
+        words = set(tokenize(text))  # Each unique word in the text
 
-        vector = [1 if word in words else 0 for word in vocab]
+        vector = [0] * len(vocab)
+        for position in vocab.indices(words):
+            vector[position] = 1
         vectors.append(vector)
 
-    return vectors
\ No newline at end of file
+    return vectors
+
+
+def text_to_sparse_vectors(texts, vocab, tokenized=None):
+    """
+    Function to convert texts into sparse binary vectors based on the vocabulary.
+
+    Only the vocabulary indices of the words present in each text are stored, so memory grows with
+    the length of the texts rather than with the size of the vocabulary. The texts are split into
+    terms with the vocabulary's n-gram range.
+
+    Parameters:
+    texts (list): List of text data to be vectorized.
+    vocab (Vocabulary or list): The words forming the vocabulary.
+    tokenized (list): The texts already passed through tokenize_batch, to avoid tokenizing them again.
+
+    Returns:
+    SparseVectors: CSR-style vectors corresponding to each text in the input texts.
+    """
+    if not isinstance(vocab, Vocabulary):
+        vocab = Vocabulary(vocab)
+
+    indptr = array('q', [0])
+    indices = array('I')
+
+    if tokenized is None:
+        tokenized = tokenize_batch(texts, ngram_range=vocab.ngram_range)
+
+    for words in tqdm(tokenized, desc="Vectorizing texts..."):  # Each unique word in the text
+        indices.extend(vocab.indices(words))
+        indptr.append(len(indices))
+
+    return SparseVectors(np.frombuffer(indptr, dtype=np.int64), np.frombuffer(indices, dtype=np.uint32), len(vocab))
+
+
+class CorpusBuilder:
+    """
+    Builds the vocabulary and the sparse vectors of a corpus in a single pass over its documents.
+
+    Terms get ids in order of first appearance as documents are added (the id lookup and assignment
+    run in C, through a defaultdict), and are re-numbered in sorted vocabulary order by build(), so
+    the result matches build_vocab followed by text_to_sparse_vectors without tokenizing twice.
+    """
+
+    def __init__(self):
+        self._word_ids = defaultdict(count().__next__)
+        self._indptr = array('q', [0])
+        self._indices = array('I')
+
+    def add(self, terms):
+        """
+        Add one document.
+
+        Parameters:
+        terms (iterable): The document's distinct terms (see tokenizer.document_terms).
+
+        Returns:
+        None
+        """
+        self._indices.extend(map(self._word_ids.__getitem__, terms))
+        self._indptr.append(len(self._indices))
+
+    def add_texts(self, texts):
+        """
+        Tokenize and add several documents.
+
+        Parameters:
+        texts (iterable): The documents' texts.
+
+        Returns:
+        None
+        """
+        tokenized = tokenize_batch(texts)
+        self._indices.extend(map(self._word_ids.__getitem__, chain.from_iterable(tokenized)))
+        # The end offset of each document (accumulate's initial value is the current end, already stored)
+        self._indptr.extend(islice(accumulate(map(len, tokenized), initial=self._indptr[-1]), 1, None))
+
+    def build(self):
+        """
+        Return the corpus added so far.
+
+        Returns:
+        tuple: (SparseVectors, Vocabulary) with the vocabulary sorted, as build_vocab returns it.
+        """
+        word_ids = self._word_ids
+        terms = sorted(word_ids)
+        sorted_position = np.empty(len(terms), dtype=np.uint32)
+        sorted_position[[word_ids[term] for term in terms]] = np.arange(len(terms), dtype=np.uint32)
+
+        vocab = Vocabulary(terms)
+        X = SparseVectors(np.frombuffer(self._indptr, dtype=np.int64).copy(),
+                          sorted_position[np.frombuffer(self._indices, dtype=np.uint32)], len(vocab))
+        return X, vocab
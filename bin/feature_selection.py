@@ -0,0 +1,105 @@
+import numpy as np
+
+from bin.config import (featureScore, maxDocumentFrequency, maxFeatures, minDocumentFrequency,
+                        selectedFeatures)
+
+SCORES = ("chi2", "mutual_info")
+
+
+def chi2_scores(class_counts, feature_counts):
+    """
+    Function scores every feature by its chi-squared statistic against the classes.
+
+    Parameters:
+    class_counts (numpy.ndarray): Documents per class, shape (classes,).
+    feature_counts (numpy.ndarray): Documents containing each feature per class, shape (classes, features).
+
+    Returns:
+    numpy.ndarray: One score per feature (higher means more dependent on the class).
+    """
+    total_documents = class_counts.sum()
+    document_frequency = feature_counts.sum(axis=0)
+    # Counts expected in every (class, feature) cell if the feature ignored the class
+    expected = np.outer(class_counts / total_documents, document_frequency)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cells = np.where(expected > 0, (feature_counts - expected) ** 2 / expected, 0.0)
+    return cells.sum(axis=0)
+
+
+def mutual_information_scores(class_counts, feature_counts):
+    """
+    Function scores every feature by the mutual information between its presence and the class.
+
+    Parameters:
+    class_counts (numpy.ndarray): Documents per class, shape (classes,).
+    feature_counts (numpy.ndarray): Documents containing each feature per class, shape (classes, features).
+
+    Returns:
+    numpy.ndarray: One score per feature, in nats.
+    """
+    total_documents = class_counts.sum()
+    present = feature_counts / total_documents  # P(class, feature present)
+    absent = (class_counts[:, np.newaxis] - feature_counts) / total_documents  # P(class, feature absent)
+    class_probability = (class_counts / total_documents)[:, np.newaxis]
+
+    scores = np.zeros(feature_counts.shape[1])
+    for joint in (present, absent):
+        feature_probability = joint.sum(axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            terms = joint * np.log(joint / (class_probability * feature_probability))
+        scores += np.where(joint > 0, terms, 0.0).sum(axis=0)  # 0 log 0 = 0
+    return scores
+
+
+def select_features(class_counts, feature_counts, min_df=minDocumentFrequency, max_df=maxDocumentFrequency,
+                    max_features=maxFeatures, k=selectedFeatures, score=featureScore):
+    """
+    Function chooses the features to keep from a corpus's per-class document counts.
+
+    Features outside [min_df, max_df] are dropped first, then all but the max_features most frequent,
+    then all but the k best scoring.
+
+    Parameters:
+    class_counts (numpy.ndarray): Documents per class, shape (classes,).
+    feature_counts (numpy.ndarray): Documents containing each feature per class, shape (classes, features).
+    min_df (int): Fewest documents a feature must appear in.
+    max_df (float): Largest share of the documents a feature may appear in.
+    max_features (int): Number of most frequent features kept, or None for no cap.
+    k (int): Number of best scoring features kept, or None to keep all.
+    score (str): "chi2" or "mutual_info", the score used for k.
+
+    Returns:
+    numpy.ndarray: Sorted positions of the kept features.
+    """
+    if score not in SCORES:
+        raise ValueError(f"Unknown feature score {score!r}. Choose from {', '.join(SCORES)}.")
+
+    document_frequency = feature_counts.sum(axis=0)
+    keep = (document_frequency >= min_df) & (document_frequency <= max_df * class_counts.sum())
+    kept = np.flatnonzero(keep)
+
+    if max_features is not None and len(kept) > max_features:
+        # Stable sort, so ties keep the earlier (alphabetically first) features
+        most_frequent = np.argsort(-document_frequency[kept], kind="stable")[:max_features]
+        kept = np.sort(kept[most_frequent])
+
+    if k is not None and len(kept) > k:
+        scorer = chi2_scores if score == "chi2" else mutual_information_scores
+        scores = scorer(class_counts, feature_counts[:, kept])
+        kept = np.sort(kept[np.argsort(-scores, kind="stable")[:k]])
+
+    return kept
+
+
+def selection_enabled(min_df=minDocumentFrequency, max_df=maxDocumentFrequency, max_features=maxFeatures,
+                      k=selectedFeatures):
+    """
+    Function checks whether the options would drop anything at all.
+
+    Parameters:
+    min_df, max_df, max_features, k: As for select_features.
+
+    Returns:
+    bool: False when every feature is kept whatever the corpus.
+    """
+    return min_df > 1 or max_df < 1.0 or max_features is not None or k is not None
@@ -0,0 +1,147 @@
+import os
+import threading
+
+from bin.model_format import file_digest
+from bin.naive_bayes import NaiveBayes
+
+
+class _CacheEntry:
+    def __init__(self, model, signature, digest):
+        self.model = model
+        self.signature = signature  # (mtime_ns, size) of the file the model was loaded from
+        self.digest = digest  # SHA-256 of the file's content, used as the model version
+
+
+def _file_signature(filepath):
+    stat = os.stat(filepath)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class ModelCache:
+    """
+    Keeps loaded models resident, keyed by file path.
+
+    Every lookup costs one os.stat. The model is only reloaded when the file's mtime or size changes
+    and its content hash differs from the cached one. A reload builds a new model object and then
+    swaps the reference, so requests already holding the previous model finish with it undisturbed.
+    """
+
+    def __init__(self, loader=NaiveBayes.load):
+        self._loader = loader
+        self._entries = {}
+        self._lock = threading.Lock()  # Serialises (re)loads, so concurrent requests load a file only once
+
+    def get(self, filepath):
+        """
+        Return the model stored at filepath, loading or hot-reloading it when needed.
+
+        Parameters:
+        filepath (str): The path of the model file.
+
+        Returns:
+        NaiveBayes: The loaded model, or None if the file is missing or cannot be loaded.
+        """
+        entry = self._entry(filepath)
+        return entry.model if entry is not None else None
+
+    def get_versioned(self, filepath):
+        """
+        Return the model stored at filepath together with its version, as one consistent pair.
+
+        A hot reload between get() and version() would pair the previous model with the new version;
+        results keyed on the version must use this method instead.
+
+        Parameters:
+        filepath (str): The path of the model file.
+
+        Returns:
+        tuple: (NaiveBayes, hex digest of the file it was loaded from), or (None, None) if the file is
+            missing or cannot be loaded.
+        """
+        entry = self._entry(filepath)
+        return (entry.model, entry.digest) if entry is not None else (None, None)
+
+    def _entry(self, filepath):
+        # The resident entry of filepath, (re)loaded when the file changed
+        entry = self._entries.get(filepath)
+        try:
+            signature = _file_signature(filepath)
+        except OSError:
+            return None
+
+        if entry is not None and entry.signature == signature:
+            return entry
+
+        with self._lock:
+            # Another request may have (re)loaded the file while this one waited for the lock
+            entry = self._entries.get(filepath)
+            try:
+                signature = _file_signature(filepath)
+                if entry is not None and entry.signature == signature:
+                    return entry
+
+                digest = file_digest(filepath)
+            except OSError:
+                return None
+
+            if entry is not None and entry.digest == digest:
+                # Touched but unchanged, so the resident model stays
+                self._entries[filepath] = _CacheEntry(entry.model, signature, digest)
+                return self._entries[filepath]
+
+            print(f"Model cache: loading {filepath}...")
+            model = self._loader(filepath)
+            if model is None:
+                return entry
+
+            self._entries[filepath] = _CacheEntry(model, signature, digest)
+            return self._entries[filepath]
+
+    def put(self, filepath, model):
+        """
+        Make a model that was just saved to filepath resident without loading it back.
+
+        Parameters:
+        filepath (str): The path the model was saved to.
+        model (NaiveBayes): The model.
+
+        Returns:
+        None
+        """
+        with self._lock:
+            try:
+                self._entries[filepath] = _CacheEntry(model, _file_signature(filepath), file_digest(filepath))
+            except OSError:
+                self._entries.pop(filepath, None)
+
+    def version(self, filepath):
+        """
+        Return the content hash of the resident model for filepath.
+
+        The resident model may be swapped at any time, so this is not necessarily the version of a model
+        obtained earlier with get(); see get_versioned.
+
+        Parameters:
+        filepath (str): The path of the model file.
+
+        Returns:
+        str: Hex digest of the model file, or None if no model is resident.
+        """
+        entry = self._entries.get(filepath)
+        return entry.digest if entry is not None else None
+
+    def invalidate(self, filepath=None):
+        """
+        Drop one resident model (or all of them), forcing the next get() to load from disk.
+
+        Parameters:
+        filepath (str): The path to drop. Drops every entry when None.
+
+        Returns:
+        None
+        """
+        with self._lock:
+            if filepath is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(filepath, None)
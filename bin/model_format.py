@@ -0,0 +1,211 @@
+#
+### model_format.py
+#
+# Compact binary container for trained models, and a converter between it and the JSON format.
+#
+# Layout (all integers little-endian):
+#   MAGIC (8 bytes) | header length (uint64) | JSON header | padding | aligned array sections...
+#
+# The header describes every section by offset, dtype and shape, so the arrays can be opened with
+# numpy.memmap and shared, through the page cache, between every process that loads the same file.
+#
+
+import hashlib
+import json
+import os
+import struct
+import sys
+import tempfile
+from contextlib import contextmanager
+
+import numpy as np
+
+MAGIC = b"BSNBMDL\x00"
+FORMAT_VERSION = 1
+BINARY_MODEL_EXTENSION = ".nbm"
+SECTION_ALIGNMENT = 64  # Byte alignment of every section, so memory-mapped arrays are well aligned
+
+_HEADER_LENGTH = struct.Struct("<Q")
+
+
+def is_binary_model(filepath):
+    """
+    Check whether a file is a binary model (by its magic bytes, not its extension).
+
+    Parameters:
+    filepath (str): The path of the model file.
+
+    Returns:
+    bool: True if the file starts with the binary model magic bytes.
+    """
+    try:
+        with open(filepath, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def file_digest(filepath):
+    """
+    Function hashes a file's content, reading it in blocks.
+
+    Parameters:
+    filepath (str): The path of the file.
+
+    Returns:
+    str: Hex SHA-256 digest of the content.
+    """
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@contextmanager
+def atomic_output(filepath, mode='wb', **open_kwargs):
+    """
+    Open a temporary file next to filepath and move it over filepath only once it is fully written.
+
+    Readers (and memory-mapped models) therefore see either the old file or the complete new one,
+    never a partially written file.
+
+    Parameters:
+    filepath (str): The final path of the file.
+    mode (str): File mode for the temporary file ('wb' or 'w').
+    **open_kwargs: Extra arguments for opening the temporary file (e.g. encoding).
+
+    Returns:
+    file: The open temporary file (as a context manager).
+    """
+    directory = os.path.dirname(os.path.abspath(filepath))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix="-" + os.path.basename(filepath))
+    try:
+        with os.fdopen(fd, mode, **open_kwargs) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates owner-only files; keep the permissions of the file being replaced instead
+        permissions = os.stat(filepath).st_mode & 0o777 if os.path.exists(filepath) else 0o644
+        os.chmod(temp_path, permissions)
+        os.replace(temp_path, filepath)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _aligned(position):
+    return (position + SECTION_ALIGNMENT - 1) // SECTION_ALIGNMENT * SECTION_ALIGNMENT
+
+
+def write_binary_model(filepath, header, sections):
+    """
+    Write a header and named arrays to a binary model file.
+
+    Parameters:
+    filepath (str): The path to write to.
+    header (dict): JSON-serializable model metadata.
+    sections (dict): Mapping of section name to numpy array (or bytes, stored as uint8).
+
+    Returns:
+    None
+    """
+    arrays = {}
+    for name, data in sections.items():
+        if isinstance(data, (bytes, bytearray)):
+            data = np.frombuffer(data, dtype=np.uint8)
+        arrays[name] = np.ascontiguousarray(data)
+
+    # The section table holds the offsets, which depend on the header's own length, so the header is
+    # laid out until its size (and therefore every offset) stops changing
+    header = dict(header, format_version=FORMAT_VERSION)
+    header_bytes = b""
+    while True:
+        position = _aligned(len(MAGIC) + _HEADER_LENGTH.size + len(header_bytes))
+        table = {}
+        for name, array in arrays.items():
+            table[name] = {"offset": position, "dtype": array.dtype.str, "shape": list(array.shape)}
+            position = _aligned(position + array.nbytes)
+        new_header_bytes = json.dumps(dict(header, sections=table)).encode('utf-8')
+        settled = len(new_header_bytes) == len(header_bytes)
+        header_bytes = new_header_bytes
+        if settled:
+            break
+
+    with atomic_output(filepath, 'wb') as f:
+        f.write(MAGIC)
+        f.write(_HEADER_LENGTH.pack(len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.write(b"\0" * (table[name]["offset"] - f.tell()))
+            f.write(array.tobytes())
+
+
+def read_binary_model(filepath, mmap=True):
+    """
+    Read the header and arrays of a binary model file.
+
+    Parameters:
+    filepath (str): The path of the model file.
+    mmap (bool): Memory-map the arrays read-only instead of reading them into private memory.
+
+    Returns:
+    tuple: (header dict, mapping of section name to numpy array).
+    """
+    with open(filepath, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{filepath} is not a binary model file.")
+        (header_length,) = _HEADER_LENGTH.unpack(f.read(_HEADER_LENGTH.size))
+        header = json.loads(f.read(header_length).decode('utf-8'))
+
+        if header.get("format_version", 0) > FORMAT_VERSION:
+            raise ValueError(f"{filepath} uses binary model format version {header['format_version']}, "
+                             f"newer than the supported version {FORMAT_VERSION}.")
+
+        sections = {}
+        for name, section in header.pop("sections", {}).items():
+            dtype = np.dtype(section["dtype"])
+            shape = tuple(section["shape"])
+            count = int(np.prod(shape, dtype=np.int64))
+
+            if count == 0:
+                sections[name] = np.zeros(shape, dtype=dtype)
+            elif mmap:
+                sections[name] = np.memmap(filepath, dtype=dtype, mode='r', offset=section["offset"], shape=shape)
+            else:
+                f.seek(section["offset"])
+                sections[name] = np.frombuffer(f.read(count * dtype.itemsize), dtype=dtype).reshape(shape)
+
+    return header, sections
+
+
+def convert_model(source_path, target_path, target_format=None):
+    """
+    Convert a saved model between the JSON and binary formats.
+
+    Parameters:
+    source_path (str): The model to convert (either format, detected from its content).
+    target_path (str): Where to write the converted model.
+    target_format (str): "json" or "binary". Defaults to the format implied by target_path's extension.
+
+    Returns:
+    bool: True if the model was converted.
+    """
+    from bin.naive_bayes import NaiveBayes
+
+    model = NaiveBayes.load(source_path)
+    if model is None:
+        print(f"Error: Could not load model from {source_path}.")
+        return False
+
+    return model.save(target_path, target_format=target_format)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (3, 4):
+        print("Usage: python -m bin.model_format <source model> <target model> [json|binary]")
+        sys.exit(2)
+
+    converted = convert_model(sys.argv[1], sys.argv[2], sys.argv[3] if len(sys.argv) == 4 else None)
+    sys.exit(0 if converted else 1)
@@ -1,132 +1,561 @@
-import math
 import os
 import json
-from tqdm import tqdm
+import numpy as np
 
-from bin.config import smoothingFactor
+from bin.config import naiveBayesVariant, smoothingFactor
+from bin.model_format import (BINARY_MODEL_EXTENSION, atomic_output, is_binary_model, read_binary_model,
+                              write_binary_model)
+from bin.sparse_vectors import SparseVectors
+from bin.vocabulary import HashingVocabulary, Vocabulary
+
+# Event models the counts can be scored with (see NaiveBayes._get_scoring_tables)
+VARIANTS = ("bernoulli", "multinomial", "complement")
 
 
 class NaiveBayes:
-    def __init__(self, smoothing=smoothingFactor):
-        self.priors = {}
-        self.likelihoods = {}
+    def __init__(self, smoothing=smoothingFactor, variant=naiveBayesVariant):
+        if variant not in VARIANTS:
+            raise ValueError(f"Unknown Naive Bayes variant {variant!r}. Choose from {', '.join(VARIANTS)}.")
+
+        self._priors = {}
+        self._likelihoods = {}
         self.smoothing = smoothing
+        self.variant = variant
         self.classes = set()
-        self.vocabulary = []
+        self.vocabulary = Vocabulary()
+        self._scoring_tables = None  # Log-probability tables built lazily from priors and likelihoods
+
+        # Raw counts, with rows in sorted class order: documents per class, and per class the number of
+        # documents each feature appears in. Priors and likelihoods are derived from them on demand.
+        self._class_counts = None
+        self._feature_counts = None
+
+    @property
+    def priors(self):
+        """
+        P(class) as a dictionary of class label : prior.
+        """
+        if self._priors is None:
+            self._priors = {}
+            if self._class_counts is None:
+                return self._priors
+            total_documents = self._class_counts.sum()
+            # How often each class appears among the documents seen so far
+            for row, class_label in enumerate(sorted(self.classes)):
+                self._priors[class_label] = self._class_counts[row] / total_documents
+        return self._priors
+
+    @priors.setter
+    def priors(self, priors):
+        self._priors = priors
+        self._scoring_tables = None
+
+    @property
+    def likelihoods(self):
+        """
+        P(feature=1|class) as a dictionary of class label : {feature index : likelihood}.
+
+        For the multinomial variant this is P(token|class), and for the complement variant the
+        probability of the token among the tokens of every other class.
+
+        Trained models derive it from their raw counts, and models loaded from the binary format from
+        their array tables, so the dictionary is only built on first access.
+        """
+        if not self._likelihoods:
+            if self._feature_counts is not None:
+                likelihood_table = self._likelihood_table_from_counts()
+            elif self._scoring_tables is not None:
+                likelihood_table = self._scoring_tables["likelihoods"]
+            else:
+                return self._likelihoods
+
+            # Dictionary mapping feature index : likelihood
+            self._likelihoods = {class_label: dict(enumerate(likelihood_table[row].tolist()))
+                                 for row, class_label in enumerate(sorted(self.classes))}
+        return self._likelihoods
+
+    @likelihoods.setter
+    def likelihoods(self, likelihoods):
+        self._likelihoods = likelihoods
+        self._scoring_tables = None
+
+    def has_counts(self):
+        """
+        Whether the model holds the raw counts needed by partial_fit (models saved before counts were
+        stored only hold likelihoods).
+
+        Returns:
+        bool: True if the raw counts are available.
+        """
+        return self._feature_counts is not None
+
+    def _likelihood_table_from_counts(self):
+        if self.variant == "bernoulli":
+            # Laplace Smoothing (positive count + smoothing) / (class documents + smoothing * 2 possible values (0 or 1))
+            return (self._feature_counts + self.smoothing) / (self._class_counts[:, np.newaxis] + self.smoothing * 2)
+
+        # The feature counts are read as token counts, every token counted once per document
+        token_counts = np.asarray(self._feature_counts, dtype=np.float64)
+        if self.variant == "complement":
+            if not self.smoothing:
+                raise ValueError("The complement variant needs a smoothing factor above 0.")
+            # Tokens of every other class
+            token_counts = token_counts.sum(axis=0) - token_counts
+
+        # Laplace Smoothing (token count + smoothing) / (all tokens + smoothing * vocabulary size)
+        return (token_counts + self.smoothing) / (token_counts.sum(axis=1, keepdims=True)
+                                                  + self.smoothing * token_counts.shape[1])
+
+    def _counts_changed(self):
+        # Everything derived from the counts is rebuilt on next use
+        self._priors = None
+        self._likelihoods = {}
+        self._scoring_tables = None
+
+    def reset(self, vocabulary=()):
+        """
+        Forget everything learned, keeping only the smoothing factor and the variant.
+
+        Parameters:
+        vocabulary (Vocabulary or list): The vocabulary of the emptied model.
+
+        Returns:
+        None
+        """
+        self.vocabulary = vocabulary if isinstance(vocabulary, Vocabulary) else Vocabulary(vocabulary)
+        self.classes = set()
+        self._class_counts = None
+        self._feature_counts = None
+        self._counts_changed()
 
     def fit(self, X, y, vocabulary):
         """
         Train the NaiveBayes model using the provided data.
 
         Parameters:
-        X (list): List of feature vectors (documents).
+        X (list or SparseVectors): List of dense binary feature vectors (documents), or SparseVectors.
         y (list): List of class labels corresponding to the documents.
-        vocabulary (list): The vocabulary used for feature extraction.
+        vocabulary (Vocabulary or list): The vocabulary used for feature extraction.
 
         Returns:
         None
         """
-        self.vocabulary = vocabulary  # Store the vocabulary
-        total_documents = len(y)
-        self.classes = set(y)
+        # Dense binary vectors are reduced to the indices of their present features, so both
+        # representations share the same one-pass counting code
+        if not isinstance(X, SparseVectors):
+            X = SparseVectors.from_dense(X, len(vocabulary))
+        self.fit_sparse(X, y, vocabulary)
+
+    def fit_sparse(self, X, y, vocabulary):
+        """
+        Train the NaiveBayes model from sparse documents.
+
+        Parameters:
+        X (SparseVectors or list): SparseVectors, or one iterable of (unique) present vocabulary indices per document.
+        y (list): List of class labels corresponding to the documents.
+        vocabulary (Vocabulary or list): The vocabulary used for feature extraction.
 
-        if total_documents == 0:
+        Returns:
+        None
+        """
+        if not isinstance(X, SparseVectors):
+            X = SparseVectors.from_rows(X, len(vocabulary))
+        if len(X) != len(y):
+            raise ValueError(f"Got {len(X)} documents but {len(y)} labels.")
+
+        # Store the vocabulary
+        self.reset(vocabulary)
+        y = np.asarray(y)
+        self.classes = set(y.tolist())
+
+        if len(y) == 0:
             print("Warning: Training data is empty.")
+            return
+
+        self._class_counts, self._feature_counts = self._count_features(
+            X, y, sorted(self.classes), len(self.vocabulary))
+
+    def partial_fit(self, X, y, vocabulary=None):
+        """
+        Fold a new batch of labelled documents into the model without reprocessing earlier data.
 
-        # Counting how many times each class appears in y
-        for class_label in self.classes:
-            documents_in_class = (y == class_label).sum()
-            self.priors[class_label] = documents_in_class / total_documents
+        The batch's counts are added to the stored raw counts; priors and likelihoods are re-derived
+        lazily. The vocabulary may grow, as long as the new vocabulary starts with the current one
+        (see Vocabulary.extended), and new classes may appear.
 
-        num_features = len(self.vocabulary)  # Use stored vocabulary length
-        for class_label in tqdm(self.classes, desc="Calculating Likelihoods..."):
-            # Initialize likelihoods for this class using feature indices (0 to num_features-1)
-            self.likelihoods[class_label] = {}  # Dictionary mapping feature index : likelihood
+        Parameters:
+        X (list or SparseVectors): Dense binary feature vectors, or SparseVectors, indexed against vocabulary.
+        y (list): List of class labels corresponding to the documents.
+        vocabulary (Vocabulary or list): The (possibly extended) vocabulary. Defaults to the model's vocabulary.
+
+        Returns:
+        None
+        """
+        if not self.has_counts() and (self._likelihoods or self._scoring_tables is not None):
+            raise ValueError("This model holds no raw counts (it was saved by an older version). "
+                             "Retrain it with fit() before using partial_fit().")
+
+        if vocabulary is None:
+            vocabulary = self.vocabulary
+        elif not isinstance(vocabulary, Vocabulary):
+            vocabulary = Vocabulary(vocabulary)
+        if not vocabulary.extends(self.vocabulary):
+            raise ValueError("The new vocabulary must start with the model's current vocabulary terms, in order.")
+
+        if not isinstance(X, SparseVectors):
+            X = SparseVectors.from_dense(X, len(vocabulary))
+        if len(X) != len(y):
+            raise ValueError(f"Got {len(X)} documents but {len(y)} labels.")
+        if X.indices.size and X.indices.max() >= len(vocabulary):
+            raise ValueError(f"Feature index out of bounds for vocabulary (size {len(vocabulary)}).")
+
+        y = np.asarray(y)
+        if len(y) == 0:
+            return
+
+        # Growing the count tables for new classes and new vocabulary terms
+        old_order = sorted(self.classes)
+        class_order = sorted(self.classes | set(y.tolist()))
+        class_counts = np.zeros(len(class_order), dtype=np.int64)
+        feature_counts = np.zeros((len(class_order), len(vocabulary)), dtype=np.int64)
+        if self.has_counts():
+            old_rows = np.searchsorted(class_order, old_order)
+            class_counts[old_rows] = self._class_counts
+            feature_counts[old_rows, :self._feature_counts.shape[1]] = self._feature_counts
+
+        # Adding the batch's counts (only the cells of present features are touched)
+        class_rows = np.searchsorted(class_order, y)
+        np.add.at(class_counts, class_rows, 1)
+        np.add.at(feature_counts, (np.repeat(class_rows, np.diff(X.indptr)), X.indices.astype(np.int64)), 1)
+
+        self.vocabulary = vocabulary
+        self.classes = set(class_order)
+        self._class_counts = class_counts
+        self._feature_counts = feature_counts
+        self._counts_changed()
+
+    def merge(self, other):
+        """
+        Add the raw counts of another model (e.g. trained on another shard of the corpus) into this one.
+
+        The vocabulary becomes the sorted union of both vocabularies and the counts are summed, so
+        merging models trained on disjoint shards, in any order or grouping, gives exactly the model
+        trained on the whole corpus.
+
+        Parameters:
+        other (NaiveBayes): A model with raw counts and the same smoothing.
 
-            # All the feature vectors for this class
-            class_documents = [X[i] for i in range(total_documents) if y[i] == class_label]
-            num_documents_in_class = len(class_documents)
+        Returns:
+        NaiveBayes: self, to allow functools.reduce(NaiveBayes.merge, models).
+        """
+        if other.smoothing != self.smoothing:
+            raise ValueError(f"Cannot merge models with different smoothing ({self.smoothing} and {other.smoothing}).")
+        if other.variant != self.variant:
+            raise ValueError(f"Cannot merge a {self.variant} model with a {other.variant} model.")
+        for model in (self, other):
+            if not model.has_counts() and (model._likelihoods or model._scoring_tables is not None):
+                raise ValueError("Cannot merge a model that holds no raw counts.")
+
+        ngram_ranges = {model.vocabulary.ngram_range for model in (self, other) if model.has_counts()}
+        if len(ngram_ranges) > 1:
+            raise ValueError("Cannot merge models with different n-gram ranges.")
+
+        if self.vocabulary.hashed or other.vocabulary.hashed:
+            # Hash buckets line up between models with the same number of buckets
+            vocabulary = self.vocabulary if self.vocabulary.hashed else other.vocabulary
+            if not all(vocabulary.extends(model.vocabulary) for model in (self, other)):
+                raise ValueError("Cannot merge models with different feature spaces.")
+        else:
+            vocabulary = Vocabulary(sorted(set(self.vocabulary.terms) | set(other.vocabulary.terms)),
+                                    ngram_ranges.pop() if ngram_ranges else self.vocabulary.ngram_range)
+        class_order = sorted(self.classes | other.classes)
+        class_counts = np.zeros(len(class_order), dtype=np.int64)
+        feature_counts = np.zeros((len(class_order), len(vocabulary)), dtype=np.int64)
+
+        for model in (self, other):
+            if not model.has_counts():
+                continue
+            rows = np.searchsorted(class_order, sorted(model.classes))
+            columns = np.arange(len(vocabulary)) if vocabulary.hashed else \
+                np.array([vocabulary.index[term] for term in model.vocabulary.terms], dtype=np.int64)
+            class_counts[rows] += model._class_counts
+            feature_counts[np.ix_(rows, columns)] += model._feature_counts
+
+        self.vocabulary = vocabulary
+        self.classes = set(class_order)
+        self._class_counts = class_counts
+        self._feature_counts = feature_counts
+        self._counts_changed()
+        return self
+
+    def restrict_features(self, positions):
+        """
+        Keep only some features (e.g. those chosen by feature_selection.select_features).
 
-            # For each feature position (index corresponding to a word in vocabulary)
-            for feature_position in tqdm(range(num_features), desc=f"Likelihoods class {class_label}...", leave=False):
-                # Counting how many times this feature is 1 for this class
-                feature_positive_count = sum(1 for document in class_documents if document[feature_position] == 1)
+        Every feature's counts are independent of the others', so this gives exactly the model fitted
+        on the corpus vectorized against the reduced vocabulary.
 
-                # Laplace Smoothing (positive count + smoothing) / (class documents + smoothing * 2 possible values (0 or 1))
-                self.likelihoods[class_label][feature_position] = (feature_positive_count + self.smoothing) / \
-                                                                   (num_documents_in_class + self.smoothing * 2)
+        Parameters:
+        positions (list): Sorted positions, in the current vocabulary, of the features to keep.
+
+        Returns:
+        None
+        """
+        if not self.has_counts():
+            raise ValueError("This model holds no raw counts. Retrain it with fit() before selecting features.")
+        if self.vocabulary.hashed:
+            raise ValueError("Hash buckets cannot be removed from a hashed model.")
+
+        positions = np.asarray(positions, dtype=np.int64)
+        self.vocabulary = Vocabulary([self.vocabulary.terms[position] for position in positions],
+                                     self.vocabulary.ngram_range)
+        self._feature_counts = np.asarray(self._feature_counts)[:, positions]
+        self._counts_changed()
+
+    @staticmethod
+    def _count_features(X, y, class_order, num_features):
+        """
+        Count documents per class and, for every class, the documents each feature appears in.
+
+        Parameters:
+        X (SparseVectors): The documents.
+        y (numpy.ndarray): Class labels corresponding to the documents.
+        class_order (list): Sorted class labels, giving the row order of the returned counts.
+        num_features (int): Number of features (vocabulary size).
+
+        Returns:
+        tuple: (class_counts, feature_counts) arrays of shape (classes,) and (classes, features).
+        """
+        num_classes = len(class_order)
+        class_rows = np.searchsorted(class_order, y)
+
+        if X.indices.size and X.indices.max() >= num_features:
+            raise ValueError(f"Feature index out of bounds for vocabulary (size {num_features}).")
+
+        # Each (class, feature) pair is given a unique cell id and all cells are counted at once
+        flat_rows = np.repeat(class_rows, np.diff(X.indptr))
+        feature_counts = np.bincount(flat_rows * num_features + X.indices, minlength=num_classes * num_features)
+        feature_counts = feature_counts.reshape(num_classes, num_features)
+        class_counts = np.bincount(class_rows, minlength=num_classes)
+
+        return class_counts, feature_counts
 
     def predict(self, X):
         """
         Predict the class labels for the provided feature vectors.
 
         Parameters:
-        X (list): List of feature vectors (documents).
+        X (list or SparseVectors): List of dense binary feature vectors (documents), or SparseVectors.
 
         Returns:
         list: Predicted class labels for each document.
         """
-        # Handling for edge cases
-        if not self.priors or not self.likelihoods or not self.vocabulary or not self.classes:
-            raise ValueError("Model attributes (priors, likelihoods, vocabulary, classes) are not properly initialized. "
-                             "Train or load the model first.")
+        if not isinstance(X, SparseVectors):
+            X = SparseVectors.from_dense(X)
+        return self.predict_sparse(X)
 
-        predictions = []
-        for document in tqdm(X, desc="Predicting"):
-            scores = {}
-            for class_label in self.classes:
-                # Initialize score with log prior probability
-                prior = self.priors.get(class_label, 0)  # Get prior, default 0 if missing
-                log_prior = math.log(prior) if prior > 0 else -float('inf')
-                score = log_prior
+    def predict_sparse(self, X):
+        """
+        Predict the class labels for sparse documents.
 
-                if class_label not in self.likelihoods:
-                    print(f"Warning: Likelihoods missing for class {class_label} during prediction. Assigning -inf score.")
-                    scores[class_label] = -float('inf')
-                    continue
+        Every document starts from a per-class baseline score (for the Bernoulli variant, the "all features
+        absent" score) and then adds a term for each feature it contains, so the cost tracks document
+        length, not vocabulary size.
 
-                class_likelihoods = self.likelihoods[class_label]
+        Parameters:
+        X (SparseVectors or list): SparseVectors, or one iterable of (unique) present vocabulary indices per document.
 
-                # Add log likelihood for each feature
-                for feature_position, feature_value in enumerate(document):
-                    # Boundary check for safety
-                    if feature_position >= len(self.vocabulary):
-                        print(f"Warning: Feature position {feature_position} out of bounds for vocabulary (size {len(self.vocabulary)}). Skipping feature.")
-                        continue
+        Returns:
+        list: Predicted class labels for each document.
+        """
+        class_order, scores = self._joint_log_scores(X)
+        if scores.shape[1] == 0:
+            return []
 
-                    # Get P(feature=1|class)
-                    likelihood_feature_1 = class_likelihoods.get(feature_position)
+        # Choose class with highest log probability score (ties and all -inf go to the first class)
+        predicted_rows = np.argmax(scores, axis=0)
+        return [class_order[row] for row in predicted_rows]
 
-                    # Handle missing likelihood for a specific feature (if vocab changed or load issue)
-                    if likelihood_feature_1 is None:
-                        print(f"Warning: Likelihood missing for feature {feature_position} in class {class_label}. Using default smoothed value.")
-                        likelihood_feature_1 = self.smoothing / (self.smoothing * 2.0)
+    def predict_proba(self, X):
+        """
+        Compute the posterior probability of every class for each document.
 
-                    # Add log probability based on actual feature value (0 or 1)
-                    if feature_value == 1:
-                        score += math.log(likelihood_feature_1) if likelihood_feature_1 > 0 else -float('inf')
-                    else:  # feature_value == 0
-                        prob_neg = 1.0 - likelihood_feature_1
-                        score += math.log(prob_neg) if prob_neg > 0 else -float('inf')
+        Parameters:
+        X (SparseVectors or list): SparseVectors, or one iterable of (unique) present vocabulary indices per document.
 
-                scores[class_label] = score
+        Returns:
+        tuple: (class labels in column order, numpy array of shape (documents, classes) whose rows sum to 1).
+        """
+        class_order, scores = self._joint_log_scores(X)
+        if scores.shape[1] == 0:
+            return class_order, np.zeros((0, len(class_order)))
+
+        # Normalising in log space; a document every class finds impossible gets its first class, as in predict
+        best = scores.max(axis=0)
+        all_impossible = np.isneginf(best)
+        best[all_impossible] = 0.0
+        probabilities = np.exp(scores - best)
+        probabilities[:, all_impossible] = 0.0
+        probabilities[0, all_impossible] = 1.0
+        probabilities /= probabilities.sum(axis=0)
+        return class_order, probabilities.T
+
+    def _joint_log_scores(self, X):
+        """
+        Compute the log of P(class) * P(document | class) for every class and document.
 
-            # Choose class with highest log probability score
-            predicted_class = max(scores, key=scores.get) if not all(s == -float('inf') for s in scores.values()) else list(self.classes)[0]
-            predictions.append(predicted_class)
+        Parameters:
+        X (SparseVectors or list): SparseVectors, or one iterable of (unique) present vocabulary indices per document.
 
-        return predictions
+        Returns:
+        tuple: (class labels in row order, numpy array of shape (classes, documents)).
+        """
+        # Handling for edge cases
+        has_likelihoods = self._scoring_tables is not None or self._likelihoods or self.has_counts()
+        if not self.priors or not has_likelihoods or not self.vocabulary or not self.classes:
+            raise ValueError("Model attributes (priors, likelihoods, vocabulary, classes) are not properly initialized. "
+                             "Train or load the model first.")
 
-    def save(self, filepath):
+        tables = self._get_scoring_tables()
+        class_order = tables["classes"]
+        num_features = tables["delta"].shape[1]
+
+        if not isinstance(X, SparseVectors):
+            X = SparseVectors.from_rows(X)
+
+        num_documents = len(X)
+        if num_documents == 0:
+            return class_order, np.empty((len(class_order), 0))
+
+        # The batch as flat (document, feature) pairs
+        document_ids = X.document_ids()
+        flat_indices = X.indices.astype(np.int64)
+
+        # Boundary check for safety
+        in_bounds = flat_indices < num_features
+        if not in_bounds.all():
+            print(f"Warning: {np.count_nonzero(~in_bounds)} feature positions out of bounds for vocabulary "
+                  f"(size {num_features}). Skipping those features.")
+            document_ids = document_ids[in_bounds]
+            flat_indices = flat_indices[in_bounds]
+
+        # Summing the per-feature corrections of every document for every class in one pass
+        scores = np.empty((len(class_order), num_documents))
+        impossible = np.zeros((len(class_order), num_documents), dtype=np.int64)
+        for row in range(len(class_order)):
+            scores[row] = tables["baseline"][row] + np.bincount(
+                document_ids, weights=tables["delta"][row, flat_indices], minlength=num_documents)
+            impossible[row] += tables["baseline_impossible"][row]
+            if tables["delta_impossible"] is not None:
+                impossible[row] += np.bincount(
+                    document_ids, weights=tables["delta_impossible"][row, flat_indices], minlength=num_documents
+                ).astype(np.int64)
+
+        # A score is -inf as soon as one of its terms had zero probability
+        scores[impossible > 0] = -np.inf
+        return class_order, scores
+
+    def _get_scoring_tables(self):
+        """
+        Build (once) the per-class log-probability tables used for prediction.
+
+        log(0) terms are tracked as counts of "impossible" terms instead of -inf values, so a feature
+        with P(feature=1|class) = 1 cannot produce -inf + inf when corrected for.
+
+        Bernoulli: baseline log P(class) + sum of log P(feature=0|class), corrected by
+            log P(feature=1|class) - log P(feature=0|class) for every present feature.
+        Multinomial: baseline log P(class), plus log P(token|class) for every present token.
+        Complement: baseline 0, minus the log probability of every present token in the other classes
+            (Rennie et al., 2003), so a class scores high on tokens the other classes rarely use. The
+            priors are left out, which suits unevenly sized classes.
+
+        Returns:
+        dict: Sorted class labels, the likelihood table, "all features absent" baselines and
+        per-feature corrections.
+        """
+        if self._scoring_tables is not None:
+            return self._scoring_tables
+
+        class_order = sorted(self.classes)
+        num_features = len(self.vocabulary)
+        default_likelihood = self.smoothing / (self.smoothing * 2.0) if self.smoothing else 0.5
+
+        class_missing = np.zeros(len(class_order), dtype=bool)
+        if self.has_counts():
+            likelihood_table = self._likelihood_table_from_counts()
+        else:
+            # Models saved before raw counts were stored only have their likelihood dictionaries
+            likelihood_table = np.full((len(class_order), num_features), default_likelihood)
+            for row, class_label in enumerate(class_order):
+                class_likelihoods = self._likelihoods.get(class_label)
+                if class_likelihoods is None:
+                    print(f"Warning: Likelihoods missing for class {class_label} during prediction. Assigning -inf score.")
+                    class_missing[row] = True
+                    continue
+                if len(class_likelihoods) < num_features:
+                    print(f"Warning: Likelihoods missing for {num_features - len(class_likelihoods)} features in "
+                          f"class {class_label}. Using default smoothed value.")
+                for feature_position, likelihood in class_likelihoods.items():
+                    if feature_position < num_features:
+                        likelihood_table[row, feature_position] = likelihood
+
+        priors = np.array([self.priors.get(class_label, 0) for class_label in class_order], dtype=float)
+
+        with np.errstate(divide="ignore"):
+            log_priors = np.log(priors)
+            log_present = np.log(likelihood_table)  # log P(feature=1|class)
+            log_absent = np.log(1.0 - likelihood_table)  # log P(feature=0|class)
+
+        present_impossible = ~np.isfinite(log_present)
+        absent_impossible = ~np.isfinite(log_absent)
+        log_present[present_impossible] = 0.0
+        log_absent[absent_impossible] = 0.0
+        if self.variant != "bernoulli":
+            # Absent tokens are not scored
+            log_absent[:] = 0.0
+            absent_impossible[:] = False
+
+        if self.variant == "complement":
+            baseline = np.zeros(len(class_order))
+            baseline_impossible = class_missing.astype(np.int64)
+            delta = -log_present
+        else:
+            baseline = np.where(np.isfinite(log_priors), log_priors, 0.0) + log_absent.sum(axis=1)
+            baseline_impossible = (~np.isfinite(log_priors) | class_missing).astype(np.int64) \
+                + absent_impossible.sum(axis=1)
+            delta = log_present - log_absent
+
+        self._scoring_tables = {
+            "classes": class_order,
+            "likelihoods": likelihood_table,
+            "baseline": baseline,
+            "baseline_impossible": baseline_impossible,
+            "delta": delta,
+            # Left out when every probability is strictly between 0 and 1 (always the case with smoothing)
+            "delta_impossible": present_impossible.astype(np.int8) - absent_impossible.astype(np.int8)
+                                if present_impossible.any() or absent_impossible.any() else None,
+        }
+        return self._scoring_tables
+
+    def save(self, filepath, target_format=None):
         """
         Save the trained model to a file.
 
         Parameters:
         filepath (str): The path to save the model.
+        target_format (str): "json" or "binary". Defaults to binary for paths ending in ".nbm", JSON otherwise.
 
         Returns:
-        None
+        bool: True if the model was saved.
         """
+        if target_format is None:
+            target_format = "binary" if filepath.endswith(BINARY_MODEL_EXTENSION) else "json"
+
+        if target_format == "binary":
+            return self.save_binary(filepath)
+        if target_format != "json":
+            raise ValueError(f"Unknown model format '{target_format}'. Use 'json' or 'binary'.")
+
         print(f"Saving model state to {filepath}...")
 
         # Prepare likelihoods with string keys for JSON compatibility
@@ -140,28 +569,98 @@ class NaiveBayes:
         model_data = {
             "model_type": "NaiveBayes",
             "smoothing": self.smoothing,
-            "vocabulary": self.vocabulary,
+            "variant": self.variant,
+            "vocabulary": self.vocabulary.terms,
+            "hashing_features": self.vocabulary.num_features if self.vocabulary.hashed else None,
+            "ngram_range": list(self.vocabulary.ngram_range),
             "classes": list(self.classes),
             "priors": priors_json,
             "likelihoods": likelihoods_json
         }
 
+        # Raw counts (only the non-zero feature counts), so the loaded model can keep learning with partial_fit
+        if self.has_counts():
+            class_order = sorted(self.classes)
+            model_data["class_counts"] = {str(class_label): int(self._class_counts[row])
+                                          for row, class_label in enumerate(class_order)}
+            model_data["feature_counts"] = {
+                str(class_label): {str(feat_idx): int(self._feature_counts[row, feat_idx])
+                                   for feat_idx in np.flatnonzero(self._feature_counts[row])}
+                for row, class_label in enumerate(class_order)
+            }
+
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
+            # Written to a temporary file and renamed, so readers never see a half-written model
+            with atomic_output(filepath, 'w', encoding='utf-8') as f:
                 json.dump(model_data, f, indent=4)
             print("Model state saved successfully.")
+            return True
         except IOError as e:
             print(f"Error saving model state to {filepath}: {e}")
         except TypeError as e:
             print(f"Error: Could not serialize model data to JSON: {e}")
+        return False
+
+    def save_binary(self, filepath, dtype=np.float64):
+        """
+        Save the trained model in the compact binary format (see bin/model_format.py).
+
+        The scoring tables are written as arrays, so loading them needs no parsing and the file can be
+        memory-mapped and shared between processes.
+
+        Parameters:
+        filepath (str): The path to save the model.
+        dtype: Floating point type (numpy.float32 or numpy.float64) of the per-feature log-probability table.
+
+        Returns:
+        bool: True if the model was saved.
+        """
+        print(f"Saving binary model state to {filepath}...")
+
+        tables = self._get_scoring_tables()
+        impossible_terms = tables["delta_impossible"] is not None
+
+        header = {
+            "model_type": "NaiveBayes",
+            "smoothing": self.smoothing,
+            "variant": self.variant,
+            "classes": tables["classes"],
+            "priors": {str(k): float(v) for k, v in self.priors.items()},
+            "num_features": len(self.vocabulary),
+            "hashing_features": self.vocabulary.num_features if self.vocabulary.hashed else None,
+            "ngram_range": list(self.vocabulary.ngram_range),
+            "impossible_terms": impossible_terms,
+        }
+        sections = {
+            # Terms never contain NUL characters, so they are stored NUL-separated (none for hashed features)
+            "vocabulary": "\0".join(self.vocabulary.terms).encode('utf-8'),
+            "likelihoods": tables["likelihoods"].astype(np.float64),
+            "baseline": tables["baseline"].astype(np.float64),
+            "baseline_impossible": tables["baseline_impossible"].astype(np.int64),
+            "delta": tables["delta"].astype(dtype),
+        }
+        if impossible_terms:
+            sections["delta_impossible"] = tables["delta_impossible"].astype(np.int8)
+        if self.has_counts():
+            sections["class_counts"] = np.asarray(self._class_counts, dtype=np.int64)
+            sections["feature_counts"] = np.asarray(self._feature_counts, dtype=np.uint32)
+
+        try:
+            write_binary_model(filepath, header, sections)
+            print("Binary model state saved successfully.")
+            return True
+        except (IOError, TypeError, ValueError) as e:
+            print(f"Error saving binary model state to {filepath}: {e}")
+            return False
 
     @staticmethod
-    def load(filepath):
+    def load(filepath, mmap=True):
         """
         Load a model from a file.
 
         Parameters:
-        filepath (str): The path from where to load the model.
+        filepath (str): The path from where to load the model (JSON or binary, detected from the content).
+        mmap (bool): For binary models, memory-map the arrays instead of reading them into private memory.
 
         Returns:
         NaiveBayes: The loaded NaiveBayes model instance.
@@ -169,6 +668,9 @@ class NaiveBayes:
         if not os.path.exists(filepath):
             return None
 
+        if is_binary_model(filepath):
+            return NaiveBayes._load_binary(filepath, mmap)
+
         print(f"Loading model state from {filepath}...")
 
         try:
@@ -182,8 +684,14 @@ class NaiveBayes:
             if model_data.get("model_type") != "NaiveBayes":
                 print(f"Warning: JSON file {filepath} model_type is not 'NaiveBayes'.")
 
-            model = NaiveBayes(smoothing=model_data.get("smoothing", smoothingFactor))
-            model.vocabulary = model_data.get("vocabulary", [])
+            # Models saved before the variants were added are Bernoulli models
+            model = NaiveBayes(smoothing=model_data.get("smoothing", smoothingFactor),
+                               variant=model_data.get("variant", "bernoulli"))
+            ngram_range = model_data.get("ngram_range", (1, 1))
+            if model_data.get("hashing_features"):
+                model.vocabulary = HashingVocabulary(model_data["hashing_features"], ngram_range)
+            else:
+                model.vocabulary = Vocabulary(model_data.get("vocabulary", []), ngram_range)
             model.classes = set(int(c) for c in model_data.get("classes", []))
             model.priors = {int(k): v for k, v in model_data.get("priors", {}).items()}
 
@@ -193,6 +701,15 @@ class NaiveBayes:
                 for class_label_str, feature_probs_str in model_data.get("likelihoods", {}).items()
             }
 
+            # Raw counts are only present in models saved since partial_fit support was added
+            if "class_counts" in model_data and "feature_counts" in model_data:
+                class_order = sorted(model.classes)
+                model._class_counts = np.array([model_data["class_counts"][str(c)] for c in class_order], dtype=np.int64)
+                model._feature_counts = np.zeros((len(class_order), len(model.vocabulary)), dtype=np.int64)
+                for row, class_label in enumerate(class_order):
+                    for feat_idx_str, count in model_data["feature_counts"].get(str(class_label), {}).items():
+                        model._feature_counts[row, int(feat_idx_str)] = count
+
             print("Model state loaded successfully.")
             return model
 
@@ -205,3 +722,60 @@ class NaiveBayes:
         except Exception as e:
             print(f"An unexpected error occurred during model loading: {e}")
             return None
+
+    @staticmethod
+    def _load_binary(filepath, mmap=True):
+        """
+        Load a model saved with save_binary.
+
+        Parameters:
+        filepath (str): The path from where to load the model.
+        mmap (bool): Memory-map the arrays instead of reading them into private memory.
+
+        Returns:
+        NaiveBayes: The loaded NaiveBayes model instance.
+        """
+        print(f"Loading binary model state from {filepath}...")
+
+        try:
+            header, sections = read_binary_model(filepath, mmap=mmap)
+
+            if header.get("model_type") != "NaiveBayes":
+                print(f"Warning: Binary model file {filepath} model_type is not 'NaiveBayes'.")
+
+            model = NaiveBayes(smoothing=header.get("smoothing", smoothingFactor),
+                               variant=header.get("variant", "bernoulli"))
+            ngram_range = header.get("ngram_range", (1, 1))
+            if header.get("hashing_features"):
+                model.vocabulary = HashingVocabulary(header["hashing_features"], ngram_range)
+            else:
+                vocabulary_blob = bytes(sections["vocabulary"])
+                model.vocabulary = Vocabulary(vocabulary_blob.decode('utf-8').split("\0") if vocabulary_blob else [],
+                                              ngram_range)
+            class_order = [int(c) for c in header["classes"]]
+            model.classes = set(class_order)
+            model.priors = {int(k): v for k, v in header["priors"].items()}
+
+            if len(model.vocabulary) != header["num_features"]:
+                raise ValueError(f"Vocabulary holds {len(model.vocabulary)} terms, expected {header['num_features']}.")
+
+            model._scoring_tables = {
+                "classes": class_order,
+                "likelihoods": sections["likelihoods"],
+                "baseline": sections["baseline"],
+                "baseline_impossible": sections["baseline_impossible"],
+                "delta": sections["delta"],
+                "delta_impossible": sections.get("delta_impossible"),
+            }
+
+            # Raw counts for partial_fit (copied by partial_fit, so they can stay memory-mapped until then)
+            if "class_counts" in sections and "feature_counts" in sections:
+                model._class_counts = sections["class_counts"]
+                model._feature_counts = sections["feature_counts"]
+
+            print("Binary model state loaded successfully.")
+            return model
+
+        except (IOError, ValueError, KeyError, TypeError) as e:
+            print(f"Error loading binary model state from {filepath}: {e}")
+            return None
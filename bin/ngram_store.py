@@ -0,0 +1,193 @@
+from array import array
+from collections import defaultdict
+from itertools import count
+
+import numpy as np
+
+from bin.config import ngramMaxTerms, ngramMinCount, ngramRange
+from bin.sparse_vectors import SparseVectors
+from bin.tokenizer import ENGLISH_STOP_WORDS, NGRAM_SEPARATOR, tokenize
+from bin.vocabulary import Vocabulary, check_ngram_range
+
+# An n-gram is stored as one int64 key holding the ids of its tokens, TOKEN_BITS bits each (0 marks
+# "no token", so the unigram, bigram and trigram keys never collide)
+MAX_NGRAM = 3
+TOKEN_BITS = 63 // MAX_NGRAM
+MAX_TOKENS = (1 << TOKEN_BITS) - 2
+_TOKEN_MASK = (1 << TOKEN_BITS) - 1
+
+
+class NgramCorpusBuilder:
+    """
+    Builds the n-gram vocabulary and sparse vectors of a corpus with a bounded count table.
+
+    Tokens are interned to integer ids, and every n-gram becomes an integer key built from its token
+    ids, so no n-gram strings are created while counting. Document frequencies are kept in two sorted
+    numpy arrays (keys and counts) of at most max_terms slots: whenever a batch overflows the table,
+    the least frequent n-grams are pruned. Only the n-grams left at the end are decoded into terms.
+
+    The result matches build_vocab followed by text_to_sparse_vectors with the same ngram_range,
+    less the pruned n-grams. Pruning as batches arrive is approximate: an n-gram pruned early loses the
+    documents counted so far, so batches of different sizes or order can keep different n-grams once
+    the table fills (train_parallel instead prunes the exact merged counts once).
+
+    Only the count table is bounded. The distinct n-gram keys of every document, pruned or not, are
+    kept until build() (8 bytes each), so that part grows with the corpus.
+    """
+
+    def __init__(self, ngram_range=ngramRange, max_terms=ngramMaxTerms, min_count=ngramMinCount,
+                 stop_words=ENGLISH_STOP_WORDS):
+        """
+        Parameters:
+        ngram_range (tuple): Smallest and largest number of consecutive tokens per term (at most MAX_NGRAM).
+        max_terms (int): Slots in the count table, and so the largest vocabulary built (None for no cap,
+            e.g. for shards whose counts are only pruned once merged).
+        min_count (int): Fewest documents an n-gram of two or more tokens must appear in to be kept.
+        stop_words (frozenset): Tokens to leave out (see tokenizer.ngram_terms).
+        """
+        self.ngram_range = check_ngram_range(ngram_range)
+        if self.ngram_range[1] > MAX_NGRAM:
+            raise ValueError(f"N-grams of up to {MAX_NGRAM} tokens are supported, got {self.ngram_range}.")
+        if max_terms is not None and max_terms <= 0:
+            raise ValueError("The count table needs at least one slot.")
+        self.max_terms = int(max_terms) if max_terms is not None else None
+        self.min_count = min_count
+        self.stop_words = stop_words
+        self.pruned_below = 0  # Highest document count of a pruned n-gram (0 if nothing was pruned)
+
+        self._token_ids = defaultdict(count(1).__next__)
+        self._is_stop_word = np.zeros(1, dtype=bool)  # Indexed by token id
+        self._keys = np.zeros(0, dtype=np.int64)
+        self._counts = np.zeros(0, dtype=np.int32)  # With the keys, 12 bytes per slot
+
+        # The distinct n-gram keys of every document, CSR-style
+        self._indptr = array('q', [0])
+        self._document_keys = array('q')
+
+    def add_texts(self, texts):
+        """
+        Tokenize and add several documents.
+
+        Parameters:
+        texts (iterable): The documents' texts.
+
+        Returns:
+        None
+        """
+        token_ids = self._token_ids
+        ids = array('q')
+        lengths = array('q')
+        for text in texts:
+            tokens = tokenize(text)
+            ids.extend(map(token_ids.__getitem__, tokens))
+            lengths.append(len(tokens))
+
+        if len(token_ids) > MAX_TOKENS:
+            raise ValueError(f"More than {MAX_TOKENS} distinct tokens; use feature hashing for this corpus.")
+        self._update_stop_words()
+
+        ids = np.frombuffer(ids, dtype=np.int64)
+        lengths = np.frombuffer(lengths, dtype=np.int64)
+        documents, keys = self._document_ngrams(ids, lengths)
+
+        self._document_keys.frombytes(keys.tobytes())
+        self._indptr.extend((np.cumsum(np.bincount(documents, minlength=len(lengths))) + self._indptr[-1]).tolist())
+        self._count(keys)
+
+    def _update_stop_words(self):
+        # Flags for the tokens interned since the last batch
+        known = len(self._is_stop_word) - 1
+        new_tokens = list(self._token_ids)[known:]
+        if new_tokens:
+            flags = np.fromiter((token in self.stop_words for token in new_tokens), dtype=bool, count=len(new_tokens))
+            self._is_stop_word = np.concatenate([self._is_stop_word, flags])
+
+    def _document_ngrams(self, ids, lengths):
+        """
+        Return the distinct n-gram keys of every document of a batch.
+
+        Parameters:
+        ids (numpy.ndarray): Token ids of the whole batch, document after document.
+        lengths (numpy.ndarray): Tokens per document.
+
+        Returns:
+        tuple: (document positions, keys), sorted by document and then key.
+        """
+        token_documents = np.repeat(np.arange(len(lengths), dtype=np.int64), lengths)
+        smallest, largest = self.ngram_range
+        document_parts, key_parts = [], []
+
+        for n in range(smallest, largest + 1):
+            starts = np.arange(len(ids) - n + 1)
+            # N-grams must not cross into the next document
+            starts = starts[token_documents[starts] == token_documents[starts + n - 1]]
+            keys = np.zeros(len(starts), dtype=np.int64)
+            all_stop_words = np.ones(len(starts), dtype=bool)
+            for offset in range(n):
+                keys = (keys << TOKEN_BITS) | ids[starts + offset]
+                all_stop_words &= self._is_stop_word[ids[starts + offset]]
+            document_parts.append(token_documents[starts[~all_stop_words]])
+            key_parts.append(keys[~all_stop_words])
+
+        documents = np.concatenate(document_parts)
+        keys = np.concatenate(key_parts)
+        order = np.lexsort((keys, documents))
+        documents, keys = documents[order], keys[order]
+        distinct = np.ones(len(keys), dtype=bool)
+        distinct[1:] = (documents[1:] != documents[:-1]) | (keys[1:] != keys[:-1])
+        return documents[distinct], keys[distinct]
+
+    def _count(self, keys):
+        # Merging the batch's document frequencies into the table, then pruning it back to max_terms
+        batch_keys, batch_counts = np.unique(keys, return_counts=True)
+        merged_keys, slots = np.unique(np.concatenate([self._keys, batch_keys]), return_inverse=True)
+        merged_counts = np.zeros(len(merged_keys), dtype=np.int32)
+        np.add.at(merged_counts, slots, np.concatenate([self._counts, batch_counts]))
+
+        if self.max_terms is not None and len(merged_keys) > self.max_terms:
+            kept = np.sort(np.argpartition(-merged_counts, self.max_terms - 1)[:self.max_terms])
+            pruned = np.ones(len(merged_keys), dtype=bool)
+            pruned[kept] = False
+            self.pruned_below = max(self.pruned_below, int(merged_counts[pruned].max()))
+            merged_keys, merged_counts = merged_keys[kept], merged_counts[kept]
+
+        self._keys, self._counts = merged_keys, merged_counts
+
+    def _decode(self, keys):
+        # Token ids of every key, first token first (0 where an n-gram is shorter than MAX_NGRAM)
+        tokens = [""] + list(self._token_ids)
+        fields = np.stack([(keys >> (TOKEN_BITS * shift)) & _TOKEN_MASK for shift in range(MAX_NGRAM - 1, -1, -1)],
+                          axis=1)
+        return [NGRAM_SEPARATOR.join(tokens[token_id] for token_id in row if token_id) for row in fields.tolist()]
+
+    def build(self):
+        """
+        Return the corpus added so far.
+
+        Returns:
+        tuple: (SparseVectors, Vocabulary) with the vocabulary sorted, as build_vocab returns it.
+        """
+        if self.pruned_below:
+            print(f"N-gram count table full: pruned n-grams seen in up to {self.pruned_below} posts.")
+
+        # Dropping the rare multi-token n-grams (single tokens are single fields, below 1 << TOKEN_BITS)
+        frequent = (self._keys < (1 << TOKEN_BITS)) | (self._counts >= self.min_count)
+        keys = self._keys[frequent]
+
+        terms = self._decode(keys)
+        order = sorted(range(len(terms)), key=terms.__getitem__)
+        sorted_position = np.empty(len(terms), dtype=np.uint32)
+        sorted_position[order] = np.arange(len(terms), dtype=np.uint32)
+        vocab = Vocabulary([terms[position] for position in order], self.ngram_range)
+
+        # Re-indexing every document's keys against the kept n-grams
+        document_keys = np.frombuffer(self._document_keys, dtype=np.int64)
+        indptr = np.frombuffer(self._indptr, dtype=np.int64)
+        slots = np.searchsorted(keys, document_keys)
+        found = keys[np.minimum(slots, len(keys) - 1)] == document_keys if len(keys) else \
+            np.zeros(len(document_keys), dtype=bool)
+        documents = np.repeat(np.arange(len(indptr) - 1, dtype=np.int64), np.diff(indptr))
+
+        new_indptr = np.zeros(len(indptr), dtype=np.int64)
+        np.cumsum(np.bincount(documents[found], minlength=len(indptr) - 1), out=new_indptr[1:])
+        return SparseVectors(new_indptr, sorted_position[slots[found]], len(vocab)), vocab
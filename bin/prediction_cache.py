@@ -0,0 +1,98 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 100000
+
+
+def post_key(text, uri=None):
+    """
+    Identify a post for the prediction cache: by its URI when it has one, else by a hash of its text.
+
+    Parameters:
+    text (str): The post's text.
+    uri (str): The post's at:// URI, if known.
+
+    Returns:
+    str: The cache key of the post.
+    """
+    if isinstance(uri, str) and uri:  # Missing URIs may come through pandas as NaN
+        return uri
+    return "sha1:" + hashlib.sha1(str(text).encode('utf-8')).hexdigest()
+
+
+class PredictionCache:
+    """
+    Bounded cache of per-post predictions, evicting the least recently used.
+
+    Predictions are keyed on (model version, post key), so a retrained or reloaded model never reuses
+    the previous model's predictions.
+
+    Attributes:
+        hits: Number of predictions served from the cache.
+        misses: Number of predictions that had to be computed.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, model_version, keys):
+        """
+        Look up the cached predictions of several posts.
+
+        Parameters:
+        model_version (str): Identifies the model (e.g. the model file's content hash).
+        keys (list): Post keys (see post_key).
+
+        Returns:
+        dict: Mapping of position in keys to cached prediction, for the posts that were found.
+        """
+        found = {}
+        with self._lock:
+            for position, key in enumerate(keys):
+                prediction = self._entries.get((model_version, key))
+                if prediction is not None:
+                    self._entries.move_to_end((model_version, key))
+                    found[position] = prediction
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, model_version, keys, predictions):
+        """
+        Store the predictions of several posts.
+
+        Parameters:
+        model_version (str): Identifies the model the predictions were made with.
+        keys (list): Post keys (see post_key).
+        predictions (iterable): The prediction of each post, in the same order as keys.
+
+        Returns:
+        None
+        """
+        with self._lock:
+            for key, prediction in zip(keys, predictions):
+                self._entries[(model_version, key)] = prediction
+                self._entries.move_to_end((model_version, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        """
+        Report how well the cache is doing.
+
+        Returns:
+        dict: hits, misses, hit_rate and the number of cached entries.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses,
+                    "hit_rate": self.hits / total if total else 0.0, "entries": len(self._entries)}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -1,8 +1,29 @@
-from .data_utils import build_vocab, text_to_binary_vectors
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+
+import numpy as np
+from tqdm import tqdm
+
+from .config import hashingFeatures, ngramMaxTerms, ngramMinCount, ngramRange, trainingProcesses
+from .data_utils import CorpusBuilder, text_to_sparse_vectors, tokenize_batch
+from .feature_selection import select_features, selection_enabled
+from .model_format import BINARY_MODEL_EXTENSION
 from .naive_bayes import NaiveBayes  # Import NaiveBayes for type hinting if desired
+from .ngram_store import NgramCorpusBuilder
+from .tokenizer import NGRAM_SEPARATOR
+from .sparse_vectors import SparseVectors
+from .training_data import load_training_corpus
+from .vocabulary import HashingVocabulary
 
+# Posts of the training corpus predicted to time the model before and after feature selection
+SELECTION_LATENCY_SAMPLE = 2000
 
-def train(model: NaiveBayes, data, labels):
+
+def train(model: NaiveBayes, data, labels, n_jobs=trainingProcesses, hashing_features=hashingFeatures,
+          feature_selection=None, ngram_range=ngramRange):
     """
     Train the Naive Bayes model.
 
@@ -10,21 +31,310 @@ def train(model: NaiveBayes, data, labels):
     model (NaiveBayes): The Naive Bayes model to be trained.
     data (list): A list of documents to train the model on.
     labels (list): A list of class labels corresponding to the documents.
+    n_jobs (int): Number of worker processes. Above 1 the corpus is split into shards that are
+        counted in parallel and merged (see train_parallel); the resulting model is identical.
+    hashing_features (int): Number of hash buckets to hash the terms into, or None to build a vocabulary.
+    feature_selection (dict): Feature selection options (see feature_selection.select_features) overriding
+        those in bin/config.py.
+    ngram_range (tuple): Smallest and largest number of consecutive words per term, e.g. (1, 2).
 
     Returns:
-    tuple: A tuple containing the trained model and the vocabulary used.
+    tuple: A tuple containing the trained model and the vocabulary (Vocabulary) used.
+    """
+    if n_jobs and n_jobs > 1:
+        return train_parallel(model, data, labels, n_jobs, hashing_features, feature_selection, ngram_range)
+
+    X_train, vocab = _vectorize_corpus(data, hashing_features, ngram_range)
+
+    # Fitting the model
+    model.fit(X_train, labels, vocab)
+    _select_features(model, X_train, **(feature_selection or {}))
+    print("Model fitting complete.")
+
+    return model, model.vocabulary  # Return the trained model and the vocab
+
+
+def _vectorize_corpus(texts, hashing_features=None, ngram_range=(1, 1), ngram_max_terms=ngramMaxTerms,
+                      ngram_min_count=ngramMinCount):
+    """
+    Vectorize training documents, tokenizing every document once.
+
+    Parameters:
+    texts (list): The documents.
+    hashing_features (int): Number of hash buckets, or None to build a vocabulary from the documents.
+    ngram_range (tuple): Smallest and largest number of consecutive words per term.
+    ngram_max_terms (int): With n-grams, the size of the n-gram count table (None for no cap).
+    ngram_min_count (int): With n-grams, the fewest documents an n-gram of two or more words must appear in.
+
+    Returns:
+    tuple: (SparseVectors, Vocabulary or HashingVocabulary).
+    """
+    if hashing_features:
+        # Terms go straight to their buckets, so no term dictionary is built at all
+        vocab = HashingVocabulary(hashing_features, ngram_range)
+        return text_to_sparse_vectors(texts, vocab), vocab
+
+    # Building vocabulary and vectorizing training data in one pass
+    # (only the present vocabulary indices are stored; n-grams are counted in a bounded table)
+    corpus = NgramCorpusBuilder(ngram_range, ngram_max_terms, ngram_min_count) if tuple(ngram_range) != (1, 1) \
+        else CorpusBuilder()
+    corpus.add_texts(tqdm(texts, desc="Building vocabulary and vectors..."))
+    return corpus.build()
+
+
+def _train_shard(texts, labels, smoothing, variant, hashing_features=None, ngram_range=(1, 1)):
+    """
+    Train a model on one shard of the corpus (runs in a worker process).
+
+    Parameters:
+    texts (list): The shard's documents.
+    labels (numpy.ndarray): The shard's class labels.
+    smoothing (float): Smoothing factor of the final model.
+    variant (str): Naive Bayes variant of the final model.
+    hashing_features (int): Number of hash buckets, or None to build the shard's vocabulary.
+    ngram_range (tuple): Smallest and largest number of consecutive words per term.
+
+    Returns:
+    NaiveBayes: A model holding the shard's vocabulary and raw counts.
+    """
+    shard_model = NaiveBayes(smoothing=smoothing, variant=variant)
+    # N-grams are neither pruned nor capped per shard: an n-gram rare in every shard may still be
+    # frequent in the whole corpus, so both are applied to the merged counts (see _prune_merged_ngrams)
+    shard_X, shard_vocab = _vectorize_corpus(texts, hashing_features, ngram_range, ngram_max_terms=None,
+                                             ngram_min_count=1)
+    shard_model.fit(shard_X, labels, shard_vocab)
+    return shard_model
+
+
+def train_parallel(model: NaiveBayes, data, labels, n_jobs, hashing_features=hashingFeatures,
+                   feature_selection=None, ngram_range=ngramRange):
     """
-    # Building vocabulary
-    vocab = build_vocab(data)
+    Train the Naive Bayes model by counting shards of the corpus in parallel processes.
 
-    # Vectorizing training data
-    X_train = text_to_binary_vectors(data, vocab)
+    Every worker builds the vocabulary and per-class counts of its shard; the shard models are then
+    merged (an associative sum of counts over the union of the vocabularies), which reproduces
+    single-process training exactly. With n-grams, the shards are counted without a cap and the
+    merged counts are pruned once to the ngramMaxTerms most frequent terms; this can keep different
+    n-grams than train_from_csv, which prunes chunk by chunk, once the cap is reached.
+
+    Parameters:
+    model (NaiveBayes): The Naive Bayes model to be trained.
+    data (list): A list of documents to train the model on.
+    labels (list): A list of class labels corresponding to the documents.
+    n_jobs (int): Number of worker processes (and shards).
+    hashing_features (int): Number of hash buckets, or None to build a vocabulary.
+    feature_selection (dict): Feature selection options overriding those in bin/config.py.
+    ngram_range (tuple): Smallest and largest number of consecutive words per term.
+
+    Returns:
+    tuple: A tuple containing the trained model and the vocabulary (Vocabulary) used.
+    """
+    texts = [str(text) for text in data]
+    labels = np.asarray(labels)
+    if len(texts) != len(labels):
+        raise ValueError(f"Got {len(texts)} documents but {len(labels)} labels.")
+
+    # Contiguous, roughly equal shards
+    bounds = np.linspace(0, len(texts), n_jobs + 1, dtype=np.int64)
+    shards = [(texts[start:end], labels[start:end]) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        shard_models = list(executor.map(_train_shard, *zip(*shards), [model.smoothing] * len(shards),
+                                         [model.variant] * len(shards),
+                                         [hashing_features] * len(shards), [ngram_range] * len(shards)))
+
+    # Starting from an empty model, so whatever the passed model held is replaced, as with fit()
+    model.reset()
+    reduce(NaiveBayes.merge, shard_models, model)
+    if tuple(ngram_range) != (1, 1) and not model.vocabulary.hashed:
+        _prune_merged_ngrams(model)
+    # Selected from the merged counts, so the shards agree on which features to keep
+    _select_features(model, texts[:SELECTION_LATENCY_SAMPLE], **(feature_selection or {}))
+    print(f"Model fitting complete ({len(shards)} shards).")
+
+    return model, model.vocabulary
+
+
+def _prune_merged_ngrams(model: NaiveBayes, max_terms=ngramMaxTerms, min_count=ngramMinCount):
+    """
+    Apply the n-gram frequency pruning and budget to a model merged from unpruned shards.
+
+    Parameters:
+    model (NaiveBayes): The merged model, with an n-gram vocabulary and raw counts.
+    max_terms (int): Largest vocabulary kept (the most frequent terms).
+    min_count (int): Fewest documents an n-gram of two or more words must appear in.
+
+    Returns:
+    None
+    """
+    document_frequency = np.asarray(model._feature_counts).sum(axis=0)
+    multi_word = np.fromiter((NGRAM_SEPARATOR in term for term in model.vocabulary.terms), dtype=bool,
+                             count=len(model.vocabulary))
+    kept = np.flatnonzero(~multi_word | (document_frequency >= min_count))
+    if len(kept) > max_terms:
+        kept = np.sort(kept[np.argsort(-document_frequency[kept], kind="stable")[:max_terms]])
+    if len(kept) < len(model.vocabulary):
+        model.restrict_features(kept)
+
+
+def train_from_csv(model: NaiveBayes, csv_path, hashing_features=hashingFeatures, feature_selection=None,
+                   ngram_range=ngramRange, **corpus_options):
+    """
+    Train the Naive Bayes model on a CSV of texts and sentiments.
+
+    Parameters:
+    model (NaiveBayes): The Naive Bayes model to be trained.
+    csv_path (str): Path of a CSV file with 'text' and 'sentiment' columns.
+    hashing_features (int): Number of hash buckets to hash the terms into, or None to keep the vocabulary.
+    feature_selection (dict): Feature selection options overriding those in bin/config.py.
+    ngram_range (tuple): Smallest and largest number of consecutive words per term.
+    **corpus_options: Passed to training_data.load_training_corpus (chunksize, cache_dir, max_terms, min_count).
+
+    Returns:
+    tuple: A tuple containing the trained model and the vocabulary (Vocabulary) used.
+    """
+    # Streaming the CSV into sparse vectors (or reading them back from the corpus cache)
+    X_train, labels, vocab = load_training_corpus(csv_path, ngram_range=ngram_range, **corpus_options)
+    if hashing_features:
+        # Only the bucket counts are kept in the model; the corpus vocabulary is dropped after this
+        hashing_vocab = HashingVocabulary(hashing_features, vocab.ngram_range)
+        X_train, vocab = hashing_vocab.remap(X_train, vocab), hashing_vocab
 
     # Fitting the model
     model.fit(X_train, labels, vocab)
+    _select_features(model, X_train, **(feature_selection or {}))
     print("Model fitting complete.")
 
-    return model, vocab  # Return the trained model and the vocab
+    return model, model.vocabulary
+
+
+def _select_features(model: NaiveBayes, sample=None, **options):
+    """
+    Drop the features the feature selection options in bin/config.py leave out (see bin/feature_selection.py),
+    and report the saved model's size and the prediction latency before and after.
+
+    Parameters:
+    model (NaiveBayes): A freshly trained model with raw counts.
+    sample (list or SparseVectors): Training posts to time predictions on, as texts or as vectors in the
+        model's current feature space (only the first SELECTION_LATENCY_SAMPLE are used). No timing when None.
+    **options: Overrides of select_features' options (min_df, max_df, max_features, k, score).
+
+    Returns:
+    dict: features, model_bytes and latency_seconds, each a (before, after) pair (latency None without a
+        sample), or None if no selection is configured.
+    """
+    selection_options = {name: options[name] for name in ("min_df", "max_df", "max_features", "k") if name in options}
+    if model.vocabulary.hashed or not model.has_counts() or not selection_enabled(**selection_options):
+        return None
+
+    if sample is not None and not isinstance(sample, SparseVectors):
+        sample = text_to_sparse_vectors(list(sample)[:SELECTION_LATENCY_SAMPLE], model.vocabulary)
+    elif sample is not None:
+        sample = _first_vectors(sample, SELECTION_LATENCY_SAMPLE)
+
+    num_features = len(model.vocabulary)
+    bytes_before, latency_before = _measure_model(model, sample)
+    kept = select_features(model._class_counts, model._feature_counts, **options)
+    model.restrict_features(kept)
+    if sample is not None:
+        sample = _restrict_vectors(sample, kept)
+    bytes_after, latency_after = _measure_model(model, sample)
+
+    print(f"Feature selection kept {len(kept)} of {num_features} features: saved model "
+          f"{bytes_before / 1e6:.2f} MB -> {bytes_after / 1e6:.2f} MB.")
+    if sample is not None:
+        print(f"Prediction time for {len(sample)} training posts: "
+              f"{latency_before * 1000:.1f} ms -> {latency_after * 1000:.1f} ms.")
+    return {"features": (num_features, len(kept)), "model_bytes": (bytes_before, bytes_after),
+            "latency_seconds": (latency_before, latency_after) if sample is not None else None}
+
+
+def _measure_model(model: NaiveBayes, sample):
+    """
+    Measure the size of a model saved in the binary format, and how long it takes to predict a sample.
+
+    Parameters:
+    model (NaiveBayes): The model.
+    sample (SparseVectors): Documents in the model's feature space, or None to skip the timing.
+
+    Returns:
+    tuple: (bytes of the saved model, seconds to predict the sample or None).
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "model" + BINARY_MODEL_EXTENSION)
+        model.save_binary(path)
+        size = os.path.getsize(path)
+
+    if sample is None:
+        return size, None
+    # Saving built the scoring tables, so the timing covers predicting only
+    started = time.perf_counter()
+    model.predict(sample)
+    return size, time.perf_counter() - started
+
+
+def _first_vectors(X: SparseVectors, count):
+    # The first count documents of X
+    count = min(count, len(X))
+    return SparseVectors(X.indptr[:count + 1], X.indices[:X.indptr[count]], X.num_features)
+
+
+def _restrict_vectors(X: SparseVectors, positions):
+    # X re-indexed against the kept features (see NaiveBayes.restrict_features), the others dropped
+    new_positions = np.full(X.num_features, -1, dtype=np.int64)
+    new_positions[positions] = np.arange(len(positions))
+    mapped = new_positions[X.indices]
+    present = mapped >= 0
+    indptr = np.zeros(len(X) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(X.document_ids()[present], minlength=len(X)), out=indptr[1:])
+    return SparseVectors(indptr, mapped[present], len(positions))
+
+
+def update(model: NaiveBayes, data, labels):
+    """
+    Fold newly labelled documents (e.g. moderator-corrected posts) into a trained model.
+
+    New words are appended to the model's vocabulary and only the new documents are counted, so
+    earlier training data is never reprocessed.
+
+    Parameters:
+    model (NaiveBayes): The trained Naive Bayes model (with raw counts) to update.
+    data (list): A list of new documents.
+    labels (list): A list of class labels corresponding to the documents.
+
+    Returns:
+    tuple: A tuple containing the updated model and its (possibly extended) vocabulary.
+    """
+    # Extending the vocabulary with the new, non stop word terms (document by document, sorted within each)
+    ngram_range = model.vocabulary.ngram_range
+    tokenized = tokenize_batch(data, ngram_range=ngram_range)
+    new_terms = (word for terms in tokenized for word in sorted(terms))
+    if ngram_range != (1, 1) and not model.vocabulary.hashed:
+        # N-gram vocabularies stay within the n-gram budget; terms beyond it are left out
+        room = max(ngramMaxTerms - len(model.vocabulary), 0)
+        new_terms = list(dict.fromkeys(word for word in new_terms if word not in model.vocabulary))[:room]
+    vocab = model.vocabulary.extended(new_terms)
+
+    X_update = text_to_sparse_vectors(data, vocab, tokenized)
+    model.partial_fit(X_update, labels, vocab)
+    print("Model update complete.")
+
+    return model, vocab
+
+
+def _model_vocabulary(model: NaiveBayes, vocab):
+    """
+    Return the vocabulary to vectorize a model's input with, checking it matches the model's.
+
+    Hashed models need no check: any text is hashed into the model's own buckets.
+    """
+    if vocab is None or model.vocabulary.hashed:
+        return model.vocabulary
+    # Check if the provided vocabulary matches the model's internal vocabulary
+    # (identity first, then the vocabularies' fingerprints, never a term-by-term walk)
+    if vocab is not model.vocabulary and vocab != model.vocabulary:
+        raise ValueError("Vocabulary mismatch between provided vocab and model's internal vocab.")
+    return vocab
 
 
 def predict(model: NaiveBayes, data, vocab):
@@ -33,21 +343,46 @@ def predict(model: NaiveBayes, data, vocab):
 
     Parameters:
     model (NaiveBayes): The trained Naive Bayes model.
-    data (list): A list of documents to be classified.
-    vocab (list): The vocabulary used to vectorize the test data.
+    data (list or SparseVectors): A list of documents to be classified, or documents already
+        vectorized with text_to_sparse_vectors against vocab.
+    vocab (Vocabulary): The vocabulary used to vectorize the test data (None for the model's own).
 
     Returns:
     list: A list of predicted class labels for the documents.
     """
-    # Check if the provided vocabulary matches the model's internal vocabulary
-    if vocab != model.vocabulary:
-        raise ValueError("Vocabulary mismatch between provided vocab and model's internal vocab.")
+    vocab = _model_vocabulary(model, vocab)
 
     # Vectorizing test data
-    X_test = text_to_binary_vectors(data, vocab)
+    if isinstance(data, SparseVectors):
+        X_test = data
+    else:
+        X_test = text_to_sparse_vectors(data, vocab)
 
     # Making predictions
     predictions = model.predict(X_test)
     print("Prediction complete.")
 
-    return predictions
\ No newline at end of file
+    return predictions
+
+
+def predict_proba(model: NaiveBayes, data, vocab):
+    """
+    Predict the class labels and class probabilities for the provided data.
+
+    Parameters:
+    model (NaiveBayes): The trained Naive Bayes model.
+    data (list or SparseVectors): A list of documents to be classified, or documents already
+        vectorized with text_to_sparse_vectors against vocab.
+    vocab (Vocabulary): The vocabulary used to vectorize the test data (None for the model's own).
+
+    Returns:
+    tuple: (list of predicted class labels, list of class labels in column order,
+        numpy array of shape (documents, classes) with the class probabilities).
+    """
+    vocab = _model_vocabulary(model, vocab)
+
+    X_test = data if isinstance(data, SparseVectors) else text_to_sparse_vectors(data, vocab)
+
+    class_order, probabilities = model.predict_proba(X_test)
+    predictions = [class_order[column] for column in np.argmax(probabilities, axis=1)] if len(probabilities) else []
+    return predictions, class_order, probabilities
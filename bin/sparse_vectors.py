@@ -0,0 +1,91 @@
+import numpy as np
+
+
+class SparseVectors:
+    """
+    Compact, CSR-style storage for a batch of binary document vectors.
+
+    Only the vocabulary indices present in each document are kept: the indices of document i are
+    indices[indptr[i]:indptr[i + 1]]. This replaces one full-vocabulary list of ints per document.
+    """
+
+    def __init__(self, indptr, indices, num_features):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.uint32)
+        self.num_features = num_features
+
+    @classmethod
+    def from_rows(cls, rows, num_features=None):
+        """
+        Build sparse vectors from one iterable of present feature indices per document.
+
+        Parameters:
+        rows (list): List of documents, each an iterable of the (unique) vocabulary indices present in it.
+        num_features (int): Number of features (vocabulary size). Defaults to the largest index + 1.
+
+        Returns:
+        SparseVectors: The documents in CSR form.
+        """
+        row_arrays = [np.asarray(row, dtype=np.int64).ravel() for row in rows]
+        indptr = np.zeros(len(row_arrays) + 1, dtype=np.int64)
+        np.cumsum([len(row) for row in row_arrays], out=indptr[1:])
+        indices = np.concatenate(row_arrays) if row_arrays else np.zeros(0, dtype=np.int64)
+
+        if num_features is None:
+            num_features = int(indices.max()) + 1 if indices.size else 0
+
+        if indices.size and (indices.min() < 0 or indices.max() >= num_features):
+            raise ValueError(f"Feature index out of bounds for vocabulary (size {num_features}).")
+
+        return cls(indptr, indices, num_features)
+
+    @classmethod
+    def from_dense(cls, vectors, num_features=None):
+        """
+        Build sparse vectors from dense binary vectors.
+
+        Parameters:
+        vectors (list): List of dense 0/1 feature vectors.
+        num_features (int): Number of features. Defaults to the length of the first vector.
+
+        Returns:
+        SparseVectors: The documents in CSR form.
+        """
+        rows = [np.flatnonzero(np.asarray(vector)) for vector in vectors]
+        if num_features is None:
+            num_features = len(vectors[0]) if len(vectors) else 0
+        return cls.from_rows(rows, num_features)
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def __getitem__(self, position):
+        return self.indices[self.indptr[position]:self.indptr[position + 1]]
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
+
+    def document_ids(self):
+        """
+        Return the document position of every stored index, aligned with `indices`.
+
+        Returns:
+        numpy.ndarray: Document positions (int64).
+        """
+        return np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.indptr))
+
+    def to_dense(self):
+        """
+        Expand back to dense 0/1 vectors (mainly for debugging and small batches).
+
+        Returns:
+        list: List of dense binary vectors.
+        """
+        vectors = []
+        for row in self:
+            vector = [0] * self.num_features
+            for feature_position in row:
+                vector[feature_position] = 1
+            vectors.append(vector)
+        return vectors
@@ -0,0 +1,130 @@
+import re
+
+# English stop words, bundled so that importing the tokenizer never needs NLTK or a network check
+# (the same 179 words as NLTK's stopwords.words('english'))
+ENGLISH_STOP_WORDS = frozenset("""
+i me my myself we our ours ourselves you you're you've you'll you'd your yours yourself yourselves he him
+his himself she she's her hers herself it it's its itself they them their theirs themselves what which who
+whom this that that'll these those am is are was were be been being have has had having do does did doing
+a an the and but if or because as until while of at by for with about against between into through during
+before after above below to from up down in out on off over under again further then once here there when
+where why how all any both each few more most other some such no nor not only own same so than too very s
+t can will just don don't should should've now d ll m o re ve y ain aren aren't couldn couldn't didn
+didn't doesn doesn't hadn hadn't hasn hasn't haven haven't isn isn't ma mightn mightn't mustn mustn't
+needn needn't shan shan't shouldn shouldn't wasn wasn't weren weren't won won't wouldn wouldn't
+""".split())
+
+URL_TOKEN = "<url>"
+MENTION_TOKEN = "<mention>"
+
+# Joins the words of an n-gram term, e.g. "not good" (tokens never contain spaces)
+NGRAM_SEPARATOR = " "
+
+# One pass over the lowercased text; the alternatives are tried in order at every position
+_TOKEN_PATTERN = re.compile(r"""
+    https?://\S+ | www\.\S+         # URLs (replaced by URL_TOKEN)
+  | @[\w-]+(?:\.[\w-]+)*           # Mentions of handles, e.g. @alice.bsky.social (replaced by MENTION_TOKEN)
+  | \#\w+                           # Hashtags, kept with their #
+  | [:;=]-?[()\[\]dp/|]             # Emoticons, e.g. :) ;-( :d
+  | \w+(?:'\w+)*                    # Words, with inner apostrophes (don't, i'd)
+""", re.VERBOSE)
+
+
+def _prepare(text):
+    # Backticks and typographic apostrophes are read as plain apostrophes (the training data writes I`d)
+    return str(text).lower().replace("`", "'").replace("\u2019", "'").replace("\u2018", "'")
+
+
+def _normalise(token):
+    if token[0] == "@":
+        return MENTION_TOKEN
+    if token.startswith(("http://", "https://", "www.")):
+        return URL_TOKEN
+    return token
+
+
+def tokenize(text):
+    """
+    Function to split a post into lowercase tokens.
+
+    URLs and mentions become the placeholder tokens URL_TOKEN and MENTION_TOKEN, hashtags keep their #,
+    emoticons are kept and other punctuation is dropped. Stop words are not removed.
+
+    Parameters:
+    text (str): The text to tokenize. Non-string values (e.g. NaN) are converted with str().
+
+    Returns:
+    list: The tokens of the text, in order.
+    """
+    return [_normalise(token) for token in _TOKEN_PATTERN.findall(_prepare(text))]
+
+
+def document_terms(text, stop_words=ENGLISH_STOP_WORDS, ngram_range=(1, 1)):
+    """
+    Function returns the distinct non stop word tokens of a text, i.e. its binary features.
+
+    Parameters:
+    text (str): The text to tokenize.
+    stop_words (frozenset): Tokens to leave out.
+    ngram_range (tuple): Smallest and largest number of consecutive tokens per term (see ngram_terms).
+
+    Returns:
+    set: The text's distinct tokens, without stop words.
+    """
+    return tokenize_batch([text], stop_words, ngram_range)[0]
+
+
+def ngram_terms(tokens, ngram_range, stop_words=ENGLISH_STOP_WORDS):
+    """
+    Function returns the distinct n-gram terms of a tokenized text.
+
+    Single tokens that are stop words are left out, but longer n-grams are only left out when every
+    one of their tokens is a stop word, so negations such as "not good" are kept.
+
+    Parameters:
+    tokens (list): The text's tokens, in order (see tokenize).
+    ngram_range (tuple): Smallest and largest number of consecutive tokens per term, e.g. (1, 2).
+    stop_words (frozenset): Tokens to leave out.
+
+    Returns:
+    set: The n-grams, their tokens joined by NGRAM_SEPARATOR.
+    """
+    smallest, largest = ngram_range
+    terms = set(tokens).difference(stop_words) if smallest == 1 else set()
+    for n in range(max(smallest, 2), largest + 1):
+        for start in range(len(tokens) - n + 1):
+            gram = tokens[start:start + n]
+            if not stop_words.issuperset(gram):
+                terms.add(NGRAM_SEPARATOR.join(gram))
+    return terms
+
+
+def tokenize_batch(texts, stop_words=ENGLISH_STOP_WORDS, ngram_range=(1, 1)):
+    """
+    Function tokenizes every text once, for sharing between vocabulary building and vectorization.
+
+    The per-text work runs in a single loop, with the regular expression's methods bound once.
+
+    Parameters:
+    texts (iterable): The texts to tokenize.
+    stop_words (frozenset): Tokens to leave out.
+    ngram_range (tuple): Smallest and largest number of consecutive tokens per term (see ngram_terms).
+
+    Returns:
+    list: The set of distinct non stop word tokens of each text (see document_terms).
+    """
+    if tuple(ngram_range) != (1, 1):
+        return [ngram_terms(tokenize(text), ngram_range, stop_words) for text in texts]
+
+    findall = _TOKEN_PATTERN.findall
+    tokenized = []
+    append = tokenized.append
+    for text in texts:
+        text = _prepare(text)
+        tokens = set(findall(text)).difference(stop_words)
+        if "@" in text or "http" in text or "www." in text:
+            special = [token for token in tokens if _normalise(token) != token]
+            tokens.difference_update(special)
+            tokens.update(_normalise(token) for token in special)
+        append(tokens)
+    return tokenized
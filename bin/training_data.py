@@ -0,0 +1,131 @@
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+from bin.config import corpusCacheDirectory, ngramMaxTerms, ngramMinCount, ngramRange, trainingChunkSize
+from bin.data_utils import CorpusBuilder
+from bin.model_format import atomic_output, file_digest
+from bin.ngram_store import NgramCorpusBuilder
+from bin.sparse_vectors import SparseVectors
+from bin.vocabulary import Vocabulary
+
+# Label ids used for training (0 (Negative), 1 (Neutral), 2 (Positive))
+SENTIMENT_LABELS = {"negative": 0, "neutral": 1, "positive": 2}
+
+# Bumped whenever tokenization changes, so stale cached corpora are not reused
+CORPUS_CACHE_VERSION = 2
+
+
+def map_sentiment_labels(sentiments):
+    """
+    Function to map sentiment values to label ids in one vectorized step.
+
+    Parameters:
+    sentiments (pandas.Series): Sentiment strings ("positive", "Neutral", ...) and/or numeric label ids.
+
+    Returns:
+    pandas.Series: Label ids (float, NaN where the sentiment is not recognised).
+    """
+    numeric_labels = pd.to_numeric(sentiments, errors='coerce')
+    text_labels = sentiments.astype(str).str.strip().str.lower().map(SENTIMENT_LABELS)
+    return numeric_labels.fillna(text_labels)
+
+
+def iter_training_chunks(csv_path, chunksize=trainingChunkSize):
+    """
+    Function to stream the training CSV in chunks of texts and label ids.
+
+    Parameters:
+    csv_path (str): Path of a CSV file with 'text' and 'sentiment' columns.
+    chunksize (int): Number of rows per chunk.
+
+    Returns:
+    generator: (texts (pandas.Series), labels (numpy.ndarray of int)) per chunk. Rows with an
+    unrecognised sentiment are skipped.
+    """
+    for chunk in pd.read_csv(csv_path, usecols=['text', 'sentiment'], chunksize=chunksize):
+        labels = map_sentiment_labels(chunk['sentiment'])
+        known = labels.notna()
+        if not known.all():
+            print(f"Warning: Skipping {int((~known).sum())} rows with an unrecognised sentiment.")
+        yield chunk['text'][known], labels[known].astype(int).to_numpy()
+
+
+def _corpus_cache_path(csv_path, cache_dir, ngram_options=None):
+    key_source = f"{file_digest(csv_path)}:{CORPUS_CACHE_VERSION}"
+    if ngram_options:
+        key_source += ":ngrams:" + ":".join(str(option) for option in ngram_options)
+    key = hashlib.sha256(key_source.encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, f"corpus-{key[:24]}.npz")
+
+
+def _save_corpus(cache_path, X, labels, vocab):
+    os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+    with atomic_output(cache_path, 'wb') as f:
+        np.savez(f, indptr=X.indptr, indices=X.indices, labels=labels,
+                 vocabulary=np.frombuffer("\0".join(vocab.terms).encode('utf-8'), dtype=np.uint8),
+                 ngram_range=np.array(vocab.ngram_range, dtype=np.int64))
+
+
+def _load_corpus(cache_path):
+    with np.load(cache_path) as cached:
+        vocabulary_blob = cached['vocabulary'].tobytes()
+        ngram_range = tuple(cached['ngram_range'].tolist()) if 'ngram_range' in cached.files else (1, 1)
+        vocab = Vocabulary(vocabulary_blob.decode('utf-8').split("\0") if vocabulary_blob else [], ngram_range)
+        X = SparseVectors(cached['indptr'], cached['indices'], len(vocab))
+        return X, cached['labels'], vocab
+
+
+def load_training_corpus(csv_path, chunksize=trainingChunkSize, cache_dir=corpusCacheDirectory, ngram_range=ngramRange,
+                         max_terms=ngramMaxTerms, min_count=ngramMinCount):
+    """
+    Function to load the training data as a vocabulary, sparse vectors and label ids.
+
+    The CSV is streamed in chunks and every text is tokenized exactly once; only compact arrays of
+    vocabulary indices are kept. The result is cached under cache_dir, keyed on the CSV's content
+    hash, so later retrains on the same file skip reading and tokenization entirely.
+
+    Parameters:
+    csv_path (str): Path of a CSV file with 'text' and 'sentiment' columns.
+    chunksize (int): Number of rows read at a time.
+    cache_dir (str): Directory of the corpus cache, or None to disable it.
+    ngram_range (tuple): Smallest and largest number of consecutive words per term. Beyond single
+        words, the terms are counted with an NgramCorpusBuilder.
+    max_terms (int): With n-grams, the size of the n-gram count table (see NgramCorpusBuilder).
+    min_count (int): With n-grams, the fewest posts an n-gram of two or more words must appear in.
+
+    Returns:
+    tuple: (SparseVectors, numpy.ndarray of label ids, Vocabulary), identical to build_vocab followed
+    by text_to_sparse_vectors.
+    """
+    use_ngrams = tuple(ngram_range) != (1, 1)
+    ngram_options = (tuple(ngram_range), max_terms, min_count) if use_ngrams else None
+    cache_path = _corpus_cache_path(csv_path, cache_dir, ngram_options) if cache_dir else None
+    if cache_path and os.path.exists(cache_path):
+        try:
+            print(f"Loading tokenized training corpus from {cache_path}...")
+            return _load_corpus(cache_path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Warning: Could not read the corpus cache ({e}). Re-tokenizing.")
+
+    corpus = NgramCorpusBuilder(ngram_range, max_terms, min_count) if use_ngrams else CorpusBuilder()
+    label_chunks = []
+
+    for texts, labels in tqdm(iter_training_chunks(csv_path, chunksize), desc="Reading training data..."):
+        corpus.add_texts(texts)
+        label_chunks.append(labels)
+
+    X, vocab = corpus.build()
+    labels = np.concatenate(label_chunks) if label_chunks else np.zeros(0, dtype=np.int64)
+
+    if cache_path:
+        try:
+            _save_corpus(cache_path, X, labels, vocab)
+            print(f"Tokenized training corpus cached at {cache_path}.")
+        except OSError as e:
+            print(f"Warning: Could not write the corpus cache: {e}")
+
+    return X, labels, vocab
@@ -0,0 +1,113 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TrainingJob:
+    """
+    A training run executing in the background, with its progress.
+
+    Attributes:
+        key: What is being trained (e.g. the model file path).
+        future: concurrent.futures.Future resolving to the training function's result.
+        stage: Human readable description of the current step.
+        progress: Fraction of the work done, between 0 and 1.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.future = None
+        self.stage = "Queued"
+        self.progress = 0.0
+        self.started_at = time.time()
+
+    def report(self, stage, progress):
+        """
+        Record the current step of the job. Passed to the training function as its progress callback.
+
+        Parameters:
+        stage (str): Description of the step being run.
+        progress (float): Fraction of the work done, between 0 and 1.
+
+        Returns:
+        None
+        """
+        self.stage = stage
+        self.progress = max(0.0, min(1.0, progress))
+        print(f"Training {self.key}: {stage} ({self.progress:.0%})")
+
+    def done(self):
+        return self.future.done()
+
+    def failed(self):
+        return self.future.done() and self.future.exception() is not None
+
+    def status(self):
+        """
+        Describe the job for users.
+
+        Returns:
+        str: The job's stage, progress and elapsed time.
+        """
+        if self.failed():
+            return f"Training failed: {self.future.exception()}"
+        return f"{self.stage} ({self.progress:.0%}, {time.time() - self.started_at:.0f}s elapsed)"
+
+
+class TrainingJobManager:
+    """
+    Runs training functions in a background worker, at most one job per key at a time.
+
+    Submitting a key whose job is still queued or running returns that job instead of starting a new
+    one, so concurrent first requests share a single training run (and its future).
+    """
+
+    def __init__(self, max_workers=1):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="training")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, train_function):
+        """
+        Start train_function in the background unless a job for key is already in flight.
+
+        Parameters:
+        key: Identifies what is being trained (e.g. the model file path).
+        train_function (callable): Called as train_function(report), where report(stage, progress)
+            records progress. Its return value becomes the job future's result.
+
+        Returns:
+        TrainingJob: The new or already running job.
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and not job.done():
+                return job
+
+            job = TrainingJob(key)
+            job.future = self._executor.submit(self._run, job, train_function)
+            self._jobs[key] = job
+            return job
+
+    @staticmethod
+    def _run(job, train_function):
+        job.report("Starting", 0.0)
+        result = train_function(job.report)
+        job.report("Done", 1.0)
+        return result
+
+    def get(self, key):
+        """
+        Return the latest job submitted for key.
+
+        Parameters:
+        key: Identifies what is being trained.
+
+        Returns:
+        TrainingJob: The job, or None if nothing was submitted for key.
+        """
+        with self._lock:
+            return self._jobs.get(key)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
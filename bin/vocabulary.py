@@ -0,0 +1,259 @@
+import hashlib
+import zlib
+
+import numpy as np
+
+from bin.sparse_vectors import SparseVectors
+
+
+class Vocabulary:
+    """
+    Ordered vocabulary with O(1) token -> index lookups.
+
+    The ordered term list is kept for serialization, while a dictionary maps every term to its
+    feature index. A content fingerprint (computed once) gives a cheap equality check between
+    vocabularies, so comparing a vocabulary to a model's vocabulary no longer walks both lists.
+
+    ngram_range records which terms texts are split into (see tokenizer.ngram_terms), so texts are
+    vectorized against the vocabulary the way its terms were extracted.
+    """
+
+    hashed = False  # Features are vocabulary positions, not hash buckets (see HashingVocabulary)
+
+    def __init__(self, terms=(), ngram_range=(1, 1)):
+        self.terms = list(terms)
+        self.index = {term: position for position, term in enumerate(self.terms)}
+        if len(self.index) != len(self.terms):
+            raise ValueError("Vocabulary terms must be unique.")
+        self.ngram_range = check_ngram_range(ngram_range)
+        self._fingerprint = None
+
+    @property
+    def fingerprint(self):
+        """
+        Hex digest identifying the ordered terms of the vocabulary.
+
+        Returns:
+        str: SHA-1 digest of the terms, in order.
+        """
+        if self._fingerprint is None:
+            digest = hashlib.sha1()
+            if self.ngram_range != (1, 1):
+                digest.update(f"ngrams:{self.ngram_range[0]}-{self.ngram_range[1]}\0".encode('utf-8'))
+            for term in self.terms:
+                digest.update(term.encode('utf-8'))
+                digest.update(b'\0')  # Separator, so ["ab", "c"] and ["a", "bc"] differ
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def get(self, term, default=None):
+        """
+        Look up the feature index of a term.
+
+        Parameters:
+        term (str): The term to look up.
+        default: Value returned when the term is not in the vocabulary.
+
+        Returns:
+        int: The index of the term, or default.
+        """
+        return self.index.get(term, default)
+
+    def indices(self, words):
+        """
+        Map words to the sorted, unique indices of those present in the vocabulary.
+
+        Parameters:
+        words (iterable): Words of a document.
+
+        Returns:
+        list: Sorted feature indices.
+        """
+        index = self.index
+        return sorted({index[word] for word in words if word in index})
+
+    def extends(self, other):
+        """
+        Check whether this vocabulary starts with all of other's terms, in the same order.
+
+        Parameters:
+        other (Vocabulary): The vocabulary that may have been extended.
+
+        Returns:
+        bool: True if features indexed against other keep their index in this vocabulary.
+        """
+        if other is self:
+            return True
+        if other.ngram_range != self.ngram_range and len(other):
+            return False
+        return len(self) >= len(other) and self.terms[:len(other)] == other.terms
+
+    def extended(self, terms):
+        """
+        Return a vocabulary with the new terms appended after the existing ones.
+
+        Existing terms keep their index, so counts and vectors built against this vocabulary remain
+        valid. The new vocabulary is no longer sorted.
+
+        Parameters:
+        terms (iterable): Candidate terms; those already present are ignored.
+
+        Returns:
+        Vocabulary: self if there is nothing new, otherwise the extended vocabulary.
+        """
+        new_terms = []
+        seen = set()
+        for term in terms:
+            if term not in self.index and term not in seen:
+                seen.add(term)
+                new_terms.append(term)
+        if not new_terms:
+            return self
+        return Vocabulary(self.terms + new_terms, self.ngram_range)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def __iter__(self):
+        return iter(self.terms)
+
+    def __getitem__(self, position):
+        return self.terms[position]
+
+    def __contains__(self, term):
+        return term in self.index
+
+    def __eq__(self, other):
+        if other is self:
+            return True
+        if isinstance(other, Vocabulary):
+            return len(self) == len(other) and self.fingerprint == other.fingerprint
+        if isinstance(other, (list, tuple)):
+            return self.ngram_range == (1, 1) and self.terms == list(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.fingerprint)
+
+    def __repr__(self):
+        return f"Vocabulary({len(self)} terms)"
+
+
+def check_ngram_range(ngram_range):
+    """
+    Function validates an n-gram range.
+
+    Parameters:
+    ngram_range (tuple): Smallest and largest number of consecutive tokens per term.
+
+    Returns:
+    tuple: The range as a tuple of two ints.
+    """
+    smallest, largest = (int(n) for n in ngram_range)
+    if not 1 <= smallest <= largest:
+        raise ValueError(f"Invalid n-gram range {ngram_range}: expected 1 <= smallest <= largest.")
+    return smallest, largest
+
+
+class HashingVocabulary(Vocabulary):
+    """
+    Fixed-size feature space for the hashing trick: every term maps to one of num_features buckets.
+
+    No terms are stored, so the model's memory and file size depend on num_features only, however
+    many distinct terms training and updates bring. Terms sharing a bucket share a feature. The hash
+    (CRC-32 of the UTF-8 term) is stable across processes, unlike Python's hash().
+    """
+
+    hashed = True
+
+    def __init__(self, num_features, ngram_range=(1, 1)):
+        super().__init__(ngram_range=ngram_range)
+        if int(num_features) <= 0:
+            raise ValueError("The number of hash buckets must be positive.")
+        self.num_features = int(num_features)
+
+    @property
+    def fingerprint(self):
+        if self.ngram_range != (1, 1):
+            return f"crc32:{self.num_features}:ngrams:{self.ngram_range[0]}-{self.ngram_range[1]}"
+        return f"crc32:{self.num_features}"
+
+    def bucket(self, term):
+        """
+        Return the feature index of a term.
+
+        Parameters:
+        term (str): The term.
+
+        Returns:
+        int: Its bucket, between 0 and num_features - 1.
+        """
+        return zlib.crc32(term.encode('utf-8')) % self.num_features
+
+    def get(self, term, default=None):
+        return self.bucket(term)
+
+    def indices(self, words):
+        """
+        Map words to the sorted, unique buckets they fall in.
+
+        Parameters:
+        words (iterable): Words of a document.
+
+        Returns:
+        list: Sorted feature indices.
+        """
+        crc32, num_features = zlib.crc32, self.num_features
+        return sorted({crc32(word.encode('utf-8')) % num_features for word in words})
+
+    def remap(self, X, vocabulary):
+        """
+        Move documents vectorized against a term vocabulary into the hash buckets.
+
+        Parameters:
+        X (SparseVectors): Documents indexed against vocabulary.
+        vocabulary (Vocabulary): The term vocabulary of X.
+
+        Returns:
+        SparseVectors: The same documents indexed by bucket (a document's terms sharing a bucket count once).
+        """
+        buckets = np.array([self.bucket(term) for term in vocabulary.terms], dtype=np.int64)
+        # One sorted, de-duplicated id per (document, bucket) pair
+        cells = np.unique(X.document_ids() * self.num_features + buckets[X.indices.astype(np.int64)])
+        indptr = np.zeros(len(X) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cells // self.num_features, minlength=len(X)), out=indptr[1:])
+        return SparseVectors(indptr, cells % self.num_features, self.num_features)
+
+    def extends(self, other):
+        """
+        Hashed features never move, so the vocabulary extends itself and the empty vocabulary of an untrained model.
+        """
+        return other == self or (not other.hashed and len(other) == 0)
+
+    def extended(self, terms):
+        return self
+
+    def __len__(self):
+        return self.num_features
+
+    def __iter__(self):
+        raise TypeError("A hashing vocabulary stores no terms.")
+
+    def __getitem__(self, position):
+        raise TypeError("A hashing vocabulary stores no terms.")
+
+    def __contains__(self, term):
+        return True
+
+    def __eq__(self, other):
+        if other is self:
+            return True
+        if isinstance(other, Vocabulary):
+            return other.hashed and other.num_features == self.num_features and other.ngram_range == self.ngram_range
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.fingerprint)
+
+    def __repr__(self):
+        return f"HashingVocabulary({self.num_features} buckets)"
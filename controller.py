@@ -1,3 +1,14 @@
+import asyncio
+import threading
+
+import pandas as pd
+
+from BSkyAPI import _is_newer
+from sentiment_windows import SentimentAggregator
+
+EMPTY_STATS_STRING = "Positive: 0\nNeutral: 0\nNegative:0"
+
+
 class Controller:
     """
     Controller class to manage sentiment analysis requests by interacting with the API client 
@@ -7,9 +18,14 @@ class Controller:
         api_client: The API client used to fetch posts based on user input.
         sentiment_analyser: The sentiment analyser used to perform sentiment analysis on text data.
         model_path: The path to the pre-trained model for sentiment analysis.
+        max_posts: The default maximum number of posts analysed per request.
+        async_api_client: The asynchronous API client used to process several requests concurrently.
+        profile_store: The store of per-profile watermarks and running sentiment totals, if any.
+        aggregator: The time-windowed sentiment counts per query, if any.
     """
 
-    def __init__(self, api_client, sentiment_analyser, model_path: str):
+    def __init__(self, api_client, sentiment_analyser, model_path: str, max_posts: int = 100,
+                 async_api_client=None, profile_store=None, aggregator=None):
         """
         Initializes the Controller with the necessary components.
 
@@ -17,74 +33,330 @@ class Controller:
             api_client: The API client instance to interact with external services.
             sentiment_analyser: The sentiment analyser instance for analyzing sentiment.
             model_path: The path where the model is stored.
+            max_posts: The default maximum number of posts analysed per request.
+            async_api_client: The asynchronous API client instance (e.g. AsyncBlueskyAPI), if any.
+            profile_store: Store of per-profile watermarks and running totals (e.g. ProfileStore). When set,
+                repeat analyses of a profile only fetch and score the posts published since the last one.
+            aggregator: Time-windowed sentiment counts per query (e.g. SentimentAggregator), for trend views.
         """
         self.api_client = api_client
         self.sentiment_analyser = sentiment_analyser
         self.model_path = model_path
+        self.max_posts = max_posts
+        self.async_api_client = async_api_client
+        self.profile_store = profile_store
+        self.aggregator = aggregator
+        self._loop = None
+        self._loop_lock = threading.Lock()
 
-    def process_analysis_request(self, selected_choice: str, user_input_text: str, search_type: str) -> tuple[str, str]:
+    def _iter_pages(self, source: str, max_posts: int, *args, **kwargs):
+        """
+        Yields the fetched posts page by page.
+
+        API clients without the streaming iter_posts_from_* methods are asked for all the posts at once.
+
+        Parameters:
+            source: "search" or "handle".
+            max_posts: The maximum number of posts to fetch, or None for no limit.
+            *args: The arguments of the API client's fetch method.
+            **kwargs: Extra keyword arguments of the streaming method (e.g. since).
+
+        Returns:
+            A generator of pandas DataFrames.
+        """
+        iter_posts = getattr(self.api_client, f"iter_posts_from_{source}", None)
+        if iter_posts is not None:
+            yield from iter_posts(*args, max_posts=max_posts, **kwargs)
+        else:
+            yield getattr(self.api_client, f"get_posts_from_{source}")(*args)
+
+    def process_analysis_request(self, selected_choice: str, user_input_text: str, search_type: str,
+                                 max_posts: int = None) -> tuple[str, str]:
         """
         Processes the sentiment analysis request based on the user's input and choice.
 
+        Posts are fetched page by page and each page is analysed as soon as it arrives, while the API
+        client fetches the next one.
+
         Parameters:
             selected_choice: The choice selected by the user ("Profile" or "Keyword").
             user_input_text: The input text or profile name provided by the user.
             search_type: The type of search used in case of a keyword search (e.g., "en").
+            max_posts: The maximum number of posts to analyse. Defaults to the controller's max_posts.
 
         Returns:
             A tuple containing:
                 - A string with the analysis result (or error message).
                 - A string with the sentiment statistics.
         """
-        empty_stats_string = "Positive: 0\nNeutral: 0\nNegative:0"
+        empty_stats_string = EMPTY_STATS_STRING
+        max_posts = int(max_posts) if max_posts else self.max_posts
 
         # Check if user provided input
         if not user_input_text:
             return "Error: Please enter some text", empty_stats_string
 
         # Fetch API data based on selected choice
-        api_data = None
         if selected_choice == "Profile":
             api_data = self.api_client.handle_validation(user_input_text)
 
             if api_data is False:
                 return "The profile name is invalid or does not exist. Please try again.", empty_stats_string
-            api_data = self.api_client.get_posts_from_handle(user_input_text)
+            since = self._profile_watermark(user_input_text)
+            # A repeat analysis pages all the way back to the watermark: capping it at max_posts would move
+            # the watermark past the older new posts without them ever being scored
+            pages = self._iter_pages("handle", None if since else max_posts, user_input_text,
+                                     **({"since": since} if since else {}))
+            no_posts_message = "No posts found for the profile, or an API error occurred."
+            return self._analyse_pages(pages, no_posts_message, actor=user_input_text, since=since,
+                                       query=SentimentAggregator.query_key(selected_choice, user_input_text))
 
         elif selected_choice == "Keyword":
-            api_data = self.api_client.get_posts_from_search(user_input_text, search_type, "en")
-
-            if api_data.empty or api_data is None:
-                return "No posts found for the keyword, or an API error occurred.", empty_stats_string
+            pages = self._iter_pages("search", max_posts, user_input_text, search_type, "en")
+            no_posts_message = "No posts found for the keyword, or an API error occurred."
 
         else:
             return "Error: Invalid choice selected.", empty_stats_string
 
-        # Process text from API response
-        actual_texts_list = api_data['text'].tolist()
-        if not actual_texts_list:
+        return self._analyse_pages(pages, no_posts_message,
+                                   query=SentimentAggregator.query_key(selected_choice, user_input_text))
+
+    def sentiment_trend(self, selected_choice: str, user_input_text: str, resolution: str = "hour",
+                        window: int = 1):
+        """
+        Returns the sentiment of a query's analysed posts over time, for trend views.
+
+        Parameters:
+            selected_choice: The choice selected by the user ("Profile" or "Keyword").
+            user_input_text: The profile name or keyword.
+            resolution: The bucket width: "minute", "hour" or "day".
+            window: Buckets per window: 1 for tumbling windows, more for sliding windows.
+
+        Returns:
+            A pandas DataFrame in long format (window_start, sentiment, count), empty without an aggregator.
+        """
+        if self.aggregator is None or not user_input_text:
+            return pd.DataFrame(columns=["window_start", "sentiment", "count"])
+
+        series = self.aggregator.series(SentimentAggregator.query_key(selected_choice, user_input_text),
+                                        resolution=resolution, window=window)
+        return series.melt(id_vars="window_start", value_vars=["Positive", "Neutral", "Negative"],
+                           var_name="sentiment", value_name="count")
+
+    def _profile_watermark(self, actor: str):
+        """
+        Returns the createdAt of the newest post analysed for a profile, or None if it was never analysed
+        (or no profile store is configured).
+        """
+        if self.profile_store is None:
+            return None
+        state = self.profile_store.get(actor)
+        return state["last_created_at"] if state is not None else None
+
+    def process_analysis_requests(self, analysis_requests, max_concurrency: int = 8,
+                                  max_posts: int = None) -> list[tuple[str, str]]:
+        """
+        Processes many sentiment analysis requests, fetching their posts concurrently.
+
+        Parameters:
+            analysis_requests: Iterable of (selected_choice, user_input_text, search_type) tuples.
+            max_concurrency: The maximum number of requests fetching posts at the same time.
+            max_posts: The maximum number of posts to analyse per request. Defaults to the controller's max_posts.
+
+        Returns:
+            A list with one (analysis result, sentiment statistics) tuple per request, in the same order.
+        """
+        future = asyncio.run_coroutine_threadsafe(
+            self.process_analysis_requests_async(analysis_requests, max_concurrency, max_posts), self._event_loop()
+        )
+        return future.result()
+
+    def _event_loop(self):
+        """
+        Returns the controller's event loop, running in a background thread.
+
+        The asynchronous API client keeps its connections and locks bound to one loop, so every batch of
+        requests runs on this same loop rather than on a new one per call.
+        """
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="controller-event-loop", daemon=True).start()
+            return self._loop
+
+    async def process_analysis_requests_async(self, analysis_requests, max_concurrency: int = 8,
+                                              max_posts: int = None) -> list[tuple[str, str]]:
+        """
+        Coroutine version of process_analysis_requests, for callers already running an event loop.
+
+        Posts are fetched with the asynchronous API client; the sentiment analysis of each request runs
+        in a worker thread so it does not hold up the other requests' fetches.
+
+        Parameters:
+            analysis_requests: Iterable of (selected_choice, user_input_text, search_type) tuples.
+            max_concurrency: The maximum number of requests fetching posts at the same time.
+            max_posts: The maximum number of posts to analyse per request. Defaults to the controller's max_posts.
+
+        Returns:
+            A list with one (analysis result, sentiment statistics) tuple per request, in the same order.
+        """
+        if self.async_api_client is None:
+            raise RuntimeError("An asynchronous API client is required to process several requests concurrently.")
+
+        max_posts = int(max_posts) if max_posts else self.max_posts
+        semaphore = asyncio.Semaphore(max(1, int(max_concurrency)))
+
+        async def bounded(analysis_request):
+            async with semaphore:
+                return await self._process_one_async(*analysis_request, max_posts=max_posts)
+
+        outcomes = await asyncio.gather(*(bounded(analysis_request) for analysis_request in analysis_requests),
+                                        return_exceptions=True)
+
+        # One failing request does not lose the results of the others
+        return [(f"Error: {outcome}", EMPTY_STATS_STRING) if isinstance(outcome, Exception) else outcome
+                for outcome in outcomes]
+
+    async def _process_one_async(self, selected_choice: str, user_input_text: str, search_type: str,
+                                 max_posts: int) -> tuple[str, str]:
+        # Check if user provided input
+        if not user_input_text:
+            return "Error: Please enter some text", EMPTY_STATS_STRING
+
+        client = self.async_api_client
+        if selected_choice == "Profile":
+            if await client.handle_validation(user_input_text) is False:
+                return "The profile name is invalid or does not exist. Please try again.", EMPTY_STATS_STRING
+            since = await asyncio.to_thread(self._profile_watermark, user_input_text)
+            api_data = await client.get_posts_from_handle(user_input_text, max_posts=None if since else max_posts,
+                                                          **({"since": since} if since else {}))
+            no_posts_message = "No posts found for the profile, or an API error occurred."
+            return await asyncio.to_thread(self._analyse_pages, [api_data], no_posts_message,
+                                           actor=user_input_text, since=since,
+                                           query=SentimentAggregator.query_key(selected_choice, user_input_text))
+
+        elif selected_choice == "Keyword":
+            api_data = await client.get_posts_from_search(user_input_text, search_type, "en", max_posts=max_posts)
+            no_posts_message = "No posts found for the keyword, or an API error occurred."
+
+        else:
+            return "Error: Invalid choice selected.", EMPTY_STATS_STRING
+
+        return await asyncio.to_thread(self._analyse_pages, [api_data], no_posts_message,
+                                       query=SentimentAggregator.query_key(selected_choice, user_input_text))
+
+    def _analyse_pages(self, pages, no_posts_message: str, actor: str = None, since: str = None,
+                       query: str = None) -> tuple[str, str]:
+        """
+        Runs the sentiment analyser on every page of posts and formats the combined results.
+
+        Parameters:
+            pages: Iterable of pandas DataFrames with a 'text' column.
+            no_posts_message: The message returned when no page holds any posts.
+            actor: The profile the posts belong to. With a profile store, the new posts' counts are added
+                to the profile's running totals and its watermark moves to the newest post.
+            since: The profile's watermark. Posts placed in the feed at or before it are skipped (by their
+                feed_time when the pages have one, so reposts count from when they were reposted).
+            query: The query key under which the posts are added to the aggregator's time windows.
+
+        Returns:
+            A tuple with the analysis result (or error message) and the sentiment statistics.
+        """
+        empty_stats_string = EMPTY_STATS_STRING
+        track_profile = actor is not None and self.profile_store is not None
+
+        # Perform sentiment analysis on every page as it arrives
+        analysis_result = []
+        sentiment_counts = None
+        fetched_any = False
+        newest_feed_time, newest_uri = None, None
+        for api_data in pages:
+            if api_data is None or api_data.empty:
+                continue
+            time_column = 'feed_time' if 'feed_time' in api_data.columns else 'created_at'
+            if since is not None and time_column in api_data.columns:
+                # Clients that cannot filter by date return posts already counted in the running totals
+                api_data = api_data[api_data[time_column].map(lambda feed_time: _is_newer(feed_time, since))]
+                if api_data.empty:
+                    continue
+            fetched_any = True
+
+            # Process text from API response
+            actual_texts_list = api_data['text'].tolist()
+            if not actual_texts_list:
+                continue
+
+            # Post URIs let the analyser reuse predictions for posts it has already classified
+            post_ids = api_data['uri'].tolist() if 'uri' in api_data.columns else None
+            # Author and time of each post, kept with its scores in the analyser's results store
+            metadata_columns = [column for column in ('author', 'author_did', 'created_at')
+                                if column in api_data.columns]
+            post_metadata = api_data[metadata_columns].to_dict('records') if metadata_columns else None
+            add_to_windows = self.aggregator is not None and query is not None
+            outcome = self.sentiment_analyser.run_model(self.model_path, actual_texts_list, post_ids=post_ids,
+                                                        post_metadata=post_metadata,
+                                                        **({"return_sentiments": True} if add_to_windows else {}))
+            page_result, page_counts = outcome[:2]
+
+            if isinstance(page_result, str) and page_counts is None:
+                if hasattr(pages, "close"):
+                    pages.close()  # Stop fetching further pages
+                return page_result, empty_stats_string  # Error from sentiment analyser
+
+            if add_to_windows:
+                self._add_to_windows(query, api_data, outcome[2], actual_texts_list, post_ids)
+
+            if isinstance(page_result, list):
+                analysis_result.extend(page_result)
+            if page_counts:
+                sentiment_counts = sentiment_counts or {"Positive": 0, "Neutral": 0, "Negative": 0, "Total": 0}
+                for sentiment, count in page_counts.items():
+                    sentiment_counts[sentiment] = sentiment_counts.get(sentiment, 0) + count
+
+            if track_profile and time_column in api_data.columns:
+                uris = post_ids if post_ids is not None else [None] * len(api_data)
+                for feed_time, uri in zip(api_data[time_column].tolist(), uris):
+                    if newest_feed_time is None or _is_newer(feed_time, newest_feed_time):
+                        newest_feed_time, newest_uri = feed_time, uri
+
+        if track_profile and (fetched_any or since is not None):
+            running_counts = self.profile_store.record(actor, sentiment_counts or {}, newest_feed_time, newest_uri)
+            new_posts_line = f"New posts analysed: {(sentiment_counts or {}).get('Total', 0)}\n"
+            if not fetched_any:
+                return "No new posts since the last analysis.", new_posts_line + self._format_stats(running_counts)
+            if sentiment_counts is not None:
+                return (self._format_results(analysis_result),
+                        new_posts_line + self._format_stats(running_counts))
+
+        if not fetched_any:
+            return no_posts_message, empty_stats_string
+        if sentiment_counts is None:
             return "No text content found in fetched posts.", empty_stats_string
 
-        # Perform sentiment analysis
-        analysis_result, sentiment_counts = self.sentiment_analyser.run_model(self.model_path, actual_texts_list)
+        return self._format_results(analysis_result), self._format_stats(sentiment_counts)
+
+    def _add_to_windows(self, query: str, api_data, sentiments: list, texts: list, post_ids: list):
+        """
+        Adds a page of analysed posts to the aggregator's time windows for the query.
 
-        if isinstance(analysis_result, str) and sentiment_counts is None:
-            return analysis_result, empty_stats_string  # Error from sentiment analyser
+        The posts' labels are the ones run_model returned for the page, so nothing is classified twice.
+        """
+        if 'created_at' not in api_data.columns or not sentiments:
+            return
+        self.aggregator.add_posts(query, api_data['created_at'].tolist(), sentiments, texts, post_ids)
 
+    @staticmethod
+    def _format_results(analysis_result: list) -> str:
         # Prepare analysis output
-        main_output_string = ""
-        if isinstance(analysis_result, list):
-            if not analysis_result or (len(analysis_result) == 1 and analysis_result[0] == "No predictions were made."):
-                main_output_string = "Sentiment analysis completed, but no specific predictions were generated."
-            else:
-                main_output_string = "\n".join(analysis_result)
-        else:
-            main_output_string = "Error: Unexpected result type from sentiment analyser details."
+        if not analysis_result:
+            return "Sentiment analysis completed, but no specific predictions were generated."
+        return "\n".join(analysis_result)
 
+    @staticmethod
+    def _format_stats(sentiment_counts: dict) -> str:
         # Prepare sentiment statistics output
-        stats_output_string = ""
-        if sentiment_counts:
-            stats_output_string = (
+        if sentiment_counts and sentiment_counts.get('Total'):
+            return (
                 f"Total posts analysed: {sentiment_counts.get('Total', 0)}\n"
                 f"Positive: {sentiment_counts.get('Positive', 0)} "
                 f"({round(sentiment_counts.get('Positive', 0) / sentiment_counts.get('Total'), 2) * 100}%)\n"
@@ -93,7 +365,4 @@ class Controller:
                 f"Negative: {sentiment_counts.get('Negative', 0)} "
                 f"({round(sentiment_counts.get('Negative', 0) / sentiment_counts.get('Total'), 2) * 100}%)"
             )
-        else:
-            stats_output_string = empty_stats_string
-
-        return main_output_string, stats_output_string
\ No newline at end of file
+        return EMPTY_STATS_STRING
@@ -2,36 +2,62 @@ from GUI import GUI
 from controller import Controller
 from analyse import SentimentAnalyser
 from BSkyAPI import *
+from AsyncBSkyAPI import AsyncBlueskyAPI
+from rate_limiter import RateLimiter
+from response_cache import ResponseCache
+from profile_store import ProfileStore
+from results_store import ResultsStore
+from sentiment_windows import SentimentAggregator
 
 
 class SimpleBSkyAPIClient:
-    def __init__(self, search_func, handle_func, validate_handle_func):
+    def __init__(self, search_func, handle_func, validate_handle_func, iter_search_func=None, iter_handle_func=None):
         self.get_posts_from_search = search_func
         self.get_posts_from_handle = handle_func
-        self.handle_validation = validate_handle_func  
+        self.handle_validation = validate_handle_func
+        # Page by page fetching, so analysis can start before every post has been retrieved
+        if iter_search_func is not None:
+            self.iter_posts_from_search = iter_search_func
+        if iter_handle_func is not None:
+            self.iter_posts_from_handle = iter_handle_func
 
 
 if __name__ == '__main__':
     PATH_TO_MODEL_FILE = "sentiment_analyser_model.json"
 
     ### Instantiate Components
-    # 1. API Client
-    api_instance = BlueskyAPI()
+    # 1. API Client (both clients draw on one rate limit, as Bluesky counts requests per IP address,
+    # and share one response cache, kept on disk so it survives restarts)
+    rate_limiter = RateLimiter()
+    response_cache = ResponseCache(path="response_cache.sqlite3")
+    api_instance = BlueskyAPI(rate_limiter=rate_limiter, response_cache=response_cache)
 
     api_client = SimpleBSkyAPIClient(
         search_func=api_instance.get_posts_from_search,
         handle_func=api_instance.get_posts_from_handle,
-        validate_handle_func=api_instance.handle_validation
+        validate_handle_func=api_instance.handle_validation,
+        iter_search_func=api_instance.iter_posts_from_search,
+        iter_handle_func=api_instance.iter_posts_from_handle
     )
 
-    # 2. Sentiment Analyser
-    the_sentiment_analyser_instance = SentimentAnalyser()
+    # Asynchronous client, for analysing many handles/keywords concurrently
+    async_api_instance = AsyncBlueskyAPI(rate_limiter=rate_limiter, response_cache=response_cache)
+
+    # 2. Sentiment Analyser (every scored post is kept in an indexed results store, for historic reports)
+    the_sentiment_analyser_instance = SentimentAnalyser(results_store=ResultsStore("results_store.sqlite3"))
+    # Load the model now, or start training it in the background so the first request is not blocked
+    the_sentiment_analyser_instance.warm_up(PATH_TO_MODEL_FILE)
 
     # 3. Controller
     the_app_controller = Controller(
         api_client=api_client,
         sentiment_analyser=the_sentiment_analyser_instance,
-        model_path=PATH_TO_MODEL_FILE
+        model_path=PATH_TO_MODEL_FILE,
+        async_api_client=async_api_instance,
+        # Repeat analyses of a profile only fetch and score its new posts
+        profile_store=ProfileStore("profile_store.sqlite3"),
+        # Sentiment over time per query, for the trend plot
+        aggregator=SentimentAggregator()
     )
 
     # 4. GUI
@@ -0,0 +1,656 @@
+import math
+import os
+import tempfile
+import unittest
+import unittest.mock
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+
+from bin.data_utils import CorpusBuilder, build_vocab, text_to_binary_vectors, text_to_sparse_vectors
+from bin.feature_selection import chi2_scores, mutual_information_scores, select_features
+from bin.model_format import convert_model, is_binary_model
+from bin.naive_bayes import NaiveBayes
+from bin.ngram_store import NgramCorpusBuilder
+from bin.sentiment_analyser import _restrict_vectors, _select_features, predict, train, train_from_csv, update
+from bin.sparse_vectors import SparseVectors
+from bin.tokenizer import MENTION_TOKEN, URL_TOKEN, document_terms, ngram_terms, tokenize, tokenize_batch
+from bin.training_data import load_training_corpus, map_sentiment_labels
+from bin.vocabulary import HashingVocabulary, Vocabulary
+
+VOCAB = ["coding", "enjoy", "hate", "love", "pizza", "spam"]
+X_DENSE = [
+    [0, 0, 0, 1, 1, 0],  # love pizza
+    [1, 1, 0, 0, 0, 0],  # enjoy coding
+    [0, 0, 1, 0, 0, 1],  # hate spam
+    [0, 0, 1, 0, 1, 0],  # hate pizza
+    [1, 0, 0, 1, 0, 0],  # love coding
+]
+Y = np.array([1, 1, 0, 0, 1])
+
+
+def reference_likelihoods(X, y, num_features, smoothing):
+    """Likelihoods computed the straightforward way, one feature at a time."""
+    likelihoods = {}
+    for class_label in set(y.tolist()):
+        class_documents = [X[i] for i in range(len(y)) if y[i] == class_label]
+        likelihoods[class_label] = {
+            feature_position: (sum(1 for document in class_documents if document[feature_position] == 1) + smoothing) /
+                              (len(class_documents) + smoothing * 2)
+            for feature_position in range(num_features)
+        }
+    return likelihoods
+
+
+def reference_predict(model, X):
+    """Predictions computed the straightforward way, summing log probabilities over every feature."""
+    predictions = []
+    for document in X:
+        scores = {}
+        for class_label in sorted(model.classes):
+            score = math.log(model.priors[class_label])
+            for feature_position, feature_value in enumerate(document):
+                likelihood = model.likelihoods[class_label][feature_position]
+                probability = likelihood if feature_value == 1 else 1.0 - likelihood
+                score += math.log(probability) if probability > 0 else -float('inf')
+            scores[class_label] = score
+        predictions.append(max(scores, key=scores.get))
+    return predictions
+
+
+class TestNaiveBayesFit(unittest.TestCase):
+    def test_fit_matches_reference_likelihoods(self):
+        """Test that count-based fitting reproduces the per-feature likelihoods exactly."""
+        model = NaiveBayes()
+        model.fit(X_DENSE, Y, VOCAB)
+
+        self.assertEqual(model.likelihoods, reference_likelihoods(X_DENSE, Y, len(VOCAB), model.smoothing))
+        self.assertEqual(model.priors, {0: 0.4, 1: 0.6})
+        self.assertEqual(model.classes, {0, 1})
+
+    def test_fit_sparse_matches_dense_fit(self):
+        """Test that sparse index lists and dense binary vectors train the same model."""
+        X_sparse = [[i for i, value in enumerate(document) if value] for document in X_DENSE]
+
+        dense_model = NaiveBayes()
+        dense_model.fit(X_DENSE, Y, VOCAB)
+        sparse_model = NaiveBayes()
+        sparse_model.fit_sparse(X_sparse, Y, VOCAB)
+
+        self.assertEqual(dense_model.likelihoods, sparse_model.likelihoods)
+        self.assertEqual(dense_model.priors, sparse_model.priors)
+
+    def test_fit_sparse_rejects_out_of_range_index(self):
+        """Test that feature indices outside the vocabulary are rejected."""
+        model = NaiveBayes()
+        with self.assertRaises(ValueError):
+            model.fit_sparse([[0], [len(VOCAB)]], [0, 1], VOCAB)
+
+
+class TestNaiveBayesPredict(unittest.TestCase):
+    X_TEST = [
+        [0, 0, 0, 1, 0, 0],  # love
+        [0, 0, 1, 0, 1, 0],  # hate pizza
+        [0, 0, 0, 0, 0, 0],  # nothing known
+        [1, 1, 1, 1, 1, 1],  # everything
+    ]
+
+    def test_predict_matches_reference(self):
+        """Test that the log-space tables give the same predictions as a full per-feature sum."""
+        model = NaiveBayes()
+        model.fit(X_DENSE, Y, VOCAB)
+        self.assertEqual(model.predict(self.X_TEST), reference_predict(model, self.X_TEST))
+
+    def test_predict_sparse_matches_dense(self):
+        """Test that sparse documents are scored like their dense equivalents."""
+        model = NaiveBayes()
+        model.fit(X_DENSE, Y, VOCAB)
+        X_sparse = [[i for i, value in enumerate(document) if value] for document in self.X_TEST]
+        self.assertEqual(model.predict_sparse(X_sparse), model.predict(self.X_TEST))
+
+    def test_predict_without_smoothing(self):
+        """Test that zero and one probabilities (no smoothing) still score like the reference."""
+        model = NaiveBayes(smoothing=0)
+        model.fit(X_DENSE, Y, VOCAB)
+        self.assertEqual(model.predict(self.X_TEST), reference_predict(model, self.X_TEST))
+
+    def test_predict_proba_agrees_with_predict(self):
+        """Test that probabilities sum to one per document and peak at the predicted class."""
+        model = NaiveBayes()
+        model.fit(X_DENSE, Y, VOCAB)
+        X_sparse = [[i for i, value in enumerate(document) if value] for document in self.X_TEST]
+        class_order, probabilities = model.predict_proba(X_sparse)
+
+        np.testing.assert_allclose(probabilities.sum(axis=1), 1.0)
+        self.assertEqual([class_order[column] for column in probabilities.argmax(axis=1)],
+                         model.predict_sparse(X_sparse))
+
+    def test_predict_untrained_model_raises(self):
+        """Test that predicting before fitting or loading is rejected."""
+        with self.assertRaises(ValueError):
+            NaiveBayes().predict(self.X_TEST)
+
+
+class TestVariants(unittest.TestCase):
+    X_TEST = TestNaiveBayesPredict.X_TEST
+
+    def reference_scores(self, model):
+        """Per-class scores summed over the present tokens only, straight from the counts."""
+        counts = np.array([[sum(x[feature] for x, y in zip(X_DENSE, Y) if y == label) for feature in range(len(VOCAB))]
+                           for label in (0, 1)], dtype=float)
+        if model.variant == "complement":
+            counts = counts[::-1]  # With two classes, each class's complement is the other class
+        token_probabilities = (counts + model.smoothing) / (counts.sum(axis=1, keepdims=True)
+                                                            + model.smoothing * len(VOCAB))
+        scores = np.array(self.X_TEST) @ np.log(token_probabilities).T
+        if model.variant == "complement":
+            return -scores
+        return scores + np.log([model.priors[0], model.priors[1]])
+
+    def test_variants_match_reference(self):
+        for variant in ("multinomial", "complement"):
+            model = NaiveBayes(variant=variant)
+            model.fit(X_DENSE, Y, VOCAB)
+            X_sparse = [np.flatnonzero(document) for document in self.X_TEST]
+            expected = self.reference_scores(model)
+
+            self.assertEqual(model.predict(self.X_TEST), expected.argmax(axis=1).tolist())
+            _, probabilities = model.predict_proba(X_sparse)
+            expected_probabilities = np.exp(expected - expected.max(axis=1, keepdims=True))
+            np.testing.assert_allclose(probabilities, expected_probabilities / expected_probabilities.sum(axis=1,
+                                                                                                          keepdims=True))
+
+    def test_variants_share_counts(self):
+        """Test that every variant stores the same counts, so only the scoring differs."""
+        bernoulli, _ = train(NaiveBayes(), TestShardedTraining.TEXTS, TestShardedTraining.LABELS)
+        for variant in ("multinomial", "complement"):
+            model, _ = train(NaiveBayes(variant=variant), TestShardedTraining.TEXTS, TestShardedTraining.LABELS)
+            np.testing.assert_array_equal(model._feature_counts, bernoulli._feature_counts)
+            with self.assertRaises(ValueError):
+                model.merge(bernoulli)
+
+    def test_variant_saved_with_model(self):
+        model = NaiveBayes(variant="complement")
+        model.fit(X_DENSE, Y, VOCAB)
+        with tempfile.TemporaryDirectory() as directory:
+            for name in ("model.json", "model.nbm"):
+                path = os.path.join(directory, name)
+                self.assertTrue(model.save(path))
+                loaded = NaiveBayes.load(path)
+                self.assertEqual(loaded.variant, "complement")
+                np.testing.assert_allclose(loaded.predict_proba([[3], [2, 4]])[1], model.predict_proba([[3], [2, 4]])[1])
+
+    def test_unknown_variant_rejected(self):
+        with self.assertRaises(ValueError):
+            NaiveBayes(variant="gaussian")
+        with self.assertRaises(ValueError):
+            model = NaiveBayes(smoothing=0, variant="complement")
+            model.fit(X_DENSE, Y, VOCAB)
+            model.predict(self.X_TEST)
+
+
+class TestPartialFit(unittest.TestCase):
+    def test_batches_match_single_fit(self):
+        """Test that fitting in batches gives exactly the model fitted on all documents at once."""
+        full = NaiveBayes()
+        full.fit(X_DENSE, Y, VOCAB)
+
+        incremental = NaiveBayes()
+        incremental.partial_fit(X_DENSE[:2], Y[:2], VOCAB)
+        incremental.partial_fit(X_DENSE[2:], Y[2:])
+
+        self.assertEqual(incremental.likelihoods, full.likelihoods)
+        self.assertEqual(incremental.priors, full.priors)
+        self.assertEqual(incremental.predict(X_DENSE), full.predict(X_DENSE))
+
+    def test_new_class_and_growing_vocabulary(self):
+        """Test that batches may add classes and append vocabulary terms."""
+        model = NaiveBayes()
+        model.fit(X_DENSE, Y, VOCAB)
+
+        grown_vocab = Vocabulary(VOCAB).extended(["meh", "love"])
+        self.assertEqual(list(grown_vocab), VOCAB + ["meh"])
+        model.partial_fit([[0, 0, 0, 0, 0, 0, 1]], [2], grown_vocab)
+
+        self.assertEqual(model.classes, {0, 1, 2})
+        self.assertEqual(model.priors[2], 1 / 6)
+        self.assertEqual(model.likelihoods[2][6], (1 + 1) / (1 + 2))
+        self.assertEqual(model.likelihoods[0][6], (0 + 1) / (2 + 2))
+        self.assertEqual(model.predict([[0, 0, 0, 0, 0, 0, 1]]), [2])
+
+    def test_vocabulary_must_extend_current_one(self):
+        """Test that a vocabulary which reorders existing terms is rejected."""
+        model = NaiveBayes()
+        model.fit(X_DENSE, Y, VOCAB)
+        with self.assertRaises(ValueError):
+            model.partial_fit(X_DENSE, Y, list(reversed(VOCAB)))
+
+    def test_counts_survive_save_and_load(self):
+        """Test that saved models (JSON and binary) can keep learning after loading."""
+        with tempfile.TemporaryDirectory() as directory:
+            for name in ("model.json", "model.nbm"):
+                model = NaiveBayes()
+                model.partial_fit(X_DENSE[:3], Y[:3], VOCAB)
+                model.save(os.path.join(directory, name))
+
+                loaded = NaiveBayes.load(os.path.join(directory, name))
+                loaded.partial_fit(X_DENSE[3:], Y[3:])
+                model.partial_fit(X_DENSE[3:], Y[3:])
+                self.assertEqual(loaded.likelihoods, model.likelihoods)
+
+    def test_update_with_new_texts(self):
+        """Test that sentiment_analyser.update folds new texts and words into a trained model."""
+        model = NaiveBayes()
+        model.fit(X_DENSE, Y, VOCAB)
+
+        model, vocab = update(model, ["terrible pizza", "terrible spam"], [0, 0])
+
+        self.assertIs(vocab, model.vocabulary)
+        self.assertEqual(list(vocab)[:len(VOCAB)], VOCAB)
+        self.assertIn("terrible", vocab)
+        self.assertEqual(model.priors[0], 4 / 7)
+
+
+class TestShardedTraining(unittest.TestCase):
+    TEXTS = ["I love pizza", "I enjoy coding", "I hate spam notifications", "I dislike noisy alerts",
+             "I hate rainy days", "I love machine learning", "I hate sitting in traffic", "pizza is fine"]
+    LABELS = np.array([2, 2, 0, 0, 0, 2, 0, 1])
+
+    def test_merge_is_order_independent(self):
+        """Test that merging shard models in any grouping gives the model trained on everything."""
+        full, _ = train(NaiveBayes(), self.TEXTS, self.LABELS)
+
+        shards = []
+        for start, end in ((0, 3), (3, 5), (5, 8)):
+            shard, _ = train(NaiveBayes(), self.TEXTS[start:end], self.LABELS[start:end])
+            shards.append(shard)
+
+        left = reduce(NaiveBayes.merge, shards, NaiveBayes())
+        right = NaiveBayes().merge(shards[2]).merge(NaiveBayes().merge(shards[0]).merge(shards[1]))
+
+        for merged in (left, right):
+            self.assertEqual(merged.vocabulary, full.vocabulary)
+            self.assertEqual(merged.likelihoods, full.likelihoods)
+            self.assertEqual(merged.priors, full.priors)
+
+    def test_parallel_training_matches_single_process(self):
+        """Test that multi-process training reproduces single-process training exactly."""
+        single, single_vocab = train(NaiveBayes(), self.TEXTS, self.LABELS)
+        parallel, parallel_vocab = train(NaiveBayes(), self.TEXTS, self.LABELS, n_jobs=2)
+
+        self.assertEqual(parallel_vocab, single_vocab)
+        self.assertEqual(parallel.likelihoods, single.likelihoods)
+        self.assertEqual(parallel.priors, single.priors)
+
+
+class TestTokenizer(unittest.TestCase):
+    POSTS = [
+        "Loving the new #BlueSky app!!! @alice.bsky.social check https://example.com/a?b=1 :)",
+        "I don`t like Mondays... www.example.org",
+        "Meh.",
+        float("nan"),
+    ]
+
+    def test_post_tokens(self):
+        """Test that URLs and mentions become placeholders while hashtags and emoticons are kept."""
+        self.assertEqual(tokenize(self.POSTS[0]),
+                         ["loving", "the", "new", "#bluesky", "app", MENTION_TOKEN, "check", URL_TOKEN, ":)"])
+        self.assertEqual(tokenize(self.POSTS[1]), ["i", "don't", "like", "mondays", URL_TOKEN])
+
+    def test_document_terms_drop_stop_words(self):
+        self.assertEqual(document_terms(self.POSTS[1]), {"like", "mondays", URL_TOKEN})
+
+    def test_batch_matches_single_texts(self):
+        self.assertEqual(tokenize_batch(self.POSTS), [document_terms(post) for post in self.POSTS])
+
+    def test_corpus_builder_matches_build_vocab_and_vectorizer(self):
+        """Test that the single-pass corpus builder gives the vocabulary and vectors of the two-pass path."""
+        corpus = CorpusBuilder()
+        corpus.add_texts(self.POSTS[:2])
+        corpus.add_texts(self.POSTS[2:])
+        X, vocab = corpus.build()
+
+        self.assertEqual(vocab, build_vocab(self.POSTS))
+        self.assertEqual([sorted(row.tolist()) for row in X],
+                         [row.tolist() for row in text_to_sparse_vectors(self.POSTS, vocab)])
+
+
+class TestSparseVectors(unittest.TestCase):
+    def test_sparse_vectorizer_matches_dense_vectorizer(self):
+        """Test that sparse vectors hold exactly the ones of the dense binary vectors."""
+        texts = ["I love pizza", "hate hate SPAM", "", "nothing known here"]
+        sparse = text_to_sparse_vectors(texts, VOCAB)
+
+        self.assertIsInstance(sparse, SparseVectors)
+        self.assertEqual(len(sparse), len(texts))
+        self.assertEqual(sparse.to_dense(), text_to_binary_vectors(texts, VOCAB))
+        self.assertEqual(sparse[1].tolist(), [2, 5])
+
+    def test_fit_and_predict_accept_sparse_vectors(self):
+        """Test that NaiveBayes trains and predicts directly from SparseVectors."""
+        X_sparse = SparseVectors.from_dense(X_DENSE)
+        dense_model = NaiveBayes()
+        dense_model.fit(X_DENSE, Y, VOCAB)
+        sparse_model = NaiveBayes()
+        sparse_model.fit(X_sparse, Y, VOCAB)
+
+        self.assertEqual(dense_model.likelihoods, sparse_model.likelihoods)
+        self.assertEqual(sparse_model.predict(X_sparse), dense_model.predict(X_DENSE))
+
+
+class TestVocabulary(unittest.TestCase):
+    def test_lookup_and_order(self):
+        """Test that terms keep their order and map to their index."""
+        vocab = Vocabulary(VOCAB)
+        self.assertEqual(list(vocab), VOCAB)
+        self.assertEqual(vocab.get("love"), 3)
+        self.assertIsNone(vocab.get("missing"))
+        self.assertEqual(vocab.indices(["spam", "love", "missing", "love"]), [3, 5])
+
+    def test_equality_uses_fingerprint(self):
+        """Test that vocabularies compare equal by content and detect mismatches."""
+        self.assertEqual(Vocabulary(VOCAB), Vocabulary(list(VOCAB)))
+        self.assertEqual(Vocabulary(VOCAB), VOCAB)
+        self.assertNotEqual(Vocabulary(VOCAB), Vocabulary(VOCAB[:-1] + ["zebra"]))
+        self.assertNotEqual(Vocabulary(["ab", "c"]), Vocabulary(["a", "bc"]))
+
+    def test_duplicate_terms_rejected(self):
+        """Test that a vocabulary cannot map one term to two indices."""
+        with self.assertRaises(ValueError):
+            Vocabulary(["love", "love"])
+
+
+class TestFeatureHashing(unittest.TestCase):
+    TEXTS = TestShardedTraining.TEXTS
+    LABELS = TestShardedTraining.LABELS
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_buckets_stable_and_bounded(self):
+        vocab = HashingVocabulary(16)
+        indices = vocab.indices(["pizza", "spam", "pizza", "a" * 100])
+        self.assertEqual(indices, sorted(set(indices)))
+        self.assertTrue(all(0 <= index < 16 for index in indices))
+        self.assertEqual(HashingVocabulary(16).bucket("pizza"), vocab.bucket("pizza"))
+        self.assertEqual(vocab, HashingVocabulary(16))
+        self.assertNotEqual(vocab, HashingVocabulary(32))
+
+    def test_model_size_fixed_by_buckets(self):
+        """Test that a hashed model has one feature per bucket, however many terms it saw."""
+        model, vocab = train(NaiveBayes(), self.TEXTS, self.LABELS, hashing_features=64)
+        self.assertEqual(len(vocab), 64)
+
+        model, vocab = update(model, ["brand new words everywhere"], [1])
+        self.assertEqual(len(model.vocabulary), 64)
+        self.assertEqual(predict(model, ["I love pizza"], None), [2])
+
+    def test_remapped_corpus_matches_direct_hashing(self):
+        """Test that training from the (term vocabulary) corpus cache gives the model trained on hashed texts."""
+        csv_path = os.path.join(self.directory.name, "training.csv")
+        sentiments = {0: "negative", 1: "neutral", 2: "positive"}
+        pd.DataFrame({"text": self.TEXTS, "sentiment": [sentiments[label] for label in self.LABELS]}).to_csv(
+            csv_path, index=False)
+
+        from_csv, _ = train_from_csv(NaiveBayes(), csv_path, hashing_features=8, cache_dir=None)
+        from_texts, _ = train(NaiveBayes(), self.TEXTS, self.LABELS, hashing_features=8)
+        np.testing.assert_array_equal(from_csv._feature_counts, from_texts._feature_counts)
+
+    def test_parallel_training_with_hashing(self):
+        single, _ = train(NaiveBayes(), self.TEXTS, self.LABELS, hashing_features=32)
+        parallel, parallel_vocab = train(NaiveBayes(), self.TEXTS, self.LABELS, n_jobs=2, hashing_features=32)
+        self.assertEqual(parallel_vocab, HashingVocabulary(32))
+        np.testing.assert_array_equal(parallel._feature_counts, single._feature_counts)
+
+    def test_saved_without_terms(self):
+        model, _ = train(NaiveBayes(), self.TEXTS, self.LABELS, hashing_features=32)
+        for name in ("model.json", "model.nbm"):
+            path = os.path.join(self.directory.name, name)
+            self.assertTrue(model.save(path))
+            loaded = NaiveBayes.load(path)
+            self.assertEqual(loaded.vocabulary, HashingVocabulary(32))
+            self.assertEqual(predict(loaded, self.TEXTS, None), predict(model, self.TEXTS, None))
+
+    def test_cannot_merge_hashed_and_term_models(self):
+        hashed, _ = train(NaiveBayes(), self.TEXTS, self.LABELS, hashing_features=32)
+        plain, _ = train(NaiveBayes(), self.TEXTS, self.LABELS)
+        with self.assertRaises(ValueError):
+            hashed.merge(plain)
+
+
+class TestFeatureSelection(unittest.TestCase):
+    TEXTS = TestShardedTraining.TEXTS
+    LABELS = TestShardedTraining.LABELS
+
+    # Two classes of 4 documents; feature 0 is in every document, 1 only in class 1, 2 in one document of each
+    CLASS_COUNTS = np.array([4, 4])
+    FEATURE_COUNTS = np.array([[4, 0, 1], [4, 3, 1]])
+
+    def test_document_frequency_filters(self):
+        self.assertEqual(select_features(self.CLASS_COUNTS, self.FEATURE_COUNTS).tolist(), [0, 1, 2])
+        self.assertEqual(select_features(self.CLASS_COUNTS, self.FEATURE_COUNTS, min_df=3).tolist(), [0, 1])
+        self.assertEqual(select_features(self.CLASS_COUNTS, self.FEATURE_COUNTS, max_df=0.9).tolist(), [1, 2])
+        self.assertEqual(select_features(self.CLASS_COUNTS, self.FEATURE_COUNTS, max_features=2).tolist(), [0, 1])
+
+    def test_scores_rank_the_class_dependent_feature_first(self):
+        for scorer in (chi2_scores, mutual_information_scores):
+            scores = scorer(self.CLASS_COUNTS, self.FEATURE_COUNTS)
+            self.assertEqual(int(np.argmax(scores)), 1)
+            self.assertAlmostEqual(scores[0], 0.0)
+            self.assertAlmostEqual(scores[2], 0.0)
+        for score in ("chi2", "mutual_info"):
+            self.assertEqual(select_features(self.CLASS_COUNTS, self.FEATURE_COUNTS, k=1, score=score).tolist(), [1])
+
+        with self.assertRaises(ValueError):
+            select_features(self.CLASS_COUNTS, self.FEATURE_COUNTS, score="gini")
+
+    def test_selected_model_matches_fitting_on_reduced_vocabulary(self):
+        """Test that selecting features after counting gives the model fitted on the kept terms only."""
+        selected, vocab = train(NaiveBayes(), self.TEXTS, self.LABELS, feature_selection={"min_df": 2})
+        self.assertEqual(list(vocab.terms), ["hate", "love", "pizza"])
+
+        reduced = NaiveBayes()
+        reduced.fit(text_to_sparse_vectors(self.TEXTS, vocab), self.LABELS, vocab)
+        np.testing.assert_array_equal(selected._feature_counts, reduced._feature_counts)
+        self.assertEqual(predict(selected, self.TEXTS, None), predict(reduced, self.TEXTS, None))
+
+    def test_selection_reports_model_size_and_latency(self):
+        """Test that selection measures the saved model and times predictions before and after."""
+        model = NaiveBayes()
+        vocab = build_vocab(self.TEXTS)
+        X = text_to_sparse_vectors(self.TEXTS, vocab)
+        model.fit(X, self.LABELS, vocab)
+
+        report = _select_features(model, X, min_df=2)
+
+        self.assertEqual(report["features"], (len(vocab), 3))
+        self.assertLess(report["model_bytes"][1], report["model_bytes"][0])
+        self.assertTrue(all(seconds >= 0 for seconds in report["latency_seconds"]))
+        # The timed sample was re-indexed against the kept features
+        kept_vectors = _restrict_vectors(X, [vocab.terms.index(term) for term in model.vocabulary.terms])
+        expected = text_to_sparse_vectors(self.TEXTS, model.vocabulary)
+        np.testing.assert_array_equal(kept_vectors.indptr, expected.indptr)
+        np.testing.assert_array_equal(kept_vectors.indices, expected.indices)
+        self.assertIsNone(_select_features(model, X))
+
+    def test_parallel_training_selects_from_merged_counts(self):
+        single, single_vocab = train(NaiveBayes(), self.TEXTS, self.LABELS, feature_selection={"k": 3})
+        parallel, parallel_vocab = train(NaiveBayes(), self.TEXTS, self.LABELS, n_jobs=2,
+                                         feature_selection={"k": 3})
+        self.assertEqual(parallel_vocab, single_vocab)
+        np.testing.assert_array_equal(parallel._feature_counts, single._feature_counts)
+
+    def test_hashed_model_cannot_drop_buckets(self):
+        model, _ = train(NaiveBayes(), self.TEXTS, self.LABELS, hashing_features=32)
+        with self.assertRaises(ValueError):
+            model.restrict_features([0, 1])
+
+
+class TestNgrams(unittest.TestCase):
+    TEXTS = TestShardedTraining.TEXTS + ["the food was not good", "really not good at all", "it is good",
+                                         "good good food"]
+    LABELS = np.concatenate([TestShardedTraining.LABELS, [0, 0, 2, 2]])
+
+    def test_ngram_terms_keep_negations(self):
+        terms = ngram_terms(tokenize("It is not good at all"), (1, 2))
+        self.assertIn("not good", terms)
+        self.assertIn("good", terms)
+        self.assertNotIn("not", terms)
+        self.assertNotIn("it is", terms)  # Only stop words
+        self.assertEqual(document_terms("not good", ngram_range=(2, 3)), {"not good"})
+
+    def test_store_matches_string_vocabulary(self):
+        """Test that the interned count store builds the vocabulary and vectors of the n-gram strings."""
+        for ngram_range in ((1, 2), (1, 3), (2, 2)):
+            builder = NgramCorpusBuilder(ngram_range, max_terms=10000, min_count=1)
+            builder.add_texts(self.TEXTS[:5])
+            builder.add_texts(self.TEXTS[5:])
+            X, vocab = builder.build()
+
+            expected_vocab = build_vocab(self.TEXTS, ngram_range=ngram_range)
+            self.assertEqual(vocab, expected_vocab)
+            for row, expected_row in zip(X, text_to_sparse_vectors(self.TEXTS, expected_vocab)):
+                self.assertEqual(sorted(row.tolist()), sorted(expected_row.tolist()))
+
+    def test_store_stays_within_budget(self):
+        builder = NgramCorpusBuilder((1, 2), max_terms=4, min_count=1)
+        builder.add_texts(self.TEXTS)
+        builder.add_texts(["I love pizza"] * 5)
+        X, vocab = builder.build()
+        self.assertLessEqual(len(vocab), 4)
+        self.assertIn("love pizza", vocab)
+        self.assertGreater(builder.pruned_below, 0)
+        self.assertEqual(len(X), len(self.TEXTS) + 5)
+
+        # Multi-word n-grams seen in a single post are dropped, single words are kept
+        _, vocab = train(NaiveBayes(), self.TEXTS, self.LABELS, ngram_range=(1, 2))
+        self.assertIn("not good", vocab)
+        self.assertIn("spam", vocab)
+        self.assertNotIn("hate spam", vocab)
+
+    def test_model_keeps_ngram_range(self):
+        model, vocab = train(NaiveBayes(), self.TEXTS, self.LABELS, ngram_range=(1, 2))
+        self.assertEqual(vocab.ngram_range, (1, 2))
+        self.assertNotEqual(vocab, Vocabulary(vocab.terms))
+
+        with tempfile.TemporaryDirectory() as directory:
+            for name in ("model.json", "model.nbm"):
+                path = os.path.join(directory, name)
+                self.assertTrue(model.save(path))
+                loaded = NaiveBayes.load(path)
+                self.assertEqual(loaded.vocabulary, vocab)
+                self.assertEqual(predict(loaded, self.TEXTS, None), predict(model, self.TEXTS, None))
+
+        model, updated_vocab = update(model, ["not bad at all"], [2])
+        self.assertIn("not bad", updated_vocab)
+
+        unigrams, _ = train(NaiveBayes(), self.TEXTS, self.LABELS)
+        with self.assertRaises(ValueError):
+            unigrams.merge(model)
+
+    def test_parallel_training_with_ngrams(self):
+        single, single_vocab = train(NaiveBayes(), self.TEXTS, self.LABELS, ngram_range=(1, 2))
+        parallel, parallel_vocab = train(NaiveBayes(), self.TEXTS, self.LABELS, n_jobs=5, ngram_range=(1, 2))
+        # "not good" is seen once in each of two shards (posts 8 and 9), so only the merged counts keep it
+        self.assertIn("not good", parallel_vocab)
+        self.assertEqual(parallel_vocab, single_vocab)
+        np.testing.assert_array_equal(parallel._class_counts, single._class_counts)
+        np.testing.assert_array_equal(parallel._feature_counts, single._feature_counts)
+        self.assertEqual(predict(parallel, self.TEXTS, None), predict(single, self.TEXTS, None))
+
+
+class TestModelFormats(unittest.TestCase):
+    def setUp(self):
+        self.model = NaiveBayes()
+        self.model.fit(X_DENSE, Y, VOCAB)
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def test_binary_round_trip(self):
+        """Test that a binary model loads (memory-mapped) with identical parameters and predictions."""
+        self.assertTrue(self.model.save(self.path("model.nbm")))
+        self.assertTrue(is_binary_model(self.path("model.nbm")))
+
+        loaded = NaiveBayes.load(self.path("model.nbm"))
+        self.assertEqual(loaded.vocabulary, self.model.vocabulary)
+        self.assertEqual(loaded.priors, self.model.priors)
+        self.assertEqual(loaded.likelihoods, self.model.likelihoods)
+        self.assertEqual(loaded.predict(X_DENSE), self.model.predict(X_DENSE))
+
+    def test_binary_round_trip_without_smoothing(self):
+        """Test that zero probabilities survive the binary format."""
+        model = NaiveBayes(smoothing=0)
+        model.fit(X_DENSE, Y, VOCAB)
+        model.save_binary(self.path("model.nbm"))
+
+        loaded = NaiveBayes.load(self.path("model.nbm"), mmap=False)
+        X_test = TestNaiveBayesPredict.X_TEST
+        self.assertEqual(loaded.predict(X_test), reference_predict(model, X_test))
+
+    def test_convert_between_formats(self):
+        """Test that JSON -> binary -> JSON conversion preserves the model."""
+        self.model.save(self.path("model.json"))
+        self.assertTrue(convert_model(self.path("model.json"), self.path("model.nbm")))
+        self.assertTrue(convert_model(self.path("model.nbm"), self.path("copy.json")))
+
+        self.assertFalse(is_binary_model(self.path("copy.json")))
+        copy = NaiveBayes.load(self.path("copy.json"))
+        self.assertEqual(copy.likelihoods, self.model.likelihoods)
+        self.assertEqual(copy.priors, self.model.priors)
+
+
+class TestTrainingData(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.directory.name, "training.csv")
+        pd.DataFrame({
+            "text": ["I love pizza", "I hate spam", "pizza is okay", "LOVE coding!", "meh", "unknown label"],
+            "sentiment": ["positive", "Negative", "neutral", "Positive", 1, "sarcastic"],
+        }).to_csv(self.csv_path, index=False)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_map_sentiment_labels(self):
+        """Test that labels are mapped case-insensitively and unknown labels become NaN."""
+        labels = map_sentiment_labels(pd.Series(["Positive", " negative", "NEUTRAL", 2, "other"], dtype=object))
+        self.assertEqual(labels[:4].tolist(), [2, 0, 1, 2])
+        self.assertTrue(pd.isna(labels[4]))
+
+    def test_corpus_matches_build_vocab_and_vectorizer(self):
+        """Test that streaming in small chunks gives the same vocabulary and vectors as the in-memory path."""
+        X, labels, vocab = load_training_corpus(self.csv_path, chunksize=2, cache_dir=None)
+
+        texts = ["I love pizza", "I hate spam", "pizza is okay", "LOVE coding!", "meh"]
+        expected_vocab = build_vocab(texts)
+        self.assertEqual(vocab, expected_vocab)
+        self.assertEqual(labels.tolist(), [2, 0, 1, 2, 1])
+        self.assertEqual([sorted(row.tolist()) for row in X],
+                         [row.tolist() for row in text_to_sparse_vectors(texts, expected_vocab)])
+
+    def test_corpus_cache_reused(self):
+        """Test that a second load reads the cached corpus instead of the CSV."""
+        cache_dir = os.path.join(self.directory.name, "cache")
+        X, labels, vocab = load_training_corpus(self.csv_path, cache_dir=cache_dir)
+        self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+        with unittest.mock.patch("bin.training_data.iter_training_chunks") as iter_chunks:
+            cached_X, cached_labels, cached_vocab = load_training_corpus(self.csv_path, cache_dir=cache_dir)
+        iter_chunks.assert_not_called()
+
+        self.assertEqual(cached_vocab, vocab)
+        self.assertEqual(cached_labels.tolist(), labels.tolist())
+        self.assertEqual(cached_X.indices.tolist(), X.indices.tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
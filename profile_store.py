@@ -0,0 +1,110 @@
+import sqlite3
+import threading
+import time
+
+from BSkyAPI import _is_newer
+
+SENTIMENTS = ("Positive", "Neutral", "Negative")
+
+
+class ProfileStore:
+    """
+    Persistent per-profile watermarks and running sentiment totals, in an SQLite database.
+
+    The watermark is the feed time (and URI) of the newest post analysed for a profile, so a repeat
+    analysis only fetches and scores posts newer than it and adds their counts to the stored totals.
+    The feed time is a post's createdAt, or for a repost the time it was reposted (see
+    BSkyAPI._feed_time); it is stored in the last_created_at column.
+    """
+
+    def __init__(self, path=":memory:"):
+        """
+        Parameters:
+        path (str): SQLite database file. Defaults to an in-memory database (nothing persisted).
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS profiles ("
+                "actor TEXT PRIMARY KEY, last_created_at TEXT, last_uri TEXT, "
+                "positive INTEGER NOT NULL, neutral INTEGER NOT NULL, negative INTEGER NOT NULL, "
+                "total INTEGER NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    @staticmethod
+    def _normalise(actor):
+        return actor.strip().lower()
+
+    def get(self, actor):
+        """
+        Return the stored state of a profile.
+
+        Parameters:
+        actor (str): The profile's handle.
+
+        Returns:
+        dict: last_created_at, last_uri and the running counts (Positive, Neutral, Negative, Total),
+            or None if the profile was never analysed.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT last_created_at, last_uri, positive, neutral, negative, total FROM profiles WHERE actor = ?",
+                (self._normalise(actor),)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"last_created_at": row[0], "last_uri": row[1],
+                "counts": {"Positive": row[2], "Neutral": row[3], "Negative": row[4], "Total": row[5]}}
+
+    def record(self, actor, sentiment_counts, newest_created_at=None, newest_uri=None):
+        """
+        Add the counts of newly analysed posts to a profile's totals and move its watermark forward.
+
+        Parameters:
+        actor (str): The profile's handle.
+        sentiment_counts (dict): Counts of the new posts (Positive, Neutral, Negative, Total).
+        newest_created_at (str): Feed time of the newest new post. The watermark never moves backwards.
+        newest_uri (str): URI of that post.
+
+        Returns:
+        dict: The profile's updated running counts.
+        """
+        actor = self._normalise(actor)
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT last_created_at, last_uri, positive, neutral, negative, total FROM profiles WHERE actor = ?",
+                (actor,)
+            ).fetchone()
+            last_created_at, last_uri, *totals = row if row is not None else (None, None, 0, 0, 0, 0)
+
+            totals = [total + sentiment_counts.get(name, 0)
+                      for total, name in zip(totals, SENTIMENTS + ("Total",))]
+            if newest_created_at is not None and (last_created_at is None
+                                                  or _is_newer(newest_created_at, last_created_at)):
+                last_created_at, last_uri = newest_created_at, newest_uri
+
+            self._connection.execute(
+                "INSERT OR REPLACE INTO profiles (actor, last_created_at, last_uri, positive, neutral, negative, "
+                "total, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (actor, last_created_at, last_uri, *totals, time.time())
+            )
+        return dict(zip(SENTIMENTS + ("Total",), totals))
+
+    def reset(self, actor):
+        """
+        Forget a profile, so its next analysis starts from its latest posts again.
+
+        Parameters:
+        actor (str): The profile's handle.
+
+        Returns:
+        None
+        """
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM profiles WHERE actor = ?", (self._normalise(actor),))
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,144 @@
+import unittest
+
+import pandas as pd
+
+from BSkyAPI import BlueskyAPI
+from controller import Controller
+from profile_store import ProfileStore
+
+
+def feed_post(created_at, text, reposted_at=None):
+    return {"created_at": created_at, "feed_time": reposted_at or created_at, "text": text, "uri": f"at://post/{text}"}
+
+
+def feed_item(created_at, text, reposted_at=None):
+    """A getAuthorFeed item; reposts carry the time of the repost in their reason."""
+    item = {"post": {"uri": f"at://post/{text}", "record": {"createdAt": created_at, "text": text}}}
+    if reposted_at is not None:
+        item["reason"] = {"$type": "app.bsky.feed.defs#reasonRepost", "indexedAt": reposted_at}
+    return item
+
+
+class FakeFeedClient:
+    """Serves a profile's feed (newest first) in pages of two and records the since argument of every fetch."""
+
+    def __init__(self, posts):
+        self.posts = posts
+        self.since_arguments = []
+
+    def handle_validation(self, actor):
+        return True
+
+    def iter_posts_from_handle(self, actor, max_posts=100, since=None):
+        self.since_arguments.append(since)
+
+        def fetch_page(cursor, limit):
+            start = cursor or 0
+            page = self.posts[start:start + limit]
+            next_cursor = start + limit if start + limit < len(self.posts) else None
+            return BlueskyAPI._posts_since(page, next_cursor, since)
+
+        yield from BlueskyAPI._paginate(fetch_page, max_posts, page_size=2)
+
+
+class FakeSentimentAnalyser:
+    def __init__(self):
+        self.scored = []
+
+    def run_model(self, model_path, texts, post_ids=None, post_metadata=None):
+        self.scored.extend(texts)
+        negative = sum("bad" in text for text in texts)
+        return [f"Text: '{text}'" for text in texts], {"Positive": len(texts) - negative, "Neutral": 0,
+                                                        "Negative": negative, "Total": len(texts)}
+
+
+class TestProfileStore(unittest.TestCase):
+    def test_counts_accumulate_and_watermark_only_moves_forward(self):
+        store = ProfileStore()
+        store.record("Alice.bsky.social", {"Positive": 2, "Total": 2}, "2025-05-08T10:00:00Z", "at://1")
+        totals = store.record("alice.bsky.social ", {"Negative": 1, "Total": 1}, "2025-05-08T09:00:00Z", "at://0")
+
+        self.assertEqual(totals, {"Positive": 2, "Neutral": 0, "Negative": 1, "Total": 3})
+        state = store.get("alice.bsky.social")
+        self.assertEqual((state["last_created_at"], state["last_uri"]), ("2025-05-08T10:00:00Z", "at://1"))
+
+        store.reset("alice.bsky.social")
+        self.assertIsNone(store.get("alice.bsky.social"))
+
+    def test_posts_since_stops_at_watermark(self):
+        """Posts up to the watermark are dropped, and paging stops once a page reaches it."""
+        posts = [feed_post("2025-05-08T12:00:00.000Z", "new"), feed_post("2025-05-08T10:00:00Z", "old")]
+
+        newer, cursor = BlueskyAPI._posts_since(posts, "next", "2025-05-08T10:00:00+00:00")
+        self.assertEqual([post["text"] for post in newer], ["new"])
+        self.assertIsNone(cursor)
+        self.assertEqual(BlueskyAPI._posts_since(posts, "next", "2025-05-08T09:00:00Z")[1], "next")
+
+    def test_repost_of_old_post_ends_page_without_stopping(self):
+        """A repost is placed by when it was reposted, so an old post reposted at the end of a page is new."""
+        page = BlueskyAPI._parse_feed_posts({"feed": [
+            feed_item("2025-05-08T12:00:00Z", "new"),
+            feed_item("2020-01-01T00:00:00Z", "old reposted", reposted_at="2025-05-08T11:30:00Z")]})
+
+        newer, cursor = BlueskyAPI._posts_since(page, "next", "2025-05-08T10:00:00Z")
+        self.assertEqual([post["text"] for post in newer], ["new", "old reposted"])
+        self.assertEqual(cursor, "next")
+        self.assertEqual(newer[1]["created_at"], "2020-01-01T00:00:00Z")
+
+
+class TestIncrementalProfileAnalysis(unittest.TestCase):
+    def test_repeat_analysis_scores_only_new_posts(self):
+        client = FakeFeedClient([feed_post("2025-05-08T10:00:00Z", "good"), feed_post("2025-05-08T09:00:00Z", "bad")])
+        analyser = FakeSentimentAnalyser()
+        controller = Controller(client, analyser, "model.json", profile_store=ProfileStore())
+
+        _, first_stats = controller.process_analysis_request("Profile", "alice.bsky.social", "Top")
+        self.assertIn("Total posts analysed: 2", first_stats)
+
+        message, stats = controller.process_analysis_request("Profile", "alice.bsky.social", "Top")
+        self.assertEqual(message, "No new posts since the last analysis.")
+        self.assertIn("Total posts analysed: 2", stats)
+
+        client.posts.insert(0, feed_post("2025-05-08T11:00:00Z", "also good"))
+        message, stats = controller.process_analysis_request("Profile", "alice.bsky.social", "Top")
+
+        self.assertEqual(message, "Text: 'also good'")
+        self.assertIn("New posts analysed: 1", stats)
+        self.assertIn("Total posts analysed: 3", stats)
+        self.assertEqual(analyser.scored, ["good", "bad", "also good"])
+        self.assertEqual(client.since_arguments, [None, "2025-05-08T10:00:00Z", "2025-05-08T10:00:00Z"])
+
+    def test_repeat_analysis_pages_back_to_watermark_beyond_max_posts(self):
+        """More new posts than max_posts are all scored, so none fall behind the moved watermark."""
+        client = FakeFeedClient([feed_post("2025-05-08T10:00:00Z", "good"), feed_post("2025-05-08T09:00:00Z", "bad")])
+        analyser = FakeSentimentAnalyser()
+        controller = Controller(client, analyser, "model.json", max_posts=2, profile_store=ProfileStore())
+        controller.process_analysis_request("Profile", "alice.bsky.social", "Top")
+
+        client.posts[:0] = [feed_post(f"2025-05-08T1{hour}:00:00Z", f"new {hour}") for hour in (3, 2, 1)]
+        _, stats = controller.process_analysis_request("Profile", "alice.bsky.social", "Top")
+
+        self.assertIn("New posts analysed: 3", stats)
+        self.assertIn("Total posts analysed: 5", stats)
+        self.assertEqual(analyser.scored, ["good", "bad", "new 3", "new 2", "new 1"])
+        self.assertEqual(controller.profile_store.get("alice.bsky.social")["last_created_at"], "2025-05-08T13:00:00Z")
+
+    def test_posts_after_a_repost_on_the_next_page_are_analysed(self):
+        client = FakeFeedClient([feed_post("2025-05-08T10:00:00Z", "good")])
+        analyser = FakeSentimentAnalyser()
+        controller = Controller(client, analyser, "model.json", profile_store=ProfileStore())
+        controller.process_analysis_request("Profile", "alice.bsky.social", "Top")
+
+        # Pages of two: the first ends with the repost of an old post, the second holds a newer original
+        client.posts[:0] = [feed_post("2025-05-08T13:00:00Z", "new 3"),
+                            feed_post("2020-01-01T00:00:00Z", "old bad", reposted_at="2025-05-08T12:00:00Z"),
+                            feed_post("2025-05-08T11:00:00Z", "new 1")]
+        _, stats = controller.process_analysis_request("Profile", "alice.bsky.social", "Top")
+
+        self.assertIn("New posts analysed: 3", stats)
+        self.assertEqual(analyser.scored, ["good", "new 3", "old bad", "new 1"])
+        self.assertEqual(controller.profile_store.get("alice.bsky.social")["last_created_at"], "2025-05-08T13:00:00Z")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,195 @@
+import asyncio
+import random
+import threading
+import time
+
+DEFAULT_REQUESTS_PER_SECOND = 10.0  # Bluesky allows 3000 requests per 5 minutes per IP address
+DEFAULT_BURST = 10
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_BACKOFF_BASE_SECONDS = 0.5
+DEFAULT_BACKOFF_CAP_SECONDS = 30.0
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+def _header_number(headers, name):
+    """
+    Function reads a numeric response header.
+
+    Parameters:
+    headers (mapping): The response headers.
+    name (str): The header name.
+
+    Returns:
+    float: The header's value, or None if it is missing or not a number.
+    """
+    try:
+        value = headers.get(name)
+        return float(value) if value is not None else None
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """
+    Token-bucket rate limiter shared by every request an API client makes.
+
+    Each request takes one token; tokens refill at `rate` per second up to `burst`. Callers reserve
+    their token under a lock and then sleep outside it, so the same limiter paces threads (wait) and
+    coroutines (wait_async) alike. The Bluesky ratelimit-remaining/ratelimit-reset headers tighten the
+    bucket further: once the server reports no requests left, every caller waits for the reset.
+
+    Attributes:
+        rate: Tokens added per second.
+        burst: Maximum number of tokens (requests sent back to back).
+        max_retries: How many times a rate-limited (429), failed (5xx) or dropped request is retried.
+    """
+
+    def __init__(self, rate=DEFAULT_REQUESTS_PER_SECOND, burst=DEFAULT_BURST, max_retries=DEFAULT_MAX_RETRIES,
+                 backoff_base=DEFAULT_BACKOFF_BASE_SECONDS, backoff_cap=DEFAULT_BACKOFF_CAP_SECONDS):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+        self._tokens = self.burst
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0  # Monotonic time before which the server asked for no more requests
+        self._lock = threading.Lock()
+
+        self._requests = 0
+        self._retries = 0
+        self._rate_limited_responses = 0
+        self._server_errors = 0
+        self._throttled_seconds = 0.0
+
+    def _reserve(self):
+        """
+        Take a token, returning how long the caller has to wait before using it.
+
+        Returns:
+        float: The delay in seconds (0 when a token is available now).
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+
+            # Tokens may go negative: each waiting caller owns a later slot, so none of them overtakes another
+            self._tokens -= 1
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            delay = max(delay, self._blocked_until - now)
+
+            self._requests += 1
+            self._throttled_seconds += delay
+            return delay
+
+    def wait(self):
+        """
+        Block the calling thread until it may send a request.
+
+        Returns:
+        float: The time spent waiting, in seconds.
+        """
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    async def wait_async(self):
+        """
+        Suspend the calling coroutine until it may send a request.
+
+        Returns:
+        float: The time spent waiting, in seconds.
+        """
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def update_from_headers(self, headers):
+        """
+        Apply the server's rate-limit headers to the limiter.
+
+        When ratelimit-remaining reaches 0 no request is released before ratelimit-reset (a Unix time).
+
+        Parameters:
+        headers (mapping): The response headers.
+
+        Returns:
+        None
+        """
+        remaining = _header_number(headers, "ratelimit-remaining")
+        reset = _header_number(headers, "ratelimit-reset")
+        if remaining is None or reset is None or remaining > 0:
+            return
+
+        with self._lock:
+            wait_seconds = min(max(0.0, reset - time.time()), self.backoff_cap * 10)
+            self._blocked_until = max(self._blocked_until, time.monotonic() + wait_seconds)
+
+    def retry_delay(self, attempt, status_code=None, headers=None):
+        """
+        Work out how long to wait before retrying a request, and count the retry.
+
+        The server's Retry-After or ratelimit-reset header is honoured when present; otherwise the delay
+        is a jittered exponential backoff (random between 0 and base * 2 ** attempt, capped).
+
+        Parameters:
+        attempt (int): The number of retries already made for the request.
+        status_code (int): The response's status code, or None if the request itself failed.
+        headers (mapping): The response headers, if there was a response.
+
+        Returns:
+        float: The delay in seconds.
+        """
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+        if headers is not None:
+            retry_after = _header_number(headers, "retry-after")
+            reset = _header_number(headers, "ratelimit-reset")
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+            elif status_code == 429 and reset is not None:
+                delay = max(delay, reset - time.time())
+        delay = min(max(0.0, delay), self.backoff_cap)
+
+        with self._lock:
+            self._retries += 1
+            if status_code == 429:
+                self._rate_limited_responses += 1
+            elif status_code is not None and status_code >= 500:
+                self._server_errors += 1
+            self._throttled_seconds += delay
+        return delay
+
+    def should_retry(self, attempt, status_code=None):
+        """
+        Check whether a request should be retried.
+
+        Parameters:
+        attempt (int): The number of retries already made for the request.
+        status_code (int): The response's status code, or None if the request itself failed.
+
+        Returns:
+        bool: True if the request is retryable and retries are left.
+        """
+        return attempt < self.max_retries and (status_code is None or status_code in RETRY_STATUS_CODES)
+
+    def metrics(self):
+        """
+        Report what the limiter has done so far.
+
+        Returns:
+        dict: requests, retries, rate_limited_responses, server_errors and throttled_seconds (the total
+            time requests were held back, by the bucket, the server's headers or backoff).
+        """
+        with self._lock:
+            return {
+                "requests": self._requests,
+                "retries": self._retries,
+                "rate_limited_responses": self._rate_limited_responses,
+                "server_errors": self._server_errors,
+                "throttled_seconds": round(self._throttled_seconds, 3),
+            }
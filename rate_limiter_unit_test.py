@@ -0,0 +1,113 @@
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from BSkyAPI import BlueskyAPI
+from rate_limiter import RateLimiter
+
+
+class MockBlueskyServer:
+    """Local HTTP server answering each request with the next scripted (status, headers) response."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.request_times = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.request_times.append(time.monotonic())
+                status, headers = server.responses.pop(0) if server.responses else (200, {})
+                body = json.dumps({"ok": status == 200}).encode()
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/xrpc/app.bsky.feed.searchPosts"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_bucket_paces_requests_after_burst(self):
+        """Requests beyond the burst are spaced 1/rate apart and the wait is reported as throttled time."""
+        limiter = RateLimiter(rate=50, burst=2)
+        start = time.monotonic()
+        for _ in range(5):
+            limiter.wait()
+        elapsed = time.monotonic() - start
+
+        self.assertGreaterEqual(elapsed, 3 / 50 * 0.9)
+        metrics = limiter.metrics()
+        self.assertEqual(metrics["requests"], 5)
+        self.assertGreater(metrics["throttled_seconds"], 0)
+
+    def test_exhausted_quota_blocks_until_reset(self):
+        """ratelimit-remaining: 0 holds every request back until ratelimit-reset."""
+        limiter = RateLimiter(rate=1000, burst=10)
+        limiter.update_from_headers({"ratelimit-remaining": "0", "ratelimit-reset": str(time.time() + 0.2)})
+        self.assertGreater(limiter.wait(), 0.1)
+        self.assertEqual(limiter.wait(), 0.0)
+
+    def test_backoff_is_jittered_and_capped(self):
+        limiter = RateLimiter(backoff_base=1, backoff_cap=4)
+        delays = [limiter.retry_delay(attempt) for attempt in range(10)]
+        self.assertTrue(all(0 <= delay <= 4 for delay in delays))
+        self.assertEqual(limiter.retry_delay(0, 429, {"retry-after": "3"}), 3)
+
+
+class TestRetries(unittest.TestCase):
+    def setUp(self):
+        self.limiter = RateLimiter(rate=1000, burst=10, max_retries=3, backoff_base=0.01, backoff_cap=0.5)
+        self.api = BlueskyAPI(identifier="user", password="pass", rate_limiter=self.limiter)
+
+    def test_429_and_5xx_are_retried(self):
+        """Rate-limited and failed responses are retried until one succeeds."""
+        server = MockBlueskyServer([(429, {"ratelimit-remaining": "0", "ratelimit-reset": str(int(time.time()))}),
+                                    (503, {}), (200, {"ratelimit-remaining": "99"})])
+        try:
+            response = self.api._request("get", server.url)
+        finally:
+            server.close()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(server.request_times), 3)
+        metrics = self.limiter.metrics()
+        self.assertEqual((metrics["retries"], metrics["rate_limited_responses"], metrics["server_errors"]), (2, 1, 1))
+
+    def test_retry_after_is_honoured(self):
+        server = MockBlueskyServer([(429, {"retry-after": "0.3"}), (200, {})])
+        try:
+            response = self.api._request("get", server.url)
+        finally:
+            server.close()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertGreaterEqual(server.request_times[1] - server.request_times[0], 0.25)
+
+    def test_gives_up_after_max_retries(self):
+        """The last response is returned once the retries run out."""
+        server = MockBlueskyServer([(500, {})] * 5)
+        try:
+            response = self.api._request("get", server.url)
+        finally:
+            server.close()
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(len(server.request_times), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
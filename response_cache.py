@@ -0,0 +1,292 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# How long a cached response is fresh, and for how much longer it may be served stale while it is refreshed
+DEFAULT_TTLS = {
+    "resolveHandle": 6 * 60 * 60,
+    "searchPosts": 30,
+    "getAuthorFeed": 60,
+}
+DEFAULT_STALE_SECONDS = {
+    "resolveHandle": 24 * 60 * 60,
+    "searchPosts": 5 * 60,
+    "getAuthorFeed": 5 * 60,
+}
+DEFAULT_MAX_ENTRIES = 1024
+
+
+def cache_key(endpoint, params):
+    """
+    Function builds the cache key of a request.
+
+    Parameters:
+    endpoint (str): The endpoint name (e.g. "searchPosts").
+    params (dict): The request's query parameters.
+
+    Returns:
+    str: A key identical for identical requests, whatever the order of params.
+    """
+    return endpoint + "?" + json.dumps(params, sort_keys=True, separators=(",", ":"))
+
+
+class MemoryStore:
+    """
+    Bounded in-memory store evicting the least recently used entry.
+
+    Entries are (value, stored_at) pairs.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, value, stored_at):
+        with self._lock:
+            self._entries[key] = (value, stored_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteStore:
+    """
+    On-disk store in an SQLite database, so cached responses survive restarts and are shared between
+    processes. Values are stored as JSON.
+
+    The oldest responses are evicted once the table holds more than max_entries rows. The row count is
+    kept in memory and re-read after every eviction, so rows added by other processes are picked up then.
+    """
+
+    def __init__(self, path, max_entries=100 * DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("CREATE TABLE IF NOT EXISTS responses "
+                                     "(key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS responses_stored_at ON responses (stored_at)")
+            self._rows = self._count_rows()
+
+    def get(self, key):
+        with self._lock:
+            row = self._connection.execute("SELECT value, stored_at FROM responses WHERE key = ?", (key,)).fetchone()
+        return (json.loads(row[0]), row[1]) if row is not None else None
+
+    def _count_rows(self):
+        return self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def set(self, key, value, stored_at):
+        with self._lock, self._connection:
+            is_new = self._connection.execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone() is None
+            self._connection.execute("INSERT OR REPLACE INTO responses (key, value, stored_at) VALUES (?, ?, ?)",
+                                     (key, json.dumps(value), stored_at))
+            self._rows += is_new
+            if self._rows > self.max_entries:
+                # Drop the oldest responses once the table outgrows its bound (walking the stored_at index)
+                self._connection.execute("DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+                                         "ORDER BY stored_at DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+                self._rows = self._count_rows()
+
+    def clear(self):
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM responses")
+            self._rows = 0
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class ResponseCache:
+    """
+    Cache of API results keyed on (endpoint, params), with a time-to-live per endpoint.
+
+    Lookups go to an in-memory LRU store and then, if configured, to an SQLite store. A response older
+    than its TTL but within the endpoint's stale window is returned immediately while a background
+    refresh replaces it (stale-while-revalidate), so repeat queries never wait on the network.
+    Results are only cached when the fetch succeeds (returns something other than None).
+
+    Attributes:
+        ttls: Seconds a response stays fresh, per endpoint.
+        stale_seconds: Seconds a response may be served stale after its TTL, per endpoint.
+    """
+
+    def __init__(self, path=None, ttls=None, stale_seconds=None, max_entries=DEFAULT_MAX_ENTRIES):
+        """
+        Parameters:
+        path (str): SQLite database file for the on-disk store. In-memory only when None.
+        ttls (dict): Per-endpoint TTLs overriding DEFAULT_TTLS.
+        stale_seconds (dict): Per-endpoint stale windows overriding DEFAULT_STALE_SECONDS.
+        max_entries (int): Capacity of the in-memory store.
+        """
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.stale_seconds = dict(DEFAULT_STALE_SECONDS, **(stale_seconds or {}))
+        self._memory = MemoryStore(max_entries)
+        self._disk = SQLiteStore(path) if path else None
+
+        self._refreshing = set()  # Keys with a background refresh in flight
+        self._refresh_lock = threading.Lock()
+        # Threads are only started by the first refresh
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-refresh")
+        self._tasks = set()  # Keeps background refresh tasks referenced until they finish
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def _lookup(self, key):
+        entry = self._memory.get(key)
+        if entry is None and self._disk is not None:
+            entry = self._disk.get(key)
+            if entry is not None:
+                self._memory.set(key, *entry)
+        return entry
+
+    def _store(self, key, value):
+        stored_at = time.time()
+        self._memory.set(key, value, stored_at)
+        if self._disk is not None:
+            self._disk.set(key, value, stored_at)
+
+    def _classify(self, endpoint, entry):
+        """
+        Returns "fresh", "stale" or "expired" for a cached entry (or "expired" when there is none).
+        """
+        if entry is None:
+            return "expired"
+        age = time.time() - entry[1]
+        ttl = self.ttls.get(endpoint, 0)
+        if age < ttl:
+            return "fresh"
+        if age < ttl + self.stale_seconds.get(endpoint, 0):
+            return "stale"
+        return "expired"
+
+    def _claim_refresh(self, key):
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def _release_refresh(self, key):
+        with self._refresh_lock:
+            self._refreshing.discard(key)
+
+    def get_or_fetch(self, endpoint, params, fetch):
+        """
+        Return the cached result of a request, fetching it on a miss.
+
+        Parameters:
+        endpoint (str): The endpoint name, selecting the TTL.
+        params (dict): The request's query parameters (without credentials).
+        fetch (callable): Called without arguments to fetch the result; returns None on failure.
+
+        Returns:
+        The cached or fetched result (None if the fetch failed).
+        """
+        key = cache_key(endpoint, params)
+        entry = self._lookup(key)
+        state = self._classify(endpoint, entry)
+
+        if state == "fresh":
+            self.hits += 1
+            return entry[0]
+
+        if state == "stale":
+            self.stale_hits += 1
+            if self._claim_refresh(key):
+                self._executor.submit(self._refresh, key, fetch)
+            return entry[0]
+
+        self.misses += 1
+        value = fetch()
+        if value is not None:
+            self._store(key, value)
+        return value
+
+    def _refresh(self, key, fetch):
+        try:
+            value = fetch()
+            if value is not None:
+                self._store(key, value)
+        except Exception as e:
+            print(f"Cache refresh failed for {key}: {e}")
+        finally:
+            self._release_refresh(key)
+
+    async def get_or_fetch_async(self, endpoint, params, fetch):
+        """
+        Coroutine version of get_or_fetch, for the asynchronous API client.
+
+        Parameters:
+        endpoint (str): The endpoint name, selecting the TTL.
+        params (dict): The request's query parameters (without credentials).
+        fetch (callable): Coroutine function fetching the result; returns None on failure.
+
+        Returns:
+        The cached or fetched result (None if the fetch failed).
+        """
+        key = cache_key(endpoint, params)
+        entry = self._lookup(key)
+        state = self._classify(endpoint, entry)
+
+        if state == "fresh":
+            self.hits += 1
+            return entry[0]
+
+        if state == "stale":
+            self.stale_hits += 1
+            if self._claim_refresh(key):
+                task = asyncio.ensure_future(self._refresh_async(key, fetch))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            return entry[0]
+
+        self.misses += 1
+        value = await fetch()
+        if value is not None:
+            self._store(key, value)
+        return value
+
+    async def _refresh_async(self, key, fetch):
+        try:
+            value = await fetch()
+            if value is not None:
+                self._store(key, value)
+        except Exception as e:
+            print(f"Cache refresh failed for {key}: {e}")
+        finally:
+            self._release_refresh(key)
+
+    def stats(self):
+        """
+        Report the cache's hit counts.
+
+        Returns:
+        dict: hits (fresh), stale_hits (served while refreshing) and misses.
+        """
+        return {"hits": self.hits, "stale_hits": self.stale_hits, "misses": self.misses}
+
+    def clear(self):
+        self._memory.clear()
+        if self._disk is not None:
+            self._disk.clear()
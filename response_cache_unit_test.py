@@ -0,0 +1,120 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch, Mock
+
+from BSkyAPI import BlueskyAPI
+from response_cache import MemoryStore, ResponseCache, SQLiteStore
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_fresh_results_are_reused(self):
+        """Identical requests are fetched once while fresh, whatever the order of their params."""
+        cache = ResponseCache(ttls={"searchPosts": 60})
+        fetch = Mock(return_value=["posts", None])
+
+        self.assertEqual(cache.get_or_fetch("searchPosts", {"q": "cats", "limit": "25"}, fetch), ["posts", None])
+        self.assertEqual(cache.get_or_fetch("searchPosts", {"limit": "25", "q": "cats"}, fetch), ["posts", None])
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual(cache.stats(), {"hits": 1, "stale_hits": 0, "misses": 1})
+
+    def test_failed_fetches_are_not_cached(self):
+        cache = ResponseCache()
+        fetch = Mock(side_effect=[None, True])
+
+        self.assertIsNone(cache.get_or_fetch("resolveHandle", {"handle": "a"}, fetch))
+        self.assertTrue(cache.get_or_fetch("resolveHandle", {"handle": "a"}, fetch))
+
+    def test_stale_result_served_while_refreshing(self):
+        """A stale result is returned at once and replaced by a background refresh."""
+        cache = ResponseCache(ttls={"searchPosts": 0}, stale_seconds={"searchPosts": 60})
+        cache.get_or_fetch("searchPosts", {"q": "cats"}, lambda: "old")
+
+        self.assertEqual(cache.get_or_fetch("searchPosts", {"q": "cats"}, lambda: "new"), "old")
+        self.assertTrue(wait_for(lambda: cache._lookup('searchPosts?{"q":"cats"}')[0] == "new"))
+        self.assertEqual(cache.stats()["stale_hits"], 1)
+
+    def test_expired_result_is_refetched(self):
+        cache = ResponseCache(ttls={"searchPosts": 0}, stale_seconds={"searchPosts": 0})
+        cache.get_or_fetch("searchPosts", {"q": "cats"}, lambda: "old")
+        self.assertEqual(cache.get_or_fetch("searchPosts", {"q": "cats"}, lambda: "new"), "new")
+
+    def test_async_stale_while_revalidate(self):
+        cache = ResponseCache(ttls={"getAuthorFeed": 0}, stale_seconds={"getAuthorFeed": 60})
+
+        async def fetch_old():
+            return "old"
+
+        async def fetch_new():
+            return "new"
+
+        async def scenario():
+            first = await cache.get_or_fetch_async("getAuthorFeed", {"actor": "a"}, fetch_old)
+            second = await cache.get_or_fetch_async("getAuthorFeed", {"actor": "a"}, fetch_new)
+            await asyncio.sleep(0.01)  # Let the background refresh run
+            return first, second
+
+        self.assertEqual(asyncio.run(scenario()), ("old", "old"))
+        self.assertEqual(cache._lookup('getAuthorFeed?{"actor":"a"}')[0], "new")
+
+    def test_memory_store_evicts_least_recently_used(self):
+        store = MemoryStore(max_entries=2)
+        store.set("a", 1, 0)
+        store.set("b", 2, 0)
+        store.get("a")
+        store.set("c", 3, 0)
+        self.assertIsNone(store.get("b"))
+        self.assertEqual(store.get("a"), (1, 0))
+
+    def test_sqlite_store_survives_restart(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cache.sqlite3")
+            ResponseCache(path=path).get_or_fetch("searchPosts", {"q": "cats"}, lambda: [[{"text": "hi"}], "c1"])
+
+            fetch = Mock()
+            self.assertEqual(ResponseCache(path=path).get_or_fetch("searchPosts", {"q": "cats"}, fetch),
+                             [[{"text": "hi"}], "c1"])
+            fetch.assert_not_called()
+
+    def test_sqlite_store_evicts_oldest_when_over_capacity(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = SQLiteStore(os.path.join(directory, "cache.sqlite3"), max_entries=2)
+            store.set("a", 1, 1.0)
+            store.set("b", 2, 2.0)
+            store.set("a", 3, 3.0)  # Replacing a response does not grow the table
+            self.assertEqual((store.get("a"), store.get("b")), ((3, 3.0), (2, 2.0)))
+
+            store.set("c", 4, 4.0)
+            self.assertIsNone(store.get("b"))
+            self.assertEqual(store._rows, 2)
+            plan = store._connection.execute("EXPLAIN QUERY PLAN SELECT key FROM responses "
+                                             "ORDER BY stored_at DESC").fetchall()
+            self.assertIn("responses_stored_at", str(plan))
+            store.close()
+
+
+class TestCachedAPI(unittest.TestCase):
+    @patch("requests.Session.get")
+    def test_handle_resolution_is_cached(self, mock_get):
+        """Repeat lookups of a handle (existing or not) do not reach the API again."""
+        mock_get.side_effect = [Mock(status_code=200, headers={}), Mock(status_code=400, headers={})]
+
+        api = BlueskyAPI()
+        self.assertTrue(api.handle_validation("known.bsky.social"))
+        self.assertFalse(api.handle_validation("unknown"))
+        self.assertTrue(api.handle_validation("known.bsky.social "))
+        self.assertFalse(api.handle_validation("unknown"))
+        self.assertEqual(mock_get.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,264 @@
+import atexit
+import hashlib
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from BSkyAPI import _parse_created_at
+
+SENTIMENTS = ("Positive", "Neutral", "Negative")
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FLUSH_SECONDS = 5.0
+GROUP_BY = {
+    "hour": "CAST(created_epoch / 3600 AS INTEGER) * 3600",
+    "day": "CAST(created_epoch / 86400 AS INTEGER) * 86400",
+    "author": "author",
+}
+
+
+def _to_epoch(value):
+    """
+    Function converts a time bound to seconds since the epoch.
+
+    Parameters:
+    value: A createdAt-style ISO 8601 string, a datetime or a number of seconds since the epoch.
+
+    Returns:
+    float: The timestamp, or None if value is None.
+
+    Raises:
+    ValueError: If the value cannot be read as a time.
+    """
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    parsed = _parse_created_at(value)
+    if parsed is None:
+        raise ValueError(f"Invalid time {value!r}.")
+    return parsed.timestamp()
+
+
+class ResultsStore:
+    """
+    Scored posts persisted in an indexed SQLite table, so past results can be reported on again
+    without calling the API or the classifier.
+
+    Rows are buffered and written with one executemany per transaction once batch_size rows are
+    waiting or flush_seconds have passed since the last write, which keeps writes cheap under
+    sustained ingestion. Queries flush the buffer first, and the buffer is flushed at exit.
+    A post scored again by the same model version replaces its earlier row. Rows of other model
+    versions are kept, but queries count each post once, by its latest scoring, unless asked for
+    every version.
+
+    Authors are stored twice: their handle in author (None when only the DID is known, as for streamed
+    posts of untracked accounts) and their DID in author_did.
+    """
+
+    def __init__(self, path=":memory:", batch_size=DEFAULT_BATCH_SIZE, flush_seconds=DEFAULT_FLUSH_SECONDS):
+        """
+        Parameters:
+        path (str): SQLite database file. Defaults to an in-memory database (nothing persisted).
+        batch_size (int): Number of buffered rows that triggers a write.
+        flush_seconds (float): Longest time rows stay buffered while more rows are being added.
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._pending = []
+        self._last_flush = time.monotonic()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            # Readers do not block the writer (and the other way round) in write-ahead-log mode
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS scored_posts ("
+                "post_key TEXT NOT NULL, model_version TEXT NOT NULL, uri TEXT, author TEXT, author_did TEXT, "
+                "created_at TEXT, created_epoch REAL, text_hash TEXT NOT NULL, label TEXT NOT NULL, "
+                "score_positive REAL, score_neutral REAL, score_negative REAL, scored_at REAL NOT NULL, "
+                "PRIMARY KEY (post_key, model_version))"
+            )
+            if "author_did" not in {row[1] for row in self._connection.execute("PRAGMA table_info(scored_posts)")}:
+                # A store written before DIDs were kept
+                self._connection.execute("ALTER TABLE scored_posts ADD COLUMN author_did TEXT")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS scored_posts_author_time "
+                                     "ON scored_posts (author, created_epoch)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS scored_posts_author_did_time "
+                                     "ON scored_posts (author_did, created_epoch)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS scored_posts_time ON scored_posts (created_epoch)")
+        atexit.register(self.flush)
+
+    @staticmethod
+    def text_hash(text):
+        return hashlib.sha1(str(text).encode('utf-8')).hexdigest()
+
+    def add_many(self, model_version, keys, texts, labels, scores=None, metadata=None):
+        """
+        Buffer the results of several scored posts.
+
+        Parameters:
+        model_version (str): Identifies the model the posts were scored with.
+        keys (list): Post keys (see bin.prediction_cache.post_key).
+        texts (list): The posts' texts (only their hash is stored).
+        labels (list): The posts' sentiment names.
+        scores (list): A dict of Positive/Neutral/Negative probabilities per post, if known.
+        metadata (list): A dict per post with its uri, author (handle), author_did and created_at, if known.
+
+        Returns:
+        None
+        """
+        scored_at = time.time()
+        scores = scores if scores is not None else [None] * len(keys)
+        metadata = metadata if metadata is not None else [None] * len(keys)
+
+        rows = []
+        for key, text, label, post_scores, post in zip(keys, texts, labels, scores, metadata):
+            post, post_scores = post or {}, post_scores or {}
+            created_at = post.get("created_at")
+            parsed = _parse_created_at(created_at) if isinstance(created_at, str) else None
+            author = post.get("author")
+            author_did = post.get("author_did")
+            uri = post.get("uri")
+            rows.append((
+                key, model_version, uri if isinstance(uri, str) else None,
+                author.strip().lower() if isinstance(author, str) else None,
+                author_did.strip() if isinstance(author_did, str) else None,
+                created_at if isinstance(created_at, str) else None,
+                parsed.timestamp() if parsed is not None else None, self.text_hash(text), label,
+                post_scores.get("Positive"), post_scores.get("Neutral"), post_scores.get("Negative"), scored_at,
+            ))
+
+        with self._lock:
+            self._pending.extend(rows)
+            due = len(self._pending) >= self.batch_size or \
+                time.monotonic() - self._last_flush >= self.flush_seconds
+        if due:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered rows in a single transaction.
+
+        Returns:
+        int: Number of rows written.
+        """
+        with self._lock:
+            if self._closed or not self._pending:
+                return 0
+            rows, self._pending = self._pending, []
+            with self._connection:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO scored_posts (post_key, model_version, uri, author, author_did, "
+                    "created_at, created_epoch, text_hash, label, score_positive, score_neutral, score_negative, "
+                    "scored_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+                )
+            self._last_flush = time.monotonic()
+        return len(rows)
+
+    @staticmethod
+    def _where(author, start, end, model_version, all_versions=False):
+        clauses, params = [], []
+        if model_version is None and not all_versions:
+            # Only the latest scoring of each post (a post rescored after a retrain counts once)
+            clauses.append("NOT EXISTS (SELECT 1 FROM scored_posts AS newer WHERE newer.post_key = scored_posts.post_key "
+                           "AND (newer.scored_at > scored_posts.scored_at OR (newer.scored_at = scored_posts.scored_at "
+                           "AND newer.rowid > scored_posts.rowid)))")
+        if author is not None and author.strip().startswith("did:"):
+            clauses.append("author_did = ?")
+            params.append(author.strip())
+        elif author is not None:
+            clauses.append("author = ?")
+            params.append(author.strip().lower())
+        if start is not None:
+            clauses.append("created_epoch >= ?")
+            params.append(_to_epoch(start))
+        if end is not None:
+            clauses.append("created_epoch < ?")
+            params.append(_to_epoch(end))
+        if model_version is not None:
+            clauses.append("model_version = ?")
+            params.append(model_version)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def aggregate(self, author=None, start=None, end=None, model_version=None, group_by=None, all_versions=False):
+        """
+        Count the stored posts per sentiment, optionally per hour, day or author.
+
+        Parameters:
+        author (str): Only posts by this handle, or by this DID (did:...).
+        start: Only posts created at or after this time (ISO 8601 string, datetime or epoch seconds).
+        end: Only posts created before this time.
+        model_version (str): Only results of this model version. By default each post counts once, with
+            the label of the model that scored it last.
+        group_by (str): None for a single row, or "hour", "day" or "author".
+        all_versions (bool): Count the results of every model version, so a rescored post counts once per version.
+
+        Returns:
+        pandas.DataFrame: Positive, Neutral, Negative and Total counts and the mean positive and negative
+            scores, preceded by a window_start or author column when grouped.
+        """
+        if group_by is not None and group_by not in GROUP_BY:
+            raise ValueError(f"Unknown grouping {group_by!r}. Choose from {', '.join(GROUP_BY)}.")
+        where, params = self._where(author, start, end, model_version, all_versions)
+        group_column = f"{GROUP_BY[group_by]} AS grouping, " if group_by else ""
+        query = (f"SELECT {group_column}"
+                 "SUM(label = 'Positive'), SUM(label = 'Neutral'), SUM(label = 'Negative'), COUNT(*), "
+                 "AVG(score_positive), AVG(score_negative) FROM scored_posts" + where)
+        if group_by:
+            query += " GROUP BY grouping ORDER BY grouping"
+
+        self.flush()
+        with self._lock:
+            rows = self._connection.execute(query, params).fetchall()
+
+        columns = [*SENTIMENTS, "Total", "mean_score_positive", "mean_score_negative"]
+        if group_by:
+            frame = pd.DataFrame(rows, columns=["grouping", *columns])
+            if group_by == "author":
+                frame = frame.rename(columns={"grouping": "author"})
+            else:
+                frame = frame.rename(columns={"grouping": "window_start"})
+                frame["window_start"] = pd.to_datetime(frame["window_start"], unit="s", utc=True)
+        else:
+            frame = pd.DataFrame(rows, columns=columns)
+        frame[[*SENTIMENTS, "Total"]] = frame[[*SENTIMENTS, "Total"]].fillna(0).astype(int)
+        return frame
+
+    def posts(self, author=None, start=None, end=None, model_version=None, limit=100, all_versions=False):
+        """
+        Return the stored results of individual posts, newest first.
+
+        Parameters:
+        author (str): Only posts by this handle, or by this DID (did:...).
+        start: Only posts created at or after this time (ISO 8601 string, datetime or epoch seconds).
+        end: Only posts created before this time.
+        model_version (str): Only results of this model version. By default each post's latest result is returned.
+        limit (int): Maximum number of posts returned.
+        all_versions (bool): Return the results of every model version.
+
+        Returns:
+        pandas.DataFrame: uri, author, author_did, created_at, label, the three scores and model_version per post.
+        """
+        where, params = self._where(author, start, end, model_version, all_versions)
+        columns = ["uri", "author", "author_did", "created_at", "label", "score_positive", "score_neutral", "score_negative",
+                   "model_version"]
+        self.flush()
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT {', '.join(columns)} FROM scored_posts{where} ORDER BY created_epoch DESC LIMIT ?",
+                (*params, int(limit))
+            ).fetchall()
+        return pd.DataFrame(rows, columns=columns)
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._closed = True
+            self._connection.close()
+        atexit.unregister(self.flush)
@@ -0,0 +1,145 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import numpy as np
+
+from analyse import SentimentAnalyser
+from bin.naive_bayes import NaiveBayes
+from results_store import ResultsStore
+
+
+def trained_model():
+    model = NaiveBayes()
+    model.fit([[0, 1, 0, 1], [0, 0, 0, 1], [1, 0, 1, 0], [0, 0, 1, 0]], np.array([2, 2, 0, 0]),
+              ["awful", "great", "hate", "love"])
+    return model
+
+
+class TestResultsStore(unittest.TestCase):
+    def setUp(self):
+        self.store = ResultsStore(batch_size=100, flush_seconds=3600)
+        self.store.add_many(
+            "v1", ["at://1", "at://2", "at://3"], ["good", "bad", "fine"], ["Positive", "Negative", "Neutral"],
+            [{"Positive": 0.9, "Neutral": 0.05, "Negative": 0.05}, {"Positive": 0.1, "Neutral": 0.1, "Negative": 0.8},
+             None],
+            [{"uri": "at://1", "author": "Alice.bsky.social", "created_at": "2025-05-08T10:15:00.000Z"},
+             {"uri": "at://2", "author": "alice.bsky.social", "created_at": "2025-05-08T11:30:00.000Z"},
+             {"uri": "at://3", "author": "bob.bsky.social", "created_at": "2025-05-09T09:00:00.000Z"}]
+        )
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_rows_buffered_until_batch_is_full(self):
+        store = ResultsStore(batch_size=2, flush_seconds=3600)
+        store.add_many("v1", ["k1"], ["text"], ["Positive"])
+        self.assertEqual(store._connection.execute("SELECT COUNT(*) FROM scored_posts").fetchone()[0], 0)
+        store.add_many("v1", ["k2"], ["text"], ["Negative"])
+        self.assertEqual(store._connection.execute("SELECT COUNT(*) FROM scored_posts").fetchone()[0], 2)
+        store.close()
+
+    def test_aggregate_filters_by_author_and_time(self):
+        totals = self.store.aggregate().iloc[0]
+        self.assertEqual((totals["Positive"], totals["Neutral"], totals["Negative"], totals["Total"]), (1, 1, 1, 3))
+
+        alice = self.store.aggregate(author="ALICE.bsky.social", end="2025-05-08T11:00:00Z").iloc[0]
+        self.assertEqual((alice["Positive"], alice["Total"]), (1, 1))
+        self.assertAlmostEqual(alice["mean_score_positive"], 0.9)
+
+    def test_aggregate_grouped(self):
+        by_day = self.store.aggregate(group_by="day")
+        self.assertEqual(by_day["Total"].tolist(), [2, 1])
+        self.assertEqual(str(by_day["window_start"].iloc[0]), "2025-05-08 00:00:00+00:00")
+
+        by_author = self.store.aggregate(group_by="author")
+        self.assertEqual(dict(zip(by_author["author"], by_author["Total"])),
+                         {"alice.bsky.social": 2, "bob.bsky.social": 1})
+
+        with self.assertRaises(ValueError):
+            self.store.aggregate(group_by="week")
+
+    def test_rescored_post_replaces_its_row(self):
+        self.store.add_many("v1", ["at://1"], ["good"], ["Neutral"])
+        self.assertEqual(self.store.aggregate(model_version="v1").iloc[0]["Total"], 3)
+
+    def test_post_rescored_by_new_model_counts_once(self):
+        """Test that a post scored by a second model version is counted with its latest label only."""
+        self.store.add_many("v2", ["at://1"], ["good"], ["Negative"],
+                            metadata=[{"uri": "at://1", "author": "alice.bsky.social",
+                                       "created_at": "2025-05-08T10:15:00.000Z"}])
+
+        totals = self.store.aggregate().iloc[0]
+        self.assertEqual((totals["Positive"], totals["Negative"], totals["Total"]), (0, 2, 3))
+        self.assertEqual(self.store.aggregate(model_version="v1").iloc[0]["Total"], 3)
+        self.assertEqual(self.store.aggregate(all_versions=True).iloc[0]["Total"], 4)
+
+        by_author = self.store.aggregate(group_by="author")
+        self.assertEqual(by_author["Total"].tolist(), [2, 1])
+        self.assertEqual(self.store.posts(author="alice.bsky.social")["model_version"].tolist(), ["v1", "v2"])
+        self.assertEqual(len(self.store.posts(all_versions=True)), 4)
+
+    def test_posts_newest_first(self):
+        posts = self.store.posts(author="alice.bsky.social")
+        self.assertEqual(posts["uri"].tolist(), ["at://2", "at://1"])
+        self.assertEqual(posts["label"].tolist(), ["Negative", "Positive"])
+
+    def test_author_handle_and_did_stored_separately(self):
+        """Streamed posts know only their author's DID; handle and DID queries find the posts that have them."""
+        self.store.add_many("v1", ["at://4", "at://5"], ["great", "meh"], ["Positive", "Neutral"], metadata=[
+            {"uri": "at://4", "author": "alice.bsky.social", "author_did": "did:plc:alice",
+             "created_at": "2025-05-10T09:00:00Z"},
+            {"uri": "at://5", "author": None, "author_did": "did:plc:alice", "created_at": "2025-05-10T10:00:00Z"}])
+
+        self.assertEqual(self.store.posts(author="did:plc:alice")["uri"].tolist(), ["at://5", "at://4"])
+        self.assertEqual(self.store.aggregate(author="alice.bsky.social").iloc[0]["Total"], 3)
+        self.assertEqual(self.store.posts(author="alice.bsky.social")["author_did"].tolist()[0], "did:plc:alice")
+
+    def test_store_without_did_column_is_upgraded(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "results.sqlite3")
+        with sqlite3.connect(path) as connection:
+            connection.execute(
+                "CREATE TABLE scored_posts (post_key TEXT NOT NULL, model_version TEXT NOT NULL, uri TEXT, "
+                "author TEXT, created_at TEXT, created_epoch REAL, text_hash TEXT NOT NULL, label TEXT NOT NULL, "
+                "score_positive REAL, score_neutral REAL, score_negative REAL, scored_at REAL NOT NULL, "
+                "PRIMARY KEY (post_key, model_version))"
+            )
+        connection.close()
+
+        store = ResultsStore(path, batch_size=1)
+        store.add_many("v1", ["at://1"], ["good"], ["Positive"], metadata=[{"author_did": "did:plc:alice"}])
+        self.assertEqual(store.posts(author="did:plc:alice")["uri"].tolist(), [None])
+        store.close()
+
+
+class TestAnalyserResultsStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.model_path = os.path.join(self.directory.name, "model.json")
+        trained_model().save(self.model_path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_scored_posts_stored_once(self):
+        """Test that newly scored posts are stored with their scores, and cache hits are not stored again."""
+        store = ResultsStore(os.path.join(self.directory.name, "results.sqlite3"), batch_size=1000)
+        analyser = SentimentAnalyser(results_store=store)
+        metadata = [{"author": "alice.bsky.social", "created_at": "2025-05-08T10:00:00Z"},
+                    {"author": "bob.bsky.social", "created_at": "2025-05-08T11:00:00Z"}]
+        analyser.run_model(self.model_path, ["love it", "hate it"], ["at://a", "at://b"], metadata)
+        analyser.run_model(self.model_path, ["love it"], ["at://a"], metadata[:1])
+
+        posts = store.posts()
+        self.assertEqual(posts["uri"].tolist(), ["at://b", "at://a"])
+        self.assertEqual(posts["label"].tolist(), ["Negative", "Positive"])
+        self.assertGreater(posts["score_positive"].iloc[1], 0.5)
+        self.assertEqual(posts["model_version"].unique().tolist(), [analyser.model_cache.version(self.model_path)])
+        store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,207 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from BSkyAPI import _parse_created_at
+from bin.prediction_cache import post_key
+
+SENTIMENTS = ("Positive", "Neutral", "Negative")
+_SENTIMENT_INDEX = {name: position for position, name in enumerate(SENTIMENTS)}
+
+# Bucket width and number of buckets kept, per resolution (a day of minutes, a month of hours, a year of days)
+RESOLUTIONS = {
+    "minute": (60, 24 * 60),
+    "hour": (60 * 60, 30 * 24),
+    "day": (24 * 60 * 60, 365),
+}
+DEFAULT_SEEN_POSTS = 100000
+
+
+class WindowSeries:
+    """
+    Sentiment counts in fixed-width time buckets, kept in a circular buffer.
+
+    The buffer holds the `capacity` most recent buckets: bucket b lives in slot b % capacity, and a
+    slot is reset when a newer bucket claims it, so adding a post is O(1) and memory never grows.
+    Posts older than the oldest kept bucket are counted in `dropped` only.
+
+    Attributes:
+        bucket_seconds: Width of a bucket, in seconds.
+        capacity: Number of buckets kept.
+    """
+
+    def __init__(self, bucket_seconds, capacity):
+        self.bucket_seconds = bucket_seconds
+        self.capacity = capacity
+        self._counts = np.zeros((capacity, len(SENTIMENTS)), dtype=np.int64)
+        self._buckets = np.full(capacity, -1, dtype=np.int64)  # The bucket each slot currently holds
+        self._newest = None
+        self.dropped = 0
+
+    def add(self, timestamp, sentiment_index, count=1):
+        """
+        Count a post in the bucket containing its timestamp.
+
+        Parameters:
+        timestamp (float): The post's time, in seconds since the epoch.
+        sentiment_index (int): Position of the sentiment in SENTIMENTS.
+        count (int): Number of posts to add.
+
+        Returns:
+        bool: False if the post is older than every kept bucket.
+        """
+        bucket = int(timestamp // self.bucket_seconds)
+        if self._newest is not None and bucket <= self._newest - self.capacity:
+            self.dropped += count
+            return False
+
+        slot = bucket % self.capacity
+        if self._buckets[slot] != bucket:
+            self._counts[slot] = 0
+            self._buckets[slot] = bucket
+        self._counts[slot, sentiment_index] += count
+        if self._newest is None or bucket > self._newest:
+            self._newest = bucket
+        return True
+
+    def series(self, window=1, last=None):
+        """
+        Return the counts per bucket, or per sliding window of several buckets.
+
+        Parameters:
+        window (int): Number of buckets summed per row. 1 gives tumbling windows; more gives sliding
+            windows advancing one bucket at a time.
+        last (int): Only return the most recent rows.
+
+        Returns:
+        pandas.DataFrame: window_start (UTC timestamps) and the Positive/Neutral/Negative/Total counts,
+            oldest first, including empty buckets.
+        """
+        columns = ["window_start", *SENTIMENTS, "Total"]
+        if self._newest is None:
+            return pd.DataFrame(columns=columns)
+
+        first = max(self._buckets[self._buckets >= 0].min(), self._newest - self.capacity + 1)
+        buckets = np.arange(first, self._newest + 1)
+        slots = buckets % self.capacity
+        counts = np.where((self._buckets[slots] == buckets)[:, None], self._counts[slots], 0)
+
+        if window > 1:
+            # Sliding sums from the tumbling buckets, without touching raw posts
+            cumulative = np.vstack([np.zeros((1, counts.shape[1]), dtype=np.int64), np.cumsum(counts, axis=0)])
+            window = min(window, len(buckets))
+            counts = cumulative[window:] - cumulative[:-window]
+            buckets = buckets[:len(counts)]
+
+        if last is not None:
+            buckets, counts = buckets[-last:], counts[-last:]
+
+        frame = pd.DataFrame(counts, columns=list(SENTIMENTS))
+        frame.insert(0, "window_start", pd.to_datetime(buckets * self.bucket_seconds, unit="s", utc=True))
+        frame["Total"] = counts.sum(axis=1)
+        return frame
+
+
+class SentimentAggregator:
+    """
+    Time-windowed sentiment counts per query, at minute, hour and day resolution.
+
+    Every classified post is added once per query (posts are recognised by URI or text hash, so re-
+    analysing the same profile or keyword does not count its posts again), in O(1) per resolution.
+    """
+
+    def __init__(self, resolutions=None, seen_posts=DEFAULT_SEEN_POSTS):
+        """
+        Parameters:
+        resolutions (dict): Mapping of resolution name to (bucket seconds, number of buckets kept).
+        seen_posts (int): Number of post keys remembered per query to skip posts already counted.
+        """
+        self.resolutions = dict(resolutions or RESOLUTIONS)
+        self.seen_posts = seen_posts
+        self._series = {}
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def query_key(selected_choice, user_input_text):
+        """
+        Function names the series of a query.
+
+        Parameters:
+        selected_choice (str): "Profile" or "Keyword".
+        user_input_text (str): The handle or keyword.
+
+        Returns:
+        str: The query's key (e.g. "Keyword:climate change").
+        """
+        return f"{selected_choice}:{user_input_text.strip().lower()}"
+
+    def add_posts(self, query, created_at, sentiments, texts=None, uris=None):
+        """
+        Add classified posts to a query's series.
+
+        Parameters:
+        query (str): The query key (see query_key).
+        created_at (list): The posts' createdAt timestamps.
+        sentiments (list): The posts' sentiment names.
+        texts (list): The posts' texts (identify posts without a URI).
+        uris (list): The posts' URIs.
+
+        Returns:
+        int: Number of posts added (posts already counted for the query, or without a valid timestamp, are skipped).
+        """
+        count = len(sentiments)
+        texts = texts if texts is not None else [None] * count
+        uris = uris if uris is not None else [None] * count
+
+        added = 0
+        with self._lock:
+            series = self._series.get(query)
+            if series is None:
+                series = {name: WindowSeries(*shape) for name, shape in self.resolutions.items()}
+                self._series[query] = series
+            seen = self._seen.setdefault(query, OrderedDict())
+
+            for timestamp, sentiment, text, uri in zip(created_at, sentiments, texts, uris):
+                parsed = _parse_created_at(timestamp) if timestamp is not None else None
+                if parsed is None or sentiment not in _SENTIMENT_INDEX:
+                    continue
+                key = post_key(f"{timestamp}\0{text}", uri)
+                if key in seen:
+                    continue
+                seen[key] = True
+                if len(seen) > self.seen_posts:
+                    seen.popitem(last=False)
+
+                epoch_seconds = parsed.timestamp()
+                for window_series in series.values():
+                    window_series.add(epoch_seconds, _SENTIMENT_INDEX[sentiment])
+                added += 1
+        return added
+
+    def series(self, query, resolution="hour", window=1, last=None):
+        """
+        Return a query's windowed sentiment counts.
+
+        Parameters:
+        query (str): The query key (see query_key).
+        resolution (str): "minute", "hour" or "day".
+        window (int): Buckets per window: 1 for tumbling windows, more for sliding windows.
+        last (int): Only return the most recent windows.
+
+        Returns:
+        pandas.DataFrame: window_start, Positive, Neutral, Negative and Total (empty for unknown queries).
+        """
+        if resolution not in self.resolutions:
+            raise ValueError(f"Unknown resolution {resolution!r}. Choose from {', '.join(self.resolutions)}.")
+        with self._lock:
+            series = self._series.get(query)
+            if series is None:
+                return pd.DataFrame(columns=["window_start", *SENTIMENTS, "Total"])
+            return series[resolution].series(window=window, last=last)
+
+    def queries(self):
+        with self._lock:
+            return list(self._series)
@@ -0,0 +1,92 @@
+import unittest
+
+import pandas as pd
+
+from controller import Controller
+from sentiment_windows import SentimentAggregator, WindowSeries
+
+POSITIVE, NEUTRAL, NEGATIVE = 0, 1, 2
+
+
+class TestWindowSeries(unittest.TestCase):
+    def test_tumbling_buckets_include_empty_ones(self):
+        series = WindowSeries(bucket_seconds=60, capacity=10)
+        series.add(0, POSITIVE)
+        series.add(59, NEGATIVE)
+        series.add(150, POSITIVE)
+
+        frame = series.series()
+        self.assertEqual(frame["Positive"].tolist(), [1, 0, 1])
+        self.assertEqual(frame["Negative"].tolist(), [1, 0, 0])
+        self.assertEqual(frame["Total"].tolist(), [2, 0, 1])
+        self.assertEqual(frame["window_start"].iloc[2], pd.Timestamp(120, unit="s", tz="UTC"))
+
+    def test_buffer_keeps_only_the_latest_buckets(self):
+        """Old buckets are overwritten as newer ones arrive, and posts older than the buffer are dropped."""
+        series = WindowSeries(bucket_seconds=1, capacity=3)
+        for second in range(5):
+            series.add(second, NEUTRAL)
+        self.assertFalse(series.add(0, NEUTRAL))
+
+        frame = series.series()
+        self.assertEqual(frame["window_start"].dt.second.tolist(), [2, 3, 4])
+        self.assertEqual(frame["Neutral"].tolist(), [1, 1, 1])
+        self.assertEqual(series.dropped, 1)
+
+    def test_sliding_windows(self):
+        series = WindowSeries(bucket_seconds=1, capacity=10)
+        for second, count in enumerate([1, 2, 3, 4]):
+            series.add(second, POSITIVE, count)
+
+        self.assertEqual(series.series(window=2)["Positive"].tolist(), [3, 5, 7])
+        self.assertEqual(series.series(window=2, last=1)["Positive"].tolist(), [7])
+
+
+class TestSentimentAggregator(unittest.TestCase):
+    def test_posts_counted_once_per_query(self):
+        aggregator = SentimentAggregator()
+        query = SentimentAggregator.query_key("Keyword", "Cats ")
+        created_at = ["2025-05-08T10:05:00Z", "2025-05-08T10:40:00.000Z", "2025-05-08T11:00:00+00:00"]
+
+        self.assertEqual(aggregator.add_posts(query, created_at, ["Positive", "Negative", "Positive"],
+                                              uris=["at://1", "at://2", "at://3"]), 3)
+        self.assertEqual(aggregator.add_posts(query, created_at[:1], ["Positive"], uris=["at://1"]), 0)
+
+        hourly = aggregator.series("Keyword:cats", resolution="hour")
+        self.assertEqual(hourly["Total"].tolist(), [2, 1])
+        self.assertEqual(aggregator.series("Keyword:cats", resolution="day")["Total"].tolist(), [3])
+        with self.assertRaises(ValueError):
+            aggregator.series(query, resolution="week")
+
+
+class FakeClient:
+    def get_posts_from_search(self, search_term, sort_setting, language):
+        return pd.DataFrame({"created_at": ["2025-05-08T10:05:00Z", "2025-05-08T12:00:00Z"],
+                             "text": ["good", "bad"], "uri": ["at://1", "at://2"]})
+
+
+class FakeSentimentAnalyser:
+    def run_model(self, model_path, texts, post_ids=None, post_metadata=None, return_sentiments=False):
+        results = [f"Text: '{text}'" for text in texts], {"Positive": 1, "Neutral": 0, "Negative": 1, "Total": 2}
+        if return_sentiments:
+            return results + (["Negative" if text == "bad" else "Positive" for text in texts],)
+        return results
+
+    def classify(self, model_path, texts, post_ids=None, post_metadata=None):
+        raise AssertionError("Posts already scored by run_model must not be classified again.")
+
+
+class TestControllerTrend(unittest.TestCase):
+    def test_trend_from_analysed_posts(self):
+        controller = Controller(FakeClient(), FakeSentimentAnalyser(), "model.json", aggregator=SentimentAggregator())
+        controller.process_analysis_request("Keyword", "cats", "Top")
+
+        trend = controller.sentiment_trend("Keyword", "cats", resolution="hour")
+        self.assertEqual(trend.columns.tolist(), ["window_start", "sentiment", "count"])
+        self.assertEqual(trend[trend["sentiment"] == "Positive"]["count"].tolist(), [1, 0, 0])
+        self.assertEqual(trend[trend["sentiment"] == "Negative"]["count"].tolist(), [0, 0, 1])
+        self.assertTrue(controller.sentiment_trend("Keyword", "dogs").empty)
+
+
+if __name__ == '__main__':
+    unittest.main()
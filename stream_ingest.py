@@ -0,0 +1,507 @@
+#
+### stream_ingest.py
+#
+# Streaming ingestion: consumes a post event stream (Bluesky Jetstream, or a JSONL recording of it
+# replayed offline), keeps the posts matching the tracked keywords/authors, classifies them in micro-
+# batches and keeps running and rolling sentiment counts per topic.
+#
+# The reader and the classifier are joined by a bounded queue. When the classifier falls behind, the
+# reader blocks on the full queue (or, with overflow="drop_oldest", discards the oldest queued posts),
+# so memory use stays bounded whatever the event rate.
+#
+
+import argparse
+import json
+import queue
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+
+JETSTREAM_URL = "wss://jetstream2.us-east.bsky.network/subscribe"
+POST_COLLECTION = "app.bsky.feed.post"
+SENTIMENTS = ("Positive", "Neutral", "Negative")
+
+_END = object()  # Queued by the reader once the source is exhausted
+
+
+def post_from_event(event):
+    """
+    Function extracts a new post from a Jetstream event.
+
+    Parameters:
+    event (dict): The decoded event.
+
+    Returns:
+    dict: The post (did, uri, text, created_at), or None if the event is not the creation of a post.
+    """
+    if not isinstance(event, dict) or event.get("kind") != "commit":
+        return None
+    commit = event.get("commit")
+    if not isinstance(commit, dict):
+        return None
+    if commit.get("operation") != "create" or commit.get("collection") != POST_COLLECTION:
+        return None
+
+    record = commit.get("record") or {}
+    text = record.get("text")
+    if not text:
+        return None
+
+    did = event.get("did")
+    return {
+        "did": did,
+        "uri": f"at://{did}/{POST_COLLECTION}/{commit.get('rkey')}",
+        "text": text,
+        "created_at": record.get("createdAt"),
+    }
+
+
+class JsonlReplaySource:
+    """
+    Replays Jetstream events recorded one JSON object per line, as a stand-in for the live stream.
+
+    Attributes:
+        path: The JSONL file.
+        speed: Replay at this multiple of the recorded pace (using the events' time_us). None replays
+            as fast as the events can be consumed.
+    """
+
+    def __init__(self, path, speed=None):
+        self.path = path
+        self.speed = speed
+
+    def __iter__(self):
+        previous_time_us = None
+        started = time.monotonic()
+        replayed_us = 0
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"Skipping malformed replay line: {line[:80]}")
+                    continue
+
+                time_us = event.get("time_us")
+                if self.speed and time_us is not None:
+                    if previous_time_us is not None:
+                        replayed_us += max(0, time_us - previous_time_us)
+                    previous_time_us = time_us
+                    delay = replayed_us / 1e6 / self.speed - (time.monotonic() - started)
+                    if delay > 0:
+                        time.sleep(delay)
+                yield event
+
+
+class JetstreamSource:
+    """
+    Live Jetstream subscription to new posts. Requires the optional websockets package.
+
+    A dropped connection is reopened after a jittered exponential backoff, resuming from the cursor so
+    no events are missed (the events replayed up to the cursor are skipped).
+
+    Attributes:
+        url: The Jetstream subscribe endpoint.
+        dids: Only receive posts from these accounts (filtered by the server), or None for every account.
+        cursor: time_us of the last event received, to resume from after a reconnection.
+        max_reconnects: Consecutive failed connections after which iteration stops with the error.
+    """
+
+    def __init__(self, url=JETSTREAM_URL, dids=None, cursor=None, max_reconnects=10, backoff_base=1.0,
+                 backoff_cap=30.0, connect=None):
+        """
+        Parameters:
+        url (str): The Jetstream subscribe endpoint.
+        dids (iterable): Only receive posts from these accounts, or None for every account.
+        cursor (int): time_us to start from, or None for live events only.
+        max_reconnects (int): Consecutive failed connections after which iteration stops with the error.
+        backoff_base (float): Seconds of the first reconnection's backoff, doubled after every failure.
+        backoff_cap (float): Longest backoff in seconds.
+        connect (callable): Opens the websocket (a context manager iterating over messages). Defaults to
+            websockets.sync.client.connect.
+        """
+        self.url = url
+        self.dids = list(dids) if dids else None
+        self.cursor = cursor
+        self.max_reconnects = max_reconnects
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.connect = connect
+
+    def _subscribe_url(self):
+        params = [("wantedCollections", POST_COLLECTION)]
+        params += [("wantedDids", did) for did in self.dids or ()]
+        if self.cursor is not None:
+            params.append(("cursor", str(self.cursor)))
+        return self.url + "?" + "&".join(f"{name}={value}" for name, value in params)
+
+    def _connector(self):
+        # The connect function, and the errors after which the connection is reopened
+        if self.connect is not None:
+            return self.connect, (OSError,)
+        try:
+            from websockets.exceptions import WebSocketException
+            from websockets.sync.client import connect
+        except ImportError:
+            raise RuntimeError("The websockets package is required to read the live Jetstream feed "
+                               "(pip install websockets). A JSONL replay file can be used instead.")
+        return connect, (OSError, WebSocketException)
+
+    def __iter__(self):
+        connect, connection_errors = self._connector()
+        failures = 0
+        while True:
+            resumed_from = self.cursor if failures else None
+            try:
+                with connect(self._subscribe_url(), max_size=2 ** 22) as websocket:
+                    for message in websocket:
+                        try:
+                            event = json.loads(message)
+                        except json.JSONDecodeError:
+                            print(f"Skipping malformed Jetstream message: {str(message)[:80]}")
+                            continue
+                        time_us = event.get("time_us")
+                        if resumed_from is not None and time_us is not None and time_us <= resumed_from:
+                            continue  # Already received before the reconnection
+                        failures = 0
+                        self.cursor = time_us if time_us is not None else self.cursor
+                        yield event
+                error = "closed by the server"
+            except connection_errors as e:
+                error = e
+
+            failures += 1
+            if failures > self.max_reconnects:
+                raise ConnectionError(f"Jetstream connection lost {failures} times in a row ({error}).")
+            delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** (failures - 1)))
+            print(f"Jetstream connection lost ({error}). Reconnecting from cursor {self.cursor} in {delay:.1f}s.")
+            time.sleep(delay)
+
+
+class TopicFilter:
+    """
+    Assigns posts to the tracked topics: keywords (whole words or phrases, case-insensitive) and authors.
+
+    Attributes:
+        keywords: Mapping of keyword topic to its compiled pattern.
+        authors: Mapping of author DID to topic name (the handle given by the user).
+    """
+
+    def __init__(self, keywords=(), authors=None):
+        self.keywords = {keyword: re.compile(r"(?<!\w)" + re.escape(keyword.strip()) + r"(?!\w)", re.IGNORECASE)
+                         for keyword in keywords if keyword.strip()}
+        self.authors = dict(authors or {})
+
+    def topics(self, post):
+        """
+        Function lists the topics a post belongs to.
+
+        Parameters:
+        post (dict): The post (did, text...).
+
+        Returns:
+        list: The matching topic names (empty if the post is not tracked).
+        """
+        matched = [keyword for keyword, pattern in self.keywords.items() if pattern.search(post["text"])]
+        author_topic = self.authors.get(post.get("did"))
+        if author_topic is not None:
+            matched.append(author_topic)
+        return matched
+
+
+class StreamIngestor:
+    """
+    Classifies the tracked posts of an event stream in micro-batches and keeps sentiment counts per topic.
+
+    Attributes:
+        batch_size: Maximum number of posts classified together.
+        max_batch_delay: Seconds a post may wait for its batch to fill before the batch is classified anyway.
+        rolling_size: Number of most recent posts per topic in the rolling counts.
+        error: Why ingestion stopped before the end of the stream (e.g. the model failed to train), or None.
+    """
+
+    def __init__(self, source, sentiment_analyser, model_path, keywords=(), authors=(), resolve_handle=None,
+                 batch_size=64, max_batch_delay=1.0, queue_size=1024, rolling_size=500, overflow="block",
+                 retry_delay=1.0, max_retries=300):
+        """
+        Parameters:
+        source (iterable): Jetstream events (e.g. JetstreamSource or JsonlReplaySource).
+        sentiment_analyser (SentimentAnalyser): Classifies the posts (its classify method).
+        model_path (str): The path of the model file.
+        keywords (iterable): Keyword topics.
+        authors (iterable): Author topics, as DIDs or handles.
+        resolve_handle (callable): Resolves a handle to its DID (e.g. BlueskyAPI().resolve_handle).
+        batch_size (int): Maximum number of posts classified together.
+        max_batch_delay (float): Maximum seconds a post waits for its batch to fill.
+        queue_size (int): Capacity of the queue between the reader and the classifier.
+        rolling_size (int): Number of most recent posts per topic in the rolling counts.
+        overflow (str): "block" (the reader waits for the classifier) or "drop_oldest".
+        retry_delay (float): Seconds to wait before retrying a batch while the model is warming up.
+        max_retries (int): Times a batch is retried before ingestion stops with an error.
+        """
+        if overflow not in ("block", "drop_oldest"):
+            raise ValueError("overflow must be 'block' or 'drop_oldest'.")
+
+        self.source = source
+        self.sentiment_analyser = sentiment_analyser
+        self.model_path = model_path
+        self.batch_size = batch_size
+        self.max_batch_delay = max_batch_delay
+        self.rolling_size = rolling_size
+        self.overflow = overflow
+        self.retry_delay = retry_delay
+        self.max_retries = max_retries
+        self.error = None
+        self.topic_filter = TopicFilter(keywords, self._resolve_authors(authors, resolve_handle))
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._totals = {}
+        self._rolling = {}
+        self._stats = Counter()
+
+    @staticmethod
+    def _resolve_authors(authors, resolve_handle):
+        resolved = {}
+        for author in authors:
+            author = author.strip()
+            if author.startswith("did:"):
+                resolved[author] = author
+                continue
+            did = resolve_handle(author) if resolve_handle is not None else None
+            if did is None:
+                print(f"Warning: Could not resolve the handle {author}. Its posts will not be tracked.")
+                continue
+            resolved[did] = author
+        return resolved
+
+    def _enqueue(self, item):
+        """
+        Queue an item for the classifier, blocking (or dropping the oldest item) while the queue is full.
+
+        Returns:
+        bool: False if ingestion was stopped while waiting.
+        """
+        while not self._stop.is_set():
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                if self.overflow == "drop_oldest" and item is not _END:
+                    try:
+                        self._queue.get_nowait()
+                        with self._lock:
+                            self._stats["dropped"] += 1
+                    except queue.Empty:
+                        pass
+                    continue
+
+                # Backpressure: wait for the classifier to make room
+                with self._lock:
+                    self._stats["blocked_puts"] += 1
+                try:
+                    self._queue.put(item, timeout=0.1)
+                except queue.Full:
+                    continue
+
+            with self._lock:
+                self._stats["queue_high_watermark"] = max(self._stats["queue_high_watermark"], self._queue.qsize())
+            return True
+        return False
+
+    def _read(self):
+        try:
+            for event in self.source:
+                if self._stop.is_set():
+                    break
+                with self._lock:
+                    self._stats["events"] += 1
+                post = post_from_event(event)
+                if post is None:
+                    continue
+                topics = self.topic_filter.topics(post)
+                if topics and not self._enqueue((post, topics)):
+                    break
+        except Exception as e:
+            print(f"Stream reader stopped: {e}")
+        finally:
+            self._enqueue(_END)
+
+    def _next_batch(self):
+        """
+        Collect up to batch_size queued posts, waiting at most max_batch_delay once the first has arrived.
+
+        Returns:
+        tuple: (list of (post, topics), True if the stream has ended).
+        """
+        batch = []
+        deadline = None
+        while len(batch) < self.batch_size:
+            timeout = 0.1 if deadline is None else deadline - time.monotonic()
+            if deadline is not None and timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                if deadline is None and self._stop.is_set():
+                    return batch, True
+                continue
+            if item is _END:
+                return batch, True
+            batch.append(item)
+            if deadline is None:
+                deadline = time.monotonic() + self.max_batch_delay
+        return batch, False
+
+    def _classify(self, batch):
+        texts = [post["text"] for post, _ in batch]
+        uris = [post["uri"] for post, _ in batch]
+        metadata = []
+        for post, _ in batch:
+            # Jetstream events only carry the DID: the handle is known for the authors tracked by handle
+            handle = self.topic_filter.authors.get(post["did"])
+            metadata.append({"author": handle if handle and not handle.startswith("did:") else None,
+                             "author_did": post["did"], "created_at": post["created_at"]})
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.sentiment_analyser.classify(self.model_path, texts, uris, metadata)
+            except RuntimeError as e:
+                if self._stop.is_set():
+                    return None
+                # A failed training run is not retried: it would fail (and retrain) again for every batch
+                if self._training_failed() or attempt == self.max_retries:
+                    self.error = f"Classification failed: {e}"
+                    print(f"Stream stopped. {self.error}")
+                    return None
+                # The queue fills up meanwhile, holding back the reader
+                print(f"Stream: {e} Retrying in {self.retry_delay}s.")
+                time.sleep(self.retry_delay)
+
+    def _training_failed(self):
+        # The analyser's latest training job for the model, if it keeps one (see TrainingJobManager)
+        training_jobs = getattr(self.sentiment_analyser, "training_jobs", None)
+        job = training_jobs.get(self.model_path) if training_jobs is not None else None
+        return job is not None and job.failed()
+
+    def _record(self, batch, sentiments):
+        with self._lock:
+            for (post, topics), sentiment in zip(batch, sentiments):
+                for topic in topics:
+                    totals = self._totals.setdefault(topic, Counter())
+                    totals[sentiment] += 1
+                    totals["Total"] += 1
+                    self._rolling.setdefault(topic, deque(maxlen=self.rolling_size)).append(sentiment)
+            self._stats["posts"] += len(batch)
+            self._stats["batches"] += 1
+
+    def run(self):
+        """
+        Ingest the stream until it ends or stop() is called (blocking). If the posts cannot be classified,
+        ingestion stops early and error says why.
+
+        Returns:
+        dict: The final per-topic counts (see snapshot).
+        """
+        self._stop.clear()
+        self.error = None
+        reader = threading.Thread(target=self._read, name="stream-reader", daemon=True)
+        reader.start()
+
+        finished = False
+        while not finished:
+            batch, finished = self._next_batch()
+            if batch:
+                sentiments = self._classify(batch)
+                if sentiments is None:
+                    break
+                self._record(batch, sentiments)
+
+        self._stop.set()
+        reader.join(timeout=5)
+        return self.snapshot()
+
+    def start(self):
+        """
+        Ingest the stream in a background thread.
+
+        Returns:
+        threading.Thread: The ingestion thread.
+        """
+        self._thread = threading.Thread(target=self.run, name="stream-ingestor", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+    def snapshot(self):
+        """
+        Report the sentiment counts of every topic.
+
+        Returns:
+        dict: Mapping of topic to its running counts (Positive, Neutral, Negative, Total) and its
+            "rolling" counts over the topic's most recent posts.
+        """
+        with self._lock:
+            result = {}
+            for topic, totals in self._totals.items():
+                rolling = Counter(self._rolling.get(topic, ()))
+                result[topic] = dict({name: totals[name] for name in SENTIMENTS + ("Total",)},
+                                     rolling={name: rolling[name] for name in SENTIMENTS})
+            return result
+
+    def stats(self):
+        """
+        Report the ingestion's throughput and backpressure counters.
+
+        Returns:
+        dict: events read, posts classified, batches, queue_high_watermark, blocked_puts (times the reader
+            waited for the classifier) and dropped posts.
+        """
+        with self._lock:
+            return {name: self._stats[name]
+                    for name in ("events", "posts", "batches", "queue_high_watermark", "blocked_puts", "dropped")}
+
+
+if __name__ == '__main__':
+    from analyse import SentimentAnalyser
+    from BSkyAPI import BlueskyAPI
+
+    parser = argparse.ArgumentParser(description="Stream post sentiment per keyword/author.")
+    parser.add_argument("--replay", help="JSONL file of recorded Jetstream events (instead of the live feed)")
+    parser.add_argument("--speed", type=float, help="Replay at this multiple of the recorded pace")
+    parser.add_argument("--keyword", action="append", default=[], help="Keyword topic (repeatable)")
+    parser.add_argument("--author", action="append", default=[], help="Author handle or DID (repeatable)")
+    parser.add_argument("--model", default="sentiment_analyser_model.json", help="Model file")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--report-every", type=float, default=10.0, help="Seconds between reports")
+    arguments = parser.parse_args()
+
+    if arguments.replay:
+        stream_source = JsonlReplaySource(arguments.replay, speed=arguments.speed)
+    else:
+        stream_source = JetstreamSource()
+
+    ingestor = StreamIngestor(stream_source, SentimentAnalyser(), arguments.model, keywords=arguments.keyword,
+                              authors=arguments.author, resolve_handle=BlueskyAPI().resolve_handle,
+                              batch_size=arguments.batch_size)
+    if isinstance(stream_source, JetstreamSource) and not arguments.keyword and ingestor.topic_filter.authors:
+        # Only authors are tracked: the server sends their posts alone instead of the whole firehose
+        stream_source.dids = list(ingestor.topic_filter.authors)
+    ingestion_thread = ingestor.start()
+    try:
+        while ingestion_thread.is_alive():
+            ingestion_thread.join(timeout=arguments.report_every)
+            print(json.dumps({"topics": ingestor.snapshot(), "stats": ingestor.stats()}, indent=2))
+    except KeyboardInterrupt:
+        ingestor.stop()
+    if ingestor.error:
+        print(ingestor.error)
@@ -0,0 +1,201 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from bin.training_jobs import TrainingJobManager
+from stream_ingest import JetstreamSource, JsonlReplaySource, StreamIngestor, TopicFilter, post_from_event
+
+
+def post_event(did, rkey, text, time_us=0):
+    return {"did": did, "time_us": time_us, "kind": "commit",
+            "commit": {"operation": "create", "collection": "app.bsky.feed.post", "rkey": rkey,
+                       "record": {"text": text, "createdAt": "2025-05-08T00:00:00Z"}}}
+
+
+class FakeSentimentAnalyser:
+    """Labels posts containing "bad" Negative and the rest Positive, optionally slowly or after a warm-up."""
+
+    def __init__(self, delay=0.0, warming_up_calls=0):
+        self.delay = delay
+        self.warming_up_calls = warming_up_calls
+        self.batches = []
+        self.metadata = []
+
+    def classify(self, model_path, texts, post_ids=None, post_metadata=None):
+        if self.warming_up_calls:
+            self.warming_up_calls -= 1
+            raise RuntimeError("The sentiment model is warming up.")
+        time.sleep(self.delay)
+        self.batches.append(list(texts))
+        self.metadata.extend(post_metadata or [])
+        return ["Negative" if "bad" in text else "Positive" for text in texts]
+
+
+class TestStreamIngestion(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.replay_path = os.path.join(self.directory.name, "jetstream.jsonl")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_replay(self, events):
+        with open(self.replay_path, "w", encoding="utf-8") as f:
+            for event in events:
+                f.write(json.dumps(event) + "\n")
+
+    def test_non_post_events_ignored(self):
+        self.assertIsNone(post_from_event({"kind": "identity", "did": "did:plc:a"}))
+        self.assertIsNone(post_from_event({"kind": "commit", "commit": {"operation": "delete",
+                                                                         "collection": "app.bsky.feed.post"}}))
+        post = post_from_event(post_event("did:plc:a", "3k", "hello"))
+        self.assertEqual(post["uri"], "at://did:plc:a/app.bsky.feed.post/3k")
+
+    def test_keywords_match_whole_words(self):
+        topic_filter = TopicFilter(keywords=["cat", "climate change"], authors={"did:plc:a": "alice.bsky.social"})
+        self.assertEqual(topic_filter.topics({"did": "did:plc:a", "text": "Climate change and my CAT"}),
+                         ["cat", "climate change", "alice.bsky.social"])
+        self.assertEqual(topic_filter.topics({"did": "did:plc:b", "text": "concatenate"}), [])
+
+    def test_replay_counts_per_topic(self):
+        """Tracked posts are classified in micro-batches and counted under every topic they match."""
+        self.write_replay([post_event("did:plc:a", "1", "good cats"), post_event("did:plc:b", "2", "bad cats"),
+                           post_event("did:plc:b", "3", "unrelated"), {"kind": "account"},
+                           post_event("did:plc:b", "4", "bad dogs")])
+        analyser = FakeSentimentAnalyser()
+        ingestor = StreamIngestor(JsonlReplaySource(self.replay_path), analyser, "model.json",
+                                  keywords=["cats", "dogs"], authors=["alice.bsky.social"],
+                                  resolve_handle={"alice.bsky.social": "did:plc:a"}.get,
+                                  batch_size=2, max_batch_delay=0.05, rolling_size=1)
+
+        snapshot = ingestor.run()
+
+        self.assertEqual(snapshot["cats"]["Total"], 2)
+        self.assertEqual((snapshot["cats"]["Positive"], snapshot["cats"]["Negative"]), (1, 1))
+        self.assertEqual(snapshot["cats"]["rolling"], {"Positive": 0, "Neutral": 0, "Negative": 1})
+        self.assertEqual(snapshot["dogs"]["Negative"], 1)
+        self.assertEqual(snapshot["alice.bsky.social"]["Positive"], 1)
+        self.assertTrue(all(len(batch) <= 2 for batch in analyser.batches))
+        self.assertEqual(ingestor.stats()["events"], 5)
+        self.assertEqual(ingestor.stats()["posts"], 3)
+        # Authors are recorded like the API's posts: handle when known, and the DID separately
+        self.assertEqual([(post["author"], post["author_did"]) for post in analyser.metadata],
+                         [("alice.bsky.social", "did:plc:a"), (None, "did:plc:b"), (None, "did:plc:b")])
+
+    def test_slow_classifier_applies_backpressure(self):
+        """A slow classifier holds back the reader instead of letting the queue grow."""
+        self.write_replay([post_event("did:plc:a", str(i), f"cats {i}") for i in range(40)])
+        ingestor = StreamIngestor(JsonlReplaySource(self.replay_path), FakeSentimentAnalyser(delay=0.01),
+                                  "model.json", keywords=["cats"], batch_size=2, max_batch_delay=0.01, queue_size=4)
+
+        snapshot = ingestor.run()
+
+        self.assertEqual(snapshot["cats"]["Total"], 40)
+        self.assertLessEqual(ingestor.stats()["queue_high_watermark"], 4)
+        self.assertGreater(ingestor.stats()["blocked_puts"], 0)
+
+    def test_drop_oldest_overflow(self):
+        release = threading.Event()
+        analyser = FakeSentimentAnalyser()
+        analyser.classify = lambda model_path, texts, post_ids=None, post_metadata=None: (release.wait(5), ["Positive"] * len(texts))[1]
+        self.write_replay([post_event("did:plc:a", str(i), f"cats {i}") for i in range(20)])
+        ingestor = StreamIngestor(JsonlReplaySource(self.replay_path), analyser, "model.json", keywords=["cats"],
+                                  batch_size=1, queue_size=2, overflow="drop_oldest")
+
+        thread = ingestor.start()
+        time.sleep(0.5)
+        release.set()
+        thread.join(5)
+
+        stats = ingestor.stats()
+        self.assertGreater(stats["dropped"], 0)
+        self.assertEqual(stats["posts"] + stats["dropped"], 20)
+
+    def test_batches_wait_for_model_warm_up(self):
+        self.write_replay([post_event("did:plc:a", "1", "good cats")])
+        ingestor = StreamIngestor(JsonlReplaySource(self.replay_path), FakeSentimentAnalyser(warming_up_calls=2),
+                                  "model.json", keywords=["cats"], max_batch_delay=0.01, retry_delay=0.01)
+        self.assertEqual(ingestor.run()["cats"]["Total"], 1)
+        self.assertIsNone(ingestor.error)
+
+    def test_gives_up_when_model_never_becomes_available(self):
+        self.write_replay([post_event("did:plc:a", "1", "good cats")])
+        ingestor = StreamIngestor(JsonlReplaySource(self.replay_path), FakeSentimentAnalyser(warming_up_calls=10),
+                                  "model.json", keywords=["cats"], max_batch_delay=0.01, retry_delay=0.01,
+                                  max_retries=3)
+
+        self.assertEqual(ingestor.run(), {})
+        self.assertIn("warming up", ingestor.error)
+
+    def test_failed_training_job_stops_without_retrying(self):
+        training_jobs = TrainingJobManager()
+        self.addCleanup(training_jobs.shutdown)
+        training_jobs.submit("model.json", lambda report: 1 / 0).future.exception(timeout=5)
+        analyser = FakeSentimentAnalyser(warming_up_calls=10)
+        analyser.training_jobs = training_jobs
+        self.write_replay([post_event("did:plc:a", "1", "good cats")])
+        ingestor = StreamIngestor(JsonlReplaySource(self.replay_path), analyser, "model.json", keywords=["cats"],
+                                  max_batch_delay=0.01, retry_delay=0.01)
+
+        ingestor.run()
+
+        self.assertEqual(analyser.warming_up_calls, 9)
+        self.assertIsNotNone(ingestor.error)
+
+
+class FakeWebsocket:
+    """Serves messages, then drops the connection like a network failure (unless the messages run out)."""
+
+    def __init__(self, messages, drop):
+        self.messages = messages
+        self.drop = drop
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def __iter__(self):
+        yield from self.messages
+        if self.drop:
+            raise ConnectionResetError("connection reset")
+
+
+class TestJetstreamSource(unittest.TestCase):
+    def test_reconnects_from_cursor_after_a_drop(self):
+        """A dropped connection is reopened from the last cursor, and replayed events are skipped."""
+        events = [post_event("did:plc:a", str(i), f"post {i}", time_us=100 + i) for i in range(4)]
+        urls = []
+        connections = iter([FakeWebsocket([json.dumps(event) for event in events[:2]], drop=True),
+                            ConnectionRefusedError("refused"),
+                            FakeWebsocket([json.dumps(event) for event in events[1:]], drop=False),
+                            ConnectionRefusedError("refused"), ConnectionRefusedError("refused")])
+
+        def connect(url, max_size=None):
+            urls.append(url)
+            connection = next(connections)
+            if isinstance(connection, Exception):
+                raise connection
+            return connection
+
+        source = JetstreamSource(dids=["did:plc:a"], max_reconnects=2, backoff_base=0.001, connect=connect)
+        received = []
+        with self.assertRaises(ConnectionError):
+            for event in source:
+                received.append(event["commit"]["rkey"])
+
+        self.assertEqual(received, ["0", "1", "2", "3"])
+        self.assertNotIn("cursor", urls[0])
+        self.assertTrue(urls[1].endswith("wantedDids=did:plc:a&cursor=101"))
+        self.assertTrue(urls[2].endswith("cursor=101"))
+        self.assertTrue(urls[3].endswith("cursor=103"))
+        # Gives up after max_reconnects consecutive failures
+        self.assertEqual(len(urls), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()